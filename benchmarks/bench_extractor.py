@@ -0,0 +1,66 @@
+# Compare l'extraction d'une page produit avant/après le passage aux XPath compilés.
+#
+# Usage : python -m benchmarks.bench_extractor [--repeat 2000]
+
+import argparse
+import time
+
+from scrapy.http import HtmlResponse
+
+from project_scrapy.extractors import extract_product
+from benchmarks.common import load_product_pages
+
+
+def legacy_extract_product(response):
+    """Extraction d'origine de BookSpider.parse : une requête XPath par champ."""
+    book_item = {}
+    book_item['title'] =  response.xpath("//h1/text()").get()
+    book_item['image'] = response.xpath("//img/@src").get()
+    book_item['description'] = response.xpath("//div[@id='product_description']/following-sibling::p/text()").get()
+    book_item['availability'] = response.xpath("//table[@class='table table-striped']//tr[th[text()='Availability']]/td[last()]/text()").get()
+    generate_xpath = lambda variable: f"//table[@class='table table-striped']//tr[th[text()='{variable}']]/td/text()"
+    items = [('UPC','UPC'),('product_type','Product Type'),('price','Price (excl. tax)'),('price_tax','Price (incl. tax)'),('tax','Tax'),('number_of_reviews','Number of reviews')]
+    for item in items:
+        book_item[item[0]] = response.xpath(generate_xpath(item[1])).get()
+    return book_item
+
+
+def compiled_extract_product(response):
+    return extract_product(response.selector.root)
+
+
+def fresh(response):
+    # Nouvelle réponse à chaque itération pour inclure le parsing lxml dans la mesure
+    return HtmlResponse(url=response.url, body=response.body, encoding='utf-8')
+
+
+def bench(extract, pages, repeat, reparse):
+    for page in pages:
+        extract(page)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            extract(fresh(page) if reparse else page)
+    return (time.perf_counter() - start) / (repeat * len(pages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'extraction des pages produit")
+    parser.add_argument('--repeat', type=int, default=2000, help="nombre de passages sur l'ensemble des pages")
+    args = parser.parse_args()
+
+    pages = load_product_pages()
+    for page in pages:
+        legacy, compiled = legacy_extract_product(page), compiled_extract_product(page)
+        if legacy != compiled:
+            raise SystemExit(f'Sortie différente pour {page.url} :\n{legacy}\n{compiled}')
+
+    print(f'{len(pages)} pages, {args.repeat} passages, sorties identiques')
+    for label, reparse in (('extraction seule', False), ('parsing + extraction', True)):
+        legacy_us = bench(legacy_extract_product, pages, args.repeat, reparse)
+        compiled_us = bench(compiled_extract_product, pages, args.repeat, reparse)
+        print(f'{label:22} XPath par champ : {legacy_us:8.1f} µs/page   XPath compilées : {compiled_us:8.1f} µs/page   x{legacy_us / compiled_us:.2f}')
+
+
+if __name__ == '__main__':
+    main()
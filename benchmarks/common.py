@@ -0,0 +1,85 @@
+# Outils partagés par les benchmarks : pages enregistrées dans fixtures/ et comparaison à une référence
+
+import glob
+import json
+import os
+
+from scrapy.http import HtmlResponse
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_product_pages():
+    """
+    Charge les pages produit enregistrées dans fixtures/ sous forme de réponses Scrapy.
+    Le fichier product_<slug>.html correspond à https://books.toscrape.com/catalogue/<slug>/index.html.
+    Returns:
+        list: Les réponses HtmlResponse, une par page.
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'product_*.html'))):
+        slug = os.path.basename(path)[len('product_'):-len('.html')]
+        with open(path, 'rb') as f:
+            body = f.read()
+        url = f'https://books.toscrape.com/catalogue/{slug}/index.html'
+        pages.append(HtmlResponse(url=url, body=body, encoding='utf-8'))
+    return pages
+
+
+def metric(result, path):
+    """
+    Lit une mesure éventuellement imbriquée d'un résultat (ex : 'latency_ms.p95').
+    Args:
+        result (dict): Le résultat d'un benchmark.
+        path (str): Le chemin de la mesure, clés séparées par des points.
+    Returns:
+        float: La valeur de la mesure, ou None si elle est absente.
+    """
+    value = result
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare_to_baseline(results, baseline, key_fields, metrics, threshold):
+    """
+    Compare des résultats de benchmark à une référence enregistrée.
+    Args:
+        results (list): Les résultats de l'exécution courante.
+        baseline (list): Les résultats de référence.
+        key_fields (tuple): Les champs qui identifient un cas (ex : ('books', 'concurrency')).
+        metrics (dict): Pour chaque mesure comparée, 'higher' si une valeur plus grande est meilleure, 'lower' sinon.
+        threshold (float): La dégradation relative tolérée (0.1 = 10 %).
+    Returns:
+        list: Les régressions trouvées, une phrase par mesure dégradée.
+    """
+    baseline_by_key = {tuple(entry[field] for field in key_fields): entry for entry in baseline}
+    regressions = []
+    for result in results:
+        key = tuple(result[field] for field in key_fields)
+        reference = baseline_by_key.get(key)
+        if reference is None:
+            continue
+        for path, better in metrics.items():
+            current, previous = metric(result, path), metric(reference, path)
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous
+            if (better == 'higher' and change < -threshold) or (better == 'lower' and change > threshold):
+                case = ', '.join(f'{field}={value}' for field, value in zip(key_fields, key))
+                regressions.append(f'{case} : {path} {previous:.4g} -> {current:.4g} ({change:+.1%})')
+    return regressions
+
+
+def load_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
@@ -0,0 +1,224 @@
+# Benchmark de bout en bout de bookspider contre le serveur local (benchmarks/standin_server.py).
+#
+# Chaque cas (taille du catalogue x CONCURRENT_REQUESTS) lance le crawl dans un processus
+# séparé avec les middlewares et pipelines de settings.py, à travers le faux proxy ScrapeOps
+# (toutes les requêtes passent par le proxy : SCRAPEOPS_PROXY_ROUTES est vidé).
+# Mesures : pages/s, items/s, latence des requêtes (p50/p95/p99), RSS maximal et temps CPU du crawl.
+#
+# Usage :
+#   python -m benchmarks.crawl_benchmark --books 200 1000 --concurrency 1 8 32 --output crawl.json
+#   python -m benchmarks.crawl_benchmark --baseline crawl.json --threshold 0.1   # échoue en cas de régression
+#
+# DataBasePipeline a besoin de MySQL : --without-database le retire des pipelines.
+# AdaptiveConcurrency est désactivé pour mesurer une concurrence fixe ; avec --adaptive,
+# --concurrency est la concurrence de départ du contrôleur.
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import compare_to_baseline, load_json, save_json
+from benchmarks.standin_server import StandInServer
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mesure -> sens de l'amélioration, pour la comparaison à la référence
+COMPARED_METRICS = {
+    'pages_per_s': 'higher',
+    'items_per_s': 'higher',
+    'latency_ms.p95': 'lower',
+    'peak_rss_mb': 'lower',
+    'cpu_time_s': 'lower',
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def run_crawl(server_url, concurrency, use_proxy, without_database, adaptive, hedging, parse_pool, log_level):
+    """
+    Lance un crawl dans le processus courant et retourne ses mesures.
+    Args:
+        server_url (str): L'URL du serveur local.
+        concurrency (int): La valeur de CONCURRENT_REQUESTS.
+        use_proxy (bool): Passe par le faux proxy ScrapeOps du serveur local.
+        without_database (bool): Retire DataBasePipeline des pipelines.
+        adaptive (bool): Laisse AdaptiveConcurrency ajuster la concurrence.
+        hedging (bool): Double les requêtes lentes (HedgingDownloadHandler).
+        parse_pool (int): Le nombre de processus d'analyse des pages produit (0 = dans le reactor).
+        log_level (str): Le niveau de log du crawl.
+    Returns:
+        dict: Les mesures du crawl.
+    """
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from project_scrapy.spiders.bookspider import BookSpider
+
+    settings = get_project_settings()
+    settings.set('CONCURRENT_REQUESTS', concurrency)
+    settings.set('ADAPTIVE_CONCURRENCY_ENABLED', adaptive)
+    settings.set('HEDGING_ENABLED', hedging)
+    settings.set('PARSE_POOL_WORKERS', parse_pool)
+    settings.set('LOG_LEVEL', log_level)
+    settings.set('SCRAPEOPS_FAKE_HEADERS_ENDPOINT', f'{server_url}v1/browser-headers?')
+    settings.set('SCRAPEOPS_FAKE_USER_AGENT_ENDPOINT', f'{server_url}v1/user-agents?')
+    if use_proxy:
+        settings.set('SCRAPEOPS_API_KEY', settings.get('SCRAPEOPS_API_KEY') or 'benchmark')
+        settings.set('SCRAPEOPS_PROXY_ENABLED', True)
+        settings.set('SCRAPEOPS_FAKE_PROXY_ENDPOINT', f'{server_url}v1/?')
+        # Sans cela, les routes 'auto' (pages de liste, couvertures) partiraient en direct vers le vrai site
+        settings.set('SCRAPEOPS_PROXY_ROUTES', {})
+        settings.set('SCRAPEOPS_PROXY_DEFAULT_ROUTE', 'proxy')
+        spider_kwargs = {}
+    else:
+        settings.set('SCRAPEOPS_PROXY_ENABLED', False)
+        spider_kwargs = {'start_url': server_url}
+    if without_database:
+        pipelines = dict(settings.getdict('ITEM_PIPELINES'))
+        pipelines.pop('project_scrapy.pipelines.DataBasePipeline', None)
+        settings.set('ITEM_PIPELINES', pipelines)
+
+    latencies = []
+
+    def response_received(response, request, spider):
+        latency = request.meta.get('download_latency')
+        if latency is not None:
+            latencies.append(latency * 1000)
+
+    process = CrawlerProcess(settings, install_root_handler=True)
+    crawler = process.create_crawler(BookSpider)
+    crawler.signals.connect(response_received, signal=signals.response_received)
+    process.crawl(crawler, **spider_kwargs)
+    start = time.perf_counter()
+    process.start()
+    elapsed = time.perf_counter() - start
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    stats = crawler.stats.get_stats()
+    pages = stats.get('response_received_count', 0)
+    items = stats.get('item_scraped_count', 0)
+    return {
+        'pages': pages,
+        'items': items,
+        'elapsed_s': elapsed,
+        'pages_per_s': pages / elapsed,
+        'items_per_s': items / elapsed,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        },
+        # ru_maxrss est en Ko sous Linux
+        'peak_rss_mb': usage.ru_maxrss / 1024,
+        'cpu_time_s': usage.ru_utime + usage.ru_stime,
+        'errors': stats.get('log_count/ERROR', 0),
+        'final_concurrency': stats.get('adaptive_concurrency/current', concurrency),
+        'hedging': {key.split('/', 1)[1]: value for key, value in stats.items() if key.startswith('hedging/')},
+        'parse_pool': {key.split('/', 1)[1]: value for key, value in stats.items() if key.startswith('parse_pool/')},
+        'connection_pool': {key.split('/', 1)[1]: value for key, value in stats.items() if key.startswith('connection_pool/')},
+    }
+
+
+def run_case(args, server, books, concurrency):
+    # Un processus par cas : RSS et temps CPU ne mesurent que ce crawl et le reactor repart à neuf
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_path = f.name
+    command = [
+        sys.executable, '-m', 'benchmarks.crawl_benchmark', '--run-one',
+        '--server-url', server.url, '--concurrency', str(concurrency),
+        '--result-file', result_path, '--log-level', args.log_level,
+    ]
+    if args.direct:
+        command.append('--direct')
+    if args.without_database:
+        command.append('--without-database')
+    if args.adaptive:
+        command.append('--adaptive')
+    if args.hedging:
+        command.append('--hedging')
+    if args.parse_pool:
+        command.extend(['--parse-pool', str(args.parse_pool)])
+    try:
+        subprocess.run(command, cwd=ROOT_DIR, check=True)
+        result = load_json(result_path)
+    finally:
+        os.remove(result_path)
+    result.update({'books': books, 'concurrency': concurrency, 'latency_setting_ms': args.latency})
+    if result['items'] != books:
+        print(f'  attention : {result["items"]} items pour {books} livres', file=sys.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de bout en bout de bookspider contre le serveur local')
+    parser.add_argument('--books', type=int, nargs='+', default=[200, 1000], help='tailles de catalogue')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='valeurs de CONCURRENT_REQUESTS')
+    parser.add_argument('--latency', type=float, default=20, help='latence moyenne du serveur local (ms)')
+    parser.add_argument('--direct', action='store_true', help='crawl direct, sans le faux proxy ScrapeOps')
+    parser.add_argument('--without-database', action='store_true', help='retire DataBasePipeline (pas de MySQL)')
+    parser.add_argument('--adaptive', action='store_true', help='active AdaptiveConcurrency (--concurrency = concurrence de départ)')
+    parser.add_argument('--hedging', action='store_true', help='active HedgingDownloadHandler')
+    parser.add_argument('--parse-pool', type=int, default=0, help="processus d'analyse des pages produit (ParsePool, 0 = dans le reactor)")
+    parser.add_argument('--slow-rate', type=float, default=0, help='proportion de réponses lentes du serveur local')
+    parser.add_argument('--slow-latency', type=float, default=0, help='retard des réponses lentes du serveur local (ms)')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='proportion de réponses 429 du serveur local')
+    parser.add_argument('--error-rate', type=float, default=0, help='proportion de réponses 500 du serveur local')
+    parser.add_argument('--log-level', default='WARNING', help='niveau de log des crawls')
+    parser.add_argument('--output', help='fichier JSON où écrire les résultats')
+    parser.add_argument('--baseline', help='résultats de référence (JSON) à comparer')
+    parser.add_argument('--threshold', type=float, default=0.10, help='dégradation relative tolérée par rapport à la référence')
+    # Exécution d'un seul crawl, utilisée par le processus parent
+    parser.add_argument('--run-one', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--server-url', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        result = run_crawl(args.server_url, args.concurrency[0], not args.direct, args.without_database, args.adaptive, args.hedging, args.parse_pool, args.log_level)
+        save_json(args.result_file, result)
+        return
+
+    results = []
+    for books in args.books:
+        server = StandInServer(books=books, latency=args.latency / 1000, slow_rate=args.slow_rate, slow_latency=args.slow_latency / 1000,
+                                throttle_rate=args.throttle_rate, error_rate=args.error_rate).start()
+        try:
+            for concurrency in args.concurrency:
+                result = run_case(args, server, books, concurrency)
+                results.append(result)
+                print(f"books={books:<6} concurrency={concurrency:<4} {result['pages_per_s']:8.1f} pages/s {result['items_per_s']:8.1f} items/s "
+                      f"p50={result['latency_ms']['p50']:.1f}ms p95={result['latency_ms']['p95']:.1f}ms p99={result['latency_ms']['p99']:.1f}ms "
+                      f"rss={result['peak_rss_mb']:.0f}MB cpu={result['cpu_time_s']:.2f}s final_concurrency={result['final_concurrency']}", file=sys.stderr)
+        finally:
+            server.stop()
+
+    report = {'benchmark': 'crawl', 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+    if args.output:
+        save_json(args.output, report)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, load_json(args.baseline)['results'], ('books', 'concurrency'), COMPARED_METRICS, args.threshold)
+        for regression in regressions:
+            print(f'RÉGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'Aucune régression au-delà de {args.threshold:.0%} par rapport à {args.baseline}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
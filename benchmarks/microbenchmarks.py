@@ -0,0 +1,288 @@
+# Microbenchmarks des étapes du chemin critique : parsing, nettoyage et écriture en base.
+#
+# Cas mesurés :
+#   parse_product          BookSpider.parse sur les pages produit enregistrées (parsing lxml compris)
+#   parse_listing          BookSpider.parse_listing (mode 'listing') sur la page de liste enregistrée
+#   item_bookitem          construction d'un BookItem (scrapy.Item) : le pic d'allocation est sa taille en mémoire
+#   item_book              construction d'un Book (dataclass à __slots__), même mesure
+#   clean_legacy           ancien nettoyage (cinq méthodes clean_*, un ItemAdapter et un re.search par appel), sur BookItem
+#   clean_process_item     ProjectScrapyPipeline.process_item sur BookItem (un seul ItemAdapter)
+#   clean_process_book     ProjectScrapyPipeline.process_item sur Book (accès direct aux attributs)
+#   clean_batch_book       ProjectScrapyPipeline.clean_batch sur des lots de 100 Book (temps ramené à l'item)
+#   database_process_item  DataBasePipeline.process_item sur Book, lots compris, avec un pool en mémoire à la place de MySQL
+#   dupefilter_exact       RFPDupeFilter.request_seen (ensemble exact) sur des requêtes nouvelles
+#   dupefilter_bloom       BloomDupeFilter.request_seen (filtre de Bloom, capacité d'un million) sur les mêmes requêtes
+#
+# Pour chaque cas : ns par item (meilleure de --repeat séries de --number items), pic d'allocation
+# par item (tracemalloc, mémoire temporaire maximale pendant le traitement d'un item) et blocs
+# mémoire encore alloués par item après traitement (sys.getallocatedblocks).
+#
+# Usage :
+#   python -m benchmarks.microbenchmarks --output micro.json
+#   python -m benchmarks.microbenchmarks --baseline micro.json --threshold 0.15
+
+import argparse
+import copy
+import gc
+import os
+import re
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.http import HtmlResponse, Request
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+from twisted.internet import defer
+
+from benchmarks.common import FIXTURES_DIR, compare_to_baseline, load_json, load_product_pages, save_json
+from itemadapter import ItemAdapter
+
+from project_scrapy.dupefilters import BloomDupeFilter
+from project_scrapy.items import Book, BookItem
+from project_scrapy.pipelines import DataBasePipeline, ProjectScrapyPipeline
+from project_scrapy.spiders.bookspider import BookSpider
+
+
+# Taille des lots de clean_batch_book
+BATCH_SIZE = 100
+
+COMPARED_METRICS = {
+    'ns_per_item': 'lower',
+    'peak_alloc_bytes_per_item': 'lower',
+}
+
+
+class LegacyCleaner:
+    """Nettoyage d'origine de ProjectScrapyPipeline, conservé comme référence des mesures."""
+
+    def clean_currency(self, item, currency_col):
+        adapter = ItemAdapter(item)
+        currency_str = adapter.get(currency_col)
+        if currency_str is None:
+            return item
+        adapter[currency_col] = float(currency_str.replace('£', ''))
+        return item
+
+    def clean_availability(self, item):
+        adapter = ItemAdapter(item)
+        availability = adapter.get('availability')
+        if availability is None:
+            return item
+        match = re.search(r'(\d+)', availability)
+        if match:
+            adapter['availability'] = int(match.group(0))
+        elif 'out of stock' in availability.lower():
+            adapter['availability'] = 0
+        else:
+            adapter['availability'] = None
+        return item
+
+    def clean_number_of_reviews(self, item):
+        adapter = ItemAdapter(item)
+        if adapter.get('number_of_reviews') is None:
+            return item
+        adapter['number_of_reviews'] = int(adapter.get('number_of_reviews'))
+        return item
+
+    def process_item(self, item, spider):
+        item = self.clean_currency(item, 'price')
+        item = self.clean_currency(item, 'price_tax')
+        item = self.clean_currency(item, 'tax')
+        item = self.clean_availability(item)
+        item = self.clean_number_of_reviews(item)
+        return item
+
+
+class InProcessCursor:
+    """Curseur en mémoire qui imite les requêtes de DataBasePipeline._upsert_rows."""
+
+    def __init__(self, table):
+        self.table = table
+        self._result = []
+
+    def execute(self, query, args=()):
+        self._result = [(upc, self.table[upc][-1]) for upc in args if upc in self.table]
+
+    def fetchall(self):
+        return self._result
+
+    def executemany(self, query, rows):
+        for row in rows:
+            self.table[row[3]] = row
+
+
+class InProcessPool:
+    """Remplace adbapi.ConnectionPool : l'interaction est exécutée tout de suite, sans thread."""
+
+    def __init__(self):
+        self.table = {}
+
+    def runInteraction(self, interaction, *args):
+        return defer.succeed(interaction(InProcessCursor(self.table), *args))
+
+    def close(self):
+        pass
+
+
+def product_items():
+    spider = BookSpider()
+    return [ItemAdapter(item).asdict() for page in load_product_pages() for item in spider.parse(page)]
+
+
+def listing_response():
+    with open(os.path.join(FIXTURES_DIR, 'listing_index.html'), 'rb') as f:
+        body = f.read()
+    return HtmlResponse(url='https://books.toscrape.com/index.html', body=body, encoding='utf-8')
+
+
+def measure(prepare, run, number, repeat, items_per_input=1):
+    """
+    Mesure le temps et les allocations de run(input) pour chaque entrée préparée.
+    Args:
+        prepare (callable): Construit la liste des entrées (hors mesure).
+        run (callable): Le traitement mesuré, appelé une fois par entrée.
+        number (int): Le nombre d'items par série.
+        repeat (int): Le nombre de séries ; la plus rapide est retenue.
+        items_per_input (int): Le nombre d'items par entrée (taille des lots pour clean_batch_book).
+    Returns:
+        dict: ns_per_item, peak_alloc_bytes_per_item et allocated_blocks_per_item.
+    """
+    best = None
+    for _ in range(repeat):
+        inputs = prepare(number)
+        gc.collect()
+        start = time.perf_counter_ns()
+        for value in inputs:
+            run(value)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Pic d'allocation : mesuré item par item pour ne voir que la mémoire temporaire d'un traitement
+    sample = prepare(min(number, 200))
+    tracemalloc.start()
+    peaks = []
+    for value in sample:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        run(value)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    # Blocs encore alloués après traitement (résultats conservés)
+    sample = prepare(min(number, 200))
+    gc.collect()
+    gc.disable()
+    blocks_before = sys.getallocatedblocks()
+    outputs = [run(value) for value in sample]
+    blocks = sys.getallocatedblocks() - blocks_before
+    gc.enable()
+    del outputs
+
+    return {
+        'ns_per_item': best / number,
+        'peak_alloc_bytes_per_item': sum(peaks) / len(peaks) / items_per_input,
+        'allocated_blocks_per_item': blocks / len(sample) / items_per_input,
+    }
+
+
+def cases():
+    pages = load_product_pages()
+    listing = listing_response()
+    raw_items = product_items()
+    spider = BookSpider()
+    listing_spider = BookSpider(mode='listing')
+    cleaner = ProjectScrapyPipeline()
+    legacy_cleaner = LegacyCleaner()
+
+    def fresh_pages(number):
+        return [HtmlResponse(url=page.url, body=page.body, encoding='utf-8') for page in (pages * (number // len(pages) + 1))[:number]]
+
+    def fresh_listings(number):
+        return [HtmlResponse(url=listing.url, body=listing.body, encoding='utf-8') for _ in range(number)]
+
+    def fresh_items(number):
+        return [BookItem(copy.copy(raw_items[index % len(raw_items)])) for index in range(number)]
+
+    def fresh_books(number):
+        return [Book(**raw_items[index % len(raw_items)]) for index in range(number)]
+
+    def raw_dicts(number):
+        return [raw_items[index % len(raw_items)] for index in range(number)]
+
+    def fresh_batches(number):
+        books = fresh_books(number)
+        return [books[index:index + BATCH_SIZE] for index in range(0, len(books), BATCH_SIZE)]
+
+    def database_run():
+        settings = Settings({'DATABASE_BATCH_SIZE': 100, 'DATABASE_BATCH_MAX_AGE': 0})
+        pipeline = DataBasePipeline(settings, MemoryStatsCollector(SimpleNamespace(settings=settings)))
+        pipeline.dbpool = InProcessPool()
+        counter = iter(range(sys.maxsize))
+
+        def run(item):
+            # UPC unique par item : chaque item est une nouvelle ligne, comme au premier crawl
+            item.UPC = f"{item.UPC}-{next(counter)}"
+            return pipeline.process_item(item, spider)
+        return run
+
+    def cleaned_books(number):
+        return cleaner.clean_batch(fresh_books(number))
+
+    request_counter = iter(range(sys.maxsize))
+
+    def fresh_requests(number):
+        return [Request(f'https://books.toscrape.com/catalogue/book_{next(request_counter)}/index.html') for _ in range(number)]
+
+    yield 'parse_product', 'page', fresh_pages, lambda response: list(spider.parse(response))
+    yield 'parse_listing', 'page', fresh_listings, lambda response: list(listing_spider.parse_listing(response))
+    yield 'item_bookitem', 'item', raw_dicts, BookItem
+    yield 'item_book', 'item', raw_dicts, lambda raw: Book(**raw)
+    yield 'clean_legacy', 'item', fresh_items, lambda item: legacy_cleaner.process_item(item, spider)
+    yield 'clean_process_item', 'item', fresh_items, lambda item: cleaner.process_item(item, spider)
+    yield 'clean_process_book', 'item', fresh_books, lambda item: cleaner.process_item(item, spider)
+    yield 'clean_batch_book', 'batch', fresh_batches, cleaner.clean_batch
+    yield 'database_process_item', 'item', cleaned_books, database_run()
+    yield 'dupefilter_exact', 'item', fresh_requests, RFPDupeFilter().request_seen
+    yield 'dupefilter_bloom', 'item', fresh_requests, BloomDupeFilter().request_seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks du parsing, du nettoyage et de l\'écriture en base')
+    parser.add_argument('--number', type=int, default=2000, help='items par série')
+    parser.add_argument('--repeat', type=int, default=5, help='nombre de séries (la plus rapide est retenue)')
+    parser.add_argument('--only', nargs='*', help='noms des cas à exécuter')
+    parser.add_argument('--output', help='fichier JSON où écrire les résultats')
+    parser.add_argument('--baseline', help='résultats de référence (JSON) à comparer')
+    parser.add_argument('--threshold', type=float, default=0.15, help='dégradation relative tolérée par rapport à la référence')
+    args = parser.parse_args()
+
+    results = []
+    for name, unit, prepare, run in cases():
+        if args.only and name not in args.only:
+            continue
+        number = args.number if unit in ('item', 'batch') else max(args.number // 10, 10)
+        items_per_input = BATCH_SIZE if unit == 'batch' else 1
+        result = {'case': name, 'unit': unit, 'number': number, **measure(prepare, run, number, args.repeat, items_per_input)}
+        results.append(result)
+        # Lots : résultats ramenés à l'item
+        label = 'item' if unit == 'batch' else unit
+        print(f"{name:24} {result['ns_per_item']:12.0f} ns/{label:4} {result['peak_alloc_bytes_per_item']:10.0f} o pic/{label:4} "
+              f"{result['allocated_blocks_per_item']:8.1f} blocs/{label}")
+
+    if args.output:
+        save_json(args.output, {'benchmark': 'micro', 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results})
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, load_json(args.baseline)['results'], ('case',), COMPARED_METRICS, args.threshold)
+        for regression in regressions:
+            print(f'RÉGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'Aucune régression au-delà de {args.threshold:.0%} par rapport à {args.baseline}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,605 @@
+# Serveur local qui imite books.toscrape.com (et les API ScrapeOps) pour les tests de charge hors ligne.
+#
+# Le catalogue est généré de façon déterministe avec le même balisage que le vrai site :
+# pages de liste (article.product_pod, ul.pager, li.next), pages produit (tableau
+# "table table-striped") et couvertures (/media/cache/..., une image PNG par catégorie :
+# les livres d'une même catégorie partagent leur couverture). Latence, taux d'erreurs
+# 500 / 429 et ETag sont configurables.
+#
+# Le même serveur répond aussi comme :
+#   - proxy ScrapeOps : /v1/?api_key=...&url=<url cible>, la page servie est celle du chemin de l'url cible
+#   - API d'en-têtes ScrapeOps : /v1/user-agents et /v1/browser-headers
+# Les compteurs de requêtes sont exposés en JSON sur /__stats.
+#
+# Usage :
+#   python -m benchmarks.standin_server --port 8000 --books 1000 --latency 50 --throttle-rate 0.02 --etag
+#
+# Crawl direct :
+#   scrapy crawl bookspider -a start_url=http://127.0.0.1:8000/ -s SCRAPEOPS_PROXY_ENABLED=False
+# Crawl à travers le faux proxy (middlewares ScrapeOps compris) :
+#   scrapy crawl bookspider -s SCRAPEOPS_API_KEY=test \
+#       -s SCRAPEOPS_FAKE_PROXY_ENDPOINT='http://127.0.0.1:8000/v1/?' \
+#       -s SCRAPEOPS_FAKE_HEADERS_ENDPOINT='http://127.0.0.1:8000/v1/browser-headers?' \
+#       -s SCRAPEOPS_FAKE_USER_AGENT_ENDPOINT='http://127.0.0.1:8000/v1/user-agents?'
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from email.utils import formatdate
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+BOOKS_PER_PAGE = 20
+RATINGS = ('One', 'Two', 'Three', 'Four', 'Five')
+CATEGORIES = ('Travel', 'Mystery', 'Historical Fiction', 'Poetry', 'Fiction', 'Science', 'Humor', 'Fantasy')
+WORDS = (
+    'light', 'attic', 'velvet', 'objects', 'history', 'requiem', 'secrets', 'boat', 'hearts', 'sonnets',
+    'pilgrim', 'band', 'olio', 'science', 'himalayas', 'night', 'river', 'garden', 'winter', 'shadow',
+    'house', 'journey', 'silence', 'ocean', 'mountain', 'letters', 'stars', 'empire', 'machine', 'forest',
+)
+
+PAGE_HEAD = '''<!DOCTYPE html>
+<!--[if lt IE 7]>      <html lang="en-us" class="no-js lt-ie9 lt-ie8 lt-ie7"> <![endif]-->
+<!--[if gt IE 8]><!--> <html lang="en-us" class="no-js"> <!--<![endif]-->
+    <head>
+        <title>
+    {title} | Books to Scrape - Sandbox
+</title>
+        <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+        <meta name="viewport" content="width=device-width" />
+        <meta name="robots" content="NOARCHIVE,NOCACHE" />
+            <link rel="shortcut icon" href="{root}static/oscar/favicon.ico" />
+            <link rel="stylesheet" type="text/css" href="{root}static/oscar/css/styles.css" />
+    </head>
+    <body id="default" class="default">
+        <header class="header container-fluid">
+            <div class="page_inner">
+                <div class="row">
+                    <div class="col-sm-8 h1"><a href="{root}index.html">Books to Scrape</a><small> We love being scraped!</small>
+</div>
+                </div>
+            </div>
+        </header>
+<div class="container-fluid page">
+    <div class="page_inner">
+'''
+
+PAGE_FOOT = '''    </div><!-- /page_inner -->
+</div><!-- /container-fluid -->
+<footer class="footer container-fluid">
+</footer>
+        <script src="http://ajax.googleapis.com/ajax/libs/jquery/1.9.1/jquery.min.js"></script>
+        <script type="text/javascript" src="{root}static/oscar/js/bootstrap3/bootstrap.min.js"></script>
+        <script src="{root}static/oscar/js/oscar/ui.js" type="text/javascript" charset="utf-8"></script>
+    </body>
+</html>
+'''
+
+PRODUCT_POD = '''
+                <li class="col-xs-6 col-sm-4 col-md-3 col-lg-3">
+    <article class="product_pod">
+            <div class="image_container">
+                    <a href="{link}"><img src="{root}media/cache/{image}.jpg" alt="{title}" class="thumbnail"></a>
+            </div>
+                <p class="star-rating {rating}">
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                </p>
+            <h3><a href="{link}" title="{title}">{short_title}</a></h3>
+            <div class="product_price">
+        <p class="price_color">£{price:.2f}</p>
+<p class="instock availability">
+    <i class="icon-ok"></i>
+        In stock
+</p>
+    <form>
+        <button type="submit" class="btn btn-primary btn-block" data-loading-text="Adding...">Add to basket</button>
+    </form>
+            </div>
+    </article>
+</li>
+'''
+
+LISTING_BODY = '''
+    <ul class="breadcrumb">
+        <li>
+            <a href="{root}index.html">Home</a>
+        </li>
+        <li class="active">All products</li>
+    </ul>
+        <div class="row">
+            <aside class="sidebar col-sm-4 col-md-3">
+    <div class="side_categories">
+        <ul class="nav nav-list">
+                <li>
+                    <a href="{root}catalogue/category/books_1/index.html">
+                            Books
+                    </a>
+                </li>
+        </ul>
+    </div>
+            </aside>
+            <div class="col-sm-8 col-md-9">
+                <div class="page-header action">
+                    <h1>All products</h1>
+                </div>
+    <form method="get" class="form-horizontal">
+                <strong>{count}</strong> results - showing <strong>{first}</strong> to <strong>{last}</strong>.
+    </form>
+        <section>
+            <div class="alert alert-warning" role="alert"><strong>Warning!</strong> This is a demo website for web scraping purposes. Prices and ratings here were randomly assigned and have no real meaning.</div>
+            <div>
+                <ol class="row">
+{pods}
+                </ol>
+                    <div>
+                        <ul class="pager">
+{previous}
+                            <li class="current">
+                                Page {page} of {page_count}
+                            </li>
+{next}
+                        </ul>
+                    </div>
+            </div>
+        </section>
+            </div>
+        </div><!-- /row -->
+'''
+
+PRODUCT_BODY = '''
+    <ul class="breadcrumb">
+        <li>
+            <a href="../../index.html">Home</a>
+        </li>
+        <li>
+            <a href="../category/books_1/index.html">Books</a>
+        </li>
+        <li>
+            <a href="../category/books/{category_slug}/index.html">{category}</a>
+        </li>
+        <li class="active">{title}</li>
+    </ul>
+            <div id="messages">
+</div>
+            <div class="content">
+                <div id="promotions">
+                </div>
+                <div id="content_inner">
+<article class="product_page"><!-- Start of product page -->
+    <div class="row">
+        <div class="col-sm-6">
+<div id="product_gallery" class="carousel">
+    <div class="thumbnail">
+        <div class="carousel-inner">
+                <div class="item active">
+                    <img src="../../media/cache/{image}.jpg" alt="{title}" />
+                </div>
+        </div>
+    </div>
+</div>
+        </div>
+        <div class="col-sm-6 product_main">
+            <h1>{title}</h1>
+<p class="price_color">£{price:.2f}</p>
+<p class="instock availability">
+    <i class="icon-ok"></i>
+        In stock ({stock} available)
+</p>
+    <p class="star-rating {rating}">
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+    </p>
+            <hr/>
+<div class="alert alert-warning" role="alert"><strong>Warning!</strong> This is a demo website for web scraping purposes. Prices and ratings here were randomly assigned and have no real meaning.</div>
+        </div><!-- /col-sm-6 -->
+    </div><!-- /row -->
+    <div id="product_description" class="sub-header">
+        <h2>Product Description</h2>
+    </div>
+    <p>{description}</p>
+    <div class="sub-header">
+        <h2>Product Information</h2>
+    </div>
+    <table class="table table-striped">
+        <tr>
+            <th>UPC</th><td>{upc}</td>
+        </tr>
+        <tr>
+            <th>Product Type</th><td>Books</td>
+        </tr>
+            <tr>
+                <th>Price (excl. tax)</th><td>£{price:.2f}</td>
+            </tr>
+                <tr>
+                    <th>Price (incl. tax)</th><td>£{price:.2f}</td>
+                </tr>
+                <tr>
+                    <th>Tax</th><td>£0.00</td>
+                </tr>
+        <tr>
+            <th>Availability</th>
+            <td>In stock ({stock} available)</td>
+        </tr>
+        <tr>
+            <th>Number of reviews</th>
+            <td>0</td>
+        </tr>
+    </table>
+            <div class="sub-header">
+                <h2>Products you recently viewed</h2>
+            </div>
+</article><!-- End of product page -->
+                </div>
+            </div>
+'''
+
+USER_AGENTS = [
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:126.0) Gecko/20100101 Firefox/126.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15',
+]
+
+
+def cover_png(seed, width=120, height=180):
+    """
+    Construit une couverture PNG unie, de couleur déterminée par seed (sans dépendance d'imagerie).
+    Args:
+        seed (str): La graine de la couleur.
+        width (int): La largeur en pixels.
+        height (int): La hauteur en pixels.
+    Returns:
+        bytes: Le contenu du fichier PNG.
+    """
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    color = hashlib.sha1(seed.encode()).digest()[:3]
+    rows = (b'\x00' + color * width) * height
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+class Catalogue:
+    """
+    Catalogue de livres généré de façon déterministe et rendu avec le balisage de books.toscrape.com.
+
+    Attributs:
+        size (int): Le nombre de livres.
+        page_count (int): Le nombre de pages de liste.
+        books (list): Les livres (dict), du plus récent (id le plus grand) au plus ancien.
+    """
+
+    def __init__(self, size, seed=0, js_rate=0.0):
+        self.size = size
+        self.page_count = max(math.ceil(size / BOOKS_PER_PAGE), 1)
+        self.books = [self._make_book(book_id, seed, js_rate) for book_id in range(size, 0, -1)]
+        self.books_by_slug = {book['slug']: book for book in self.books}
+        self.books_by_image = {book['image']: book for book in self.books}
+        self.covers = {}
+
+    @staticmethod
+    def _make_book(book_id, seed, js_rate=0.0):
+        rng = random.Random(f'{seed}-{book_id}')
+        words = [rng.choice(WORDS) for _ in range(rng.randint(2, 6))]
+        title = ' '.join(words).title()
+        category = rng.choice(CATEGORIES)
+        digest = hashlib.sha1(f'{seed}-{book_id}'.encode()).hexdigest()
+        return {
+            'id': book_id,
+            'slug': f"{'-'.join(words)}_{book_id}",
+            'title': title,
+            'short_title': title if len(title) < 20 else f'{title[:17]} ...',
+            'category': category,
+            'category_slug': f"{category.lower().replace(' ', '-')}_{CATEGORIES.index(category) + 2}",
+            'image': f'{digest[:2]}/{digest[2:4]}/{digest[8:40]}',
+            'price': rng.uniform(10, 60),
+            'stock': rng.randint(1, 22),
+            'rating': rng.choice(RATINGS),
+            'upc': digest[:16],
+            'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(80, 200))).capitalize() + ' ...more',
+            # Tableau "Product Information" chargé en JavaScript : absent sans render_js
+            'js_only': rng.random() < js_rate,
+        }
+
+    def listing_page(self, page, in_catalogue):
+        """
+        Rend une page de liste.
+        Args:
+            page (int): Le numéro de page (à partir de 1).
+            in_catalogue (bool): True pour /catalogue/page-N.html, False pour /index.html (liens relatifs différents).
+        Returns:
+            str: Le HTML de la page, ou None si la page n'existe pas.
+        """
+        if page < 1 or page > self.page_count:
+            return None
+        root = '../' if in_catalogue else ''
+        prefix = '' if in_catalogue else 'catalogue/'
+        first = (page - 1) * BOOKS_PER_PAGE
+        books = self.books[first:first + BOOKS_PER_PAGE]
+        pods = ''.join(
+            PRODUCT_POD.format(
+                link=f"{prefix}{book['slug']}/index.html",
+                root=root,
+                image=book['image'],
+                title=escape(book['title']),
+                short_title=escape(book['short_title']),
+                rating=book['rating'],
+                price=book['price'],
+            )
+            for book in books
+        )
+        previous = f'                                <li class="previous"><a href="{prefix}page-{page - 1}.html">previous</a></li>' if page > 1 else ''
+        next_link = f'                                <li class="next"><a href="{prefix}page-{page + 1}.html">next</a></li>' if page < self.page_count else ''
+        body = LISTING_BODY.format(
+            root=root, count=self.size, first=first + 1, last=first + len(books), pods=pods,
+            previous=previous, page=page, page_count=self.page_count, next=next_link,
+        )
+        return PAGE_HEAD.format(title='All products', root=root) + body + PAGE_FOOT.format(root=root)
+
+    def product_page(self, slug, rendered=True):
+        """
+        Rend une page produit.
+        Args:
+            slug (str): L'identifiant du livre dans l'URL (ex : a-light-in-the-attic_1000).
+            rendered (bool): Page rendue par un navigateur (render_js) ; sinon, le tableau des
+                livres 'js_only' est remplacé par un conteneur vide.
+        Returns:
+            str: Le HTML de la page, ou None si le livre n'existe pas.
+        """
+        book = self.books_by_slug.get(slug)
+        if book is None:
+            return None
+        escaped = dict(book, title=escape(book['title']), description=escape(book['description']))
+        body = PRODUCT_BODY.format(**escaped)
+        if book['js_only'] and not rendered:
+            body = re.sub(r'<table class="table table-striped">.*?</table>', '<div id="product_information"></div>', body, flags=re.S)
+        return PAGE_HEAD.format(title=escaped['title'], root='../../') + body + PAGE_FOOT.format(root='../../')
+
+    def cover(self, path):
+        """
+        Retourne la couverture servie à un chemin /media/cache/<image>.jpg.
+        Args:
+            path (str): Le chemin demandé.
+        Returns:
+            bytes: L'image PNG (la même pour tous les livres d'une catégorie), ou None pour un autre chemin.
+        """
+        match = re.fullmatch(r'/media/cache/(.+)\.jpg', path)
+        book = self.books_by_image.get(match.group(1)) if match else None
+        if book is None:
+            return None
+        if book['category'] not in self.covers:
+            self.covers[book['category']] = cover_png(book['category'])
+        return self.covers[book['category']]
+
+    def render(self, path, rendered=True):
+        """
+        Rend la page correspondant à un chemin du site.
+        Args:
+            path (str): Le chemin demandé (ex : /catalogue/page-2.html).
+            rendered (bool): Page rendue par un navigateur (voir product_page).
+        Returns:
+            str: Le HTML de la page, ou None pour une page inconnue.
+        """
+        if path in ('', '/', '/index.html'):
+            return self.listing_page(1, in_catalogue=False)
+        match = re.fullmatch(r'/catalogue/page-(\d+)\.html', path)
+        if match:
+            return self.listing_page(int(match.group(1)), in_catalogue=True)
+        match = re.fullmatch(r'/catalogue/([^/]+)/index\.html', path)
+        if match:
+            return self.product_page(match.group(1), rendered)
+        return None
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = 'nginx/1.21.6'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body=b'', content_type='text/html; charset=utf-8', headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_json(self, data):
+        self._send(200, json.dumps(data).encode('utf-8'), 'application/json')
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        server.count('requests')
+
+        if url.path == '/__stats':
+            return self._send_json(server.snapshot())
+        if url.path in ('/v1/user-agents', '/v1/browser-headers'):
+            server.count('headers_api')
+            if url.path == '/v1/user-agents':
+                return self._send_json({'result': USER_AGENTS})
+            return self._send_json({'result': [{'user-agent': user_agent, 'accept-language': 'en-US,en;q=0.9'} for user_agent in USER_AGENTS]})
+
+        path = url.path
+        rendered = False
+        # Comme ScrapeOps, le proxy ne transmet les en-têtes du client au site qu'avec keep_headers
+        request_headers = self.headers
+        if url.path in ('/v1', '/v1/'):
+            server.count('proxy')
+            if not query.get('api_key') or not query.get('url'):
+                return self._send(401, b'{"error": "api_key and url are required"}', 'application/json')
+            path = urlsplit(query['url'][0]).path
+            rendered = query.get('render_js', [''])[0].lower() == 'true'
+            if query.get('keep_headers', [''])[0].lower() != 'true':
+                request_headers = {}
+            session = query.get('session_number', [''])[0]
+            if session:
+                server.count('proxy_sessions')
+                # IP de sortie bloquée par le site : toutes les requêtes de la session sont refusées
+                if server.session_is_blocked(session):
+                    server.count('status_403')
+                    return self._send(403, b'Forbidden', 'text/plain')
+
+        if server.latency > 0:
+            time.sleep(max(0.0, random.gauss(server.latency, server.latency * server.latency_jitter)))
+        # Queue de latence : quelques réponses très lentes (proxy saturé, page lente)
+        if server.slow_rate > 0 and random.random() < server.slow_rate:
+            server.count('slow')
+            time.sleep(server.slow_latency)
+        roll = random.random()
+        if roll < server.throttle_rate:
+            server.count('status_429')
+            return self._send(429, b'Too Many Requests', 'text/plain', [('Retry-After', '1')])
+        if roll < server.throttle_rate + server.error_rate:
+            server.count('status_500')
+            return self._send(500, b'Internal Server Error', 'text/plain')
+
+        content_type = 'text/html; charset=utf-8'
+        body = server.catalogue.cover(path)
+        if body is not None:
+            server.count('covers')
+            content_type = 'image/png'
+        else:
+            page = server.catalogue.render(path, rendered)
+            if page is None:
+                server.count('status_404')
+                return self._send(404, b'Not Found', 'text/plain')
+            body = page.encode('utf-8')
+        headers = []
+        if server.etag:
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            headers = [('ETag', etag), ('Last-Modified', server.last_modified)]
+            if request_headers.get('If-None-Match') == etag or request_headers.get('If-Modified-Since') == server.last_modified:
+                server.count('status_304')
+                return self._send(304, headers=headers)
+        server.count('status_200')
+        return self._send(200, body, content_type, headers=headers)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Serveur HTTP local imitant books.toscrape.com, le proxy et l'API d'en-têtes ScrapeOps.
+
+    Attributs:
+        catalogue (Catalogue): Le catalogue servi.
+        latency (float): La latence moyenne ajoutée à chaque page, en secondes.
+        latency_jitter (float): L'écart-type de la latence, en fraction de la moyenne.
+        slow_rate (float): La proportion de réponses retardées de slow_latency.
+        slow_latency (float): Le retard des réponses lentes, en secondes.
+        error_rate (float): La proportion de réponses 500.
+        throttle_rate (float): La proportion de réponses 429.
+        js_rate (float): La proportion de pages produit dont le tableau n'apparaît qu'avec render_js (proxy).
+        blocked_session_rate (float): La proportion de sessions du proxy (session_number) bloquées (403).
+        etag (bool): Envoie ETag / Last-Modified et répond 304 aux requêtes conditionnelles.
+
+    Méthodes:
+        start(): Démarre le serveur dans un thread.
+        stop(): Arrête le serveur.
+        snapshot(): Retourne les compteurs de requêtes.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, books=1000, latency=0.0, latency_jitter=0.2, slow_rate=0.0, slow_latency=0.0,
+                 error_rate=0.0, throttle_rate=0.0, js_rate=0.0, blocked_session_rate=0.0, etag=False, seed=0, verbose=False):
+        super().__init__((host, port), StandInHandler)
+        self.catalogue = Catalogue(books, seed, js_rate)
+        self.blocked_session_rate = blocked_session_rate
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.etag = etag
+        self.verbose = verbose
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.counters = {}
+        self._counters_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def session_is_blocked(self, session):
+        digest = hashlib.sha1(f'session-{session}'.encode()).digest()
+        return digest[0] / 256 < self.blocked_session_rate
+
+    def count(self, key):
+        with self._counters_lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._counters_lock:
+            return dict(self.counters)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serveur local imitant books.toscrape.com et les API ScrapeOps')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--books', type=int, default=1000, help='taille du catalogue')
+    parser.add_argument('--latency', type=float, default=0, help='latence moyenne par page (ms)')
+    parser.add_argument('--latency-jitter', type=float, default=0.2, help='écart-type de la latence, en fraction de la moyenne')
+    parser.add_argument('--slow-rate', type=float, default=0, help='proportion de réponses lentes')
+    parser.add_argument('--slow-latency', type=float, default=0, help='retard des réponses lentes (ms)')
+    parser.add_argument('--error-rate', type=float, default=0, help='proportion de réponses 500')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='proportion de réponses 429')
+    parser.add_argument('--blocked-session-rate', type=float, default=0, help='proportion de sessions du proxy bloquées (403)')
+    parser.add_argument('--js-rate', type=float, default=0, help='proportion de pages produit rendues en JavaScript')
+    parser.add_argument('--etag', action='store_true', help='ETag / Last-Modified et réponses 304')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='journalise chaque requête')
+    args = parser.parse_args()
+
+    server = StandInServer(
+        args.host, args.port, books=args.books, latency=args.latency / 1000, latency_jitter=args.latency_jitter,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency / 1000, error_rate=args.error_rate, throttle_rate=args.throttle_rate, js_rate=args.js_rate, blocked_session_rate=args.blocked_session_rate, etag=args.etag, seed=args.seed, verbose=args.verbose,
+    )
+    print(f'Catalogue de {args.books} livres ({server.catalogue.page_count} pages) sur {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
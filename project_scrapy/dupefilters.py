@@ -0,0 +1,215 @@
+# Filtres de doublons du projet
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/settings.html#dupefilter-class
+
+import json
+import logging
+import math
+import os
+
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.utils.job import job_dir
+
+
+logger = logging.getLogger(__name__)
+
+
+# Taille d'une empreinte dans l'ensemble exact de RFPDupeFilter (chaîne hexadécimale de 40 caractères)
+EXACT_FINGERPRINT_BYTES = 89
+
+
+def exact_set_bytes(count):
+    """
+    Estime la mémoire de l'ensemble exact d'empreintes de RFPDupeFilter.
+    Args:
+        count (int): Le nombre d'empreintes.
+    Returns:
+        int: La taille estimée en octets (table du set CPython et chaînes hexadécimales).
+    """
+    # La table d'un set CPython (16 octets par case) est agrandie dès qu'elle est remplie aux 3/5
+    slots = 8
+    while slots * 3 <= count * 5:
+        slots *= 4 if count < 50000 else 2
+    return 200 + 16 * slots + count * EXACT_FINGERPRINT_BYTES
+
+
+class BloomDupeFilter(RFPDupeFilter):
+    """
+    Filtre de doublons (DUPEFILTER_CLASS) à mémoire bornée, fondé sur un filtre de Bloom.
+
+    RFPDupeFilter garde chaque empreinte dans un set (environ 200 octets par requête) : sa
+    mémoire croît avec le catalogue. Ici, la mémoire est fixée à l'ouverture par la capacité
+    DUPEFILTER_BLOOM_CAPACITY et le taux de faux positifs DUPEFILTER_BLOOM_ERROR_RATE
+    (environ 1,8 Mo pour un million de requêtes à 0,1 %). Un faux positif fait ignorer une
+    requête jamais vue ; au-delà de la capacité, le taux de faux positifs augmente (un
+    avertissement est journalisé).
+
+    Ce filtre n'est pas celui par défaut : il est prévu pour les très grands crawls
+    reprenables (CheckpointScheduler et JOBDIR), avec -s DUPEFILTER_CLASS=...BloomDupeFilter.
+    Avec JOBDIR, les bits du filtre sont enregistrés dans <JOBDIR>/requests.bloom à la
+    fermeture et à chaque appel de checkpoint() (CheckpointScheduler l'appelle
+    périodiquement), puis rechargés au démarrage suivant.
+
+    Statistiques : dupefilter/fingerprints, dupefilter/bloom_bytes,
+    dupefilter/exact_set_bytes (estimation pour RFPDupeFilter) et
+    dupefilter/false_positive_rate (estimé d'après le remplissage).
+
+    Attributs:
+        capacity (int): Le nombre de requêtes prévu.
+        error_rate (float): Le taux de faux positifs visé à pleine capacité.
+        size (int): Le nombre de bits du filtre.
+        hashes (int): Le nombre de bits positionnés par empreinte.
+        bits (bytearray): Les bits du filtre.
+        count (int): Le nombre d'empreintes ajoutées.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le filtre à partir des paramètres du crawler.
+        request_seen(request): Indique si la requête a (probablement) déjà été vue, et l'ajoute sinon.
+        checkpoint(): Enregistre le filtre dans JOBDIR.
+        memory_report(): Retourne la mémoire du filtre et celle de l'ensemble exact équivalent.
+        close(reason): Enregistre le filtre et journalise sa mémoire.
+    """
+
+    def __init__(self, path=None, debug=False, *, fingerprinter=None, capacity=1000000, error_rate=0.001, stats=None):
+        """
+        Initialise le filtre BloomDupeFilter, rechargé depuis JOBDIR s'il y a été enregistré.
+        Args:
+            path (str): Le dossier JOBDIR, ou None pour un filtre en mémoire seulement.
+            debug (bool): Journaliser chaque doublon filtré (DUPEFILTER_DEBUG).
+            fingerprinter: Le calculateur d'empreintes des requêtes du crawler.
+            capacity (int): Le nombre de requêtes prévu.
+            error_rate (float): Le taux de faux positifs visé à pleine capacité.
+            stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        """
+        # RFPDupeFilter sans JOBDIR : pas de fichier requests.seen
+        super().__init__(None, debug, fingerprinter=fingerprinter)
+        self.stats = stats
+        self.path = os.path.join(path, 'requests.bloom') if path else None
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = min(max(float(error_rate), 1e-9), 0.5)
+        self.size = math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2)
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.overflow_logged = False
+        if self.path and os.path.exists(self.path):
+            self._load()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le filtre à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            BloomDupeFilter: Une instance du filtre initialisée avec les paramètres du crawler.
+        """
+        settings = crawler.settings
+        if not job_dir(settings):
+            logger.warning('BloomDupeFilter sans JOBDIR : filtre non enregistré, et un faux positif écarte une requête sans erreur')
+        return cls(
+            job_dir(settings),
+            settings.getbool('DUPEFILTER_DEBUG'),
+            fingerprinter=crawler.request_fingerprinter,
+            capacity=settings.getint('DUPEFILTER_BLOOM_CAPACITY', 1000000),
+            error_rate=settings.getfloat('DUPEFILTER_BLOOM_ERROR_RATE', 0.001),
+            stats=crawler.stats,
+        )
+
+    def _positions(self, fingerprint):
+        # Double hachage (Kirsch-Mitzenmacher) : l'empreinte SHA-1 fournit les deux hachages
+        h1 = int.from_bytes(fingerprint[:8], 'big')
+        h2 = int.from_bytes(fingerprint[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def request_seen(self, request):
+        """
+        Indique si la requête a déjà été vue, et l'ajoute au filtre sinon.
+        Args:
+            request (scrapy.http.Request): La requête à planifier.
+        Returns:
+            bool: True si la requête a probablement déjà été vue (faux positif possible), False si elle est nouvelle.
+        """
+        bits = self.bits
+        seen = True
+        for position in self._positions(self.fingerprinter.fingerprint(request)):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                seen = False
+        if not seen:
+            self.count += 1
+            if self.count > self.capacity and not self.overflow_logged:
+                self.logger.warning(f'Filtre de Bloom plein ({self.capacity} requêtes) : le taux de faux positifs augmente, '
+                                    f'augmenter DUPEFILTER_BLOOM_CAPACITY')
+                self.overflow_logged = True
+        return seen
+
+    def false_positive_rate(self):
+        """
+        Estime le taux de faux positifs actuel.
+        Returns:
+            float: La probabilité qu'une requête jamais vue soit filtrée.
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def memory_report(self):
+        """
+        Retourne la mémoire du filtre et celle de l'ensemble exact équivalent, et les enregistre dans les statistiques.
+        Returns:
+            dict: fingerprints, bloom_bytes, exact_set_bytes et false_positive_rate.
+        """
+        report = {
+            'fingerprints': self.count,
+            'bloom_bytes': len(self.bits),
+            'exact_set_bytes': exact_set_bytes(self.count),
+            'false_positive_rate': self.false_positive_rate(),
+        }
+        if self.stats is not None:
+            for key, value in report.items():
+                self.stats.set_value(f'dupefilter/{key}', value)
+        return report
+
+    def checkpoint(self):
+        """
+        Enregistre le filtre dans <JOBDIR>/requests.bloom (remplacement atomique du fichier).
+        """
+        self.memory_report()
+        if not self.path:
+            return
+        header = {'size': self.size, 'hashes': self.hashes, 'count': self.count, 'capacity': self.capacity, 'error_rate': self.error_rate}
+        with open(f'{self.path}.tmp', 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(self.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            header = json.loads(f.readline())
+            bits = bytearray(f.read())
+        if (header['size'], header['hashes']) != (self.size, self.hashes):
+            # Les bits ne peuvent pas être redimensionnés : le filtre garde les paramètres du premier crawl
+            self.logger.warning(f"Filtre de Bloom {self.path} créé pour {header['capacity']} requêtes à {header['error_rate']} : "
+                                f"DUPEFILTER_BLOOM_CAPACITY et DUPEFILTER_BLOOM_ERROR_RATE sont ignorés pour ce JOBDIR")
+            self.capacity = header['capacity']
+            self.error_rate = header['error_rate']
+            self.size = header['size']
+            self.hashes = header['hashes']
+        self.bits = bits
+        self.count = header['count']
+        self.logger.info(f'Filtre de Bloom rechargé depuis {self.path} : {self.count} requêtes déjà vues')
+
+    def close(self, reason):
+        """
+        Enregistre le filtre dans JOBDIR et journalise sa mémoire à côté de celle de l'ensemble exact.
+        Args:
+            reason (str): La raison de la fermeture du spider.
+        """
+        self.checkpoint()
+        report = self.memory_report()
+        self.logger.info(f"Filtre de Bloom : {report['fingerprints']} requêtes, {report['bloom_bytes'] / 1024:.0f} Ko "
+                         f"(ensemble exact : {report['exact_set_bytes'] / 1024:.0f} Ko), "
+                         f"taux de faux positifs estimé {report['false_positive_rate']:.2e}")
@@ -0,0 +1,156 @@
+# Exporteurs de flux du projet
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/exporters.html
+
+import logging
+
+from scrapy.exporters import BaseItemExporter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from project_scrapy.items import BOOK_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+# Types des colonnes des livres, après nettoyage par ProjectScrapyPipeline
+BOOK_COLUMN_TYPES = {
+    'title': 'string',
+    'image': 'string',
+    'description': 'string',
+    'UPC': 'string',
+    'product_type': 'string',
+    'price': 'float64',
+    'price_tax': 'float64',
+    'tax': 'float64',
+    'availability': 'int32',
+    'number_of_reviews': 'int32',
+    'image_url': 'string',
+    'image_path': 'string',
+    'image_hash': 'string',
+}
+
+
+class ParquetItemExporter(BaseItemExporter):
+    """
+    Exporteur de flux au format Parquet (colonnes typées, écriture en continu pendant le crawl).
+
+    Les items sont accumulés colonne par colonne et écrits par groupes de lignes
+    (row groups) de row_group_size items : la mémoire utilisée ne dépend pas de la
+    taille du crawl. Chaque colonne est stockée et compressée séparément, avec ses
+    statistiques min/max : lire les prix ne lit pas les descriptions.
+
+    Les champs des livres ont les types de BOOK_COLUMN_TYPES (prix en float64,
+    disponibilité et nombre d'avis en int32), ce qui suppose que ProjectScrapyPipeline
+    a nettoyé les items. Le type des autres champs est déduit de leur première valeur
+    non vide (texte si le champ est toujours vide). Chaque valeur est vérifiée à l'ajout
+    de son item : une valeur incompatible avec le type de sa colonne est remplacée par une
+    valeur vide, avec un avertissement, pour ne pas perdre le groupe de lignes entier.
+    Les colonnes sont celles de FEED_EXPORT_FIELDS, à défaut les champs de Book.
+
+    Nécessite le paquet pyarrow (pip install pyarrow). Options, à passer dans
+    item_export_kwargs de FEEDS :
+        row_group_size (int): Le nombre d'items par groupe de lignes (10000 par défaut).
+        compression (str): 'zstd' (par défaut), 'snappy', 'gzip', 'brotli', 'lz4' ou 'none'.
+        compression_level (int): Le niveau de compression, None pour celui de la bibliothèque.
+
+    Méthodes:
+        start_exporting(): Prépare les colonnes.
+        export_item(item): Ajoute un item au groupe de lignes en cours.
+        finish_exporting(): Écrit le dernier groupe de lignes et le pied de page du fichier.
+    """
+
+    def __init__(self, file, *, row_group_size=10000, compression='zstd', compression_level=None, **kwargs):
+        """
+        Initialise l'exporteur ParquetItemExporter.
+        Args:
+            file: Le fichier binaire ouvert par le stockage du flux.
+            row_group_size (int): Le nombre d'items par groupe de lignes.
+            compression (str): L'algorithme de compression des colonnes.
+            compression_level (int): Le niveau de compression.
+            **kwargs: Les options de BaseItemExporter (fields_to_export, export_empty_fields...).
+        Raises:
+            ImportError: Si pyarrow n'est pas installé.
+        """
+        if pyarrow is None:
+            raise ImportError("L'export Parquet nécessite le paquet pyarrow (pip install pyarrow)")
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.row_group_size = max(int(row_group_size), 1)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.columns = None
+        self.column_types = {}
+        self.schema = None
+        self.writer = None
+        self.row_count = 0
+
+    def start_exporting(self):
+        if not self.fields_to_export:
+            self.fields_to_export = list(BOOK_FIELDS)
+        # fields_to_export peut associer un nom de colonne à chaque champ
+        if isinstance(self.fields_to_export, dict):
+            columns = self.fields_to_export.values()
+        else:
+            columns = self.fields_to_export
+        self.columns = {column: [] for column in columns}
+        self.column_types = {column: pyarrow.type_for_alias(BOOK_COLUMN_TYPES[column]) for column in self.columns if column in BOOK_COLUMN_TYPES}
+
+    def export_item(self, item):
+        for column, value in self._get_serialized_fields(item, default_value=None, include_empty=True):
+            self.columns[column].append(self._checked_value(column, value))
+        self.row_count += 1
+        if self.row_count >= self.row_group_size:
+            self._write_row_group()
+
+    def finish_exporting(self):
+        # Flux vide : le fichier est tout de même valide, avec le schéma des colonnes
+        if self.row_count or self.writer is None:
+            self._write_row_group()
+        self.writer.close()
+
+    def _checked_value(self, column, value):
+        """
+        Vérifie qu'une valeur peut être écrite dans sa colonne.
+        Args:
+            column (str): Le nom de la colonne.
+            value: La valeur sérialisée du champ.
+        Returns:
+            La valeur, ou None si elle est incompatible avec le type de la colonne.
+        """
+        if value is None:
+            return None
+        column_type = self.column_types.get(column)
+        try:
+            if column_type is None:
+                # Colonne hors de BOOK_COLUMN_TYPES : typée par sa première valeur non vide
+                self.column_types[column] = pyarrow.scalar(value).type
+            else:
+                pyarrow.scalar(value, type=column_type)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError) as e:
+            logger.warning(f"Colonne Parquet '{column}' : valeur {value!r} incompatible avec le type {column_type} ({e}), "
+                           f"remplacée par une valeur vide ; les items sont-ils nettoyés par ProjectScrapyPipeline ?")
+            return None
+        return value
+
+    def _write_row_group(self):
+        if self.schema is None:
+            self.schema = pyarrow.schema([(column, self.column_types.get(column, pyarrow.string())) for column in self.columns])
+            self.writer = pyarrow.parquet.ParquetWriter(
+                self.file,
+                self.schema,
+                compression=self.compression,
+                compression_level=self.compression_level,
+            )
+            # Schéma figé : les valeurs suivantes sont vérifiées contre ses types
+            self.column_types = {field.name: field.type for field in self.schema}
+        # Les valeurs ont été vérifiées par export_item
+        arrays = [pyarrow.array(self.columns[field.name], type=field.type) for field in self.schema]
+        self.columns = {column: [] for column in self.columns}
+        self.row_count = 0
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema), row_group_size=self.row_group_size)
@@ -0,0 +1,217 @@
+# Extensions Scrapy du projet
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import logging
+
+import scrapy.exceptions
+from scrapy import signals
+from twisted.internet import task
+
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrency:
+    """
+    Extension Scrapy qui ajuste le nombre de requêtes simultanées selon la santé du proxy et du site.
+
+    Le contrôleur suit une règle AIMD (augmentation additive, diminution multiplicative) :
+    toutes les ADAPTIVE_CONCURRENCY_INTERVAL secondes, il examine les réponses reçues
+    depuis la décision précédente. Une réponse de limitation (429 par défaut), un taux
+    d'erreurs (5xx et erreurs de téléchargement) supérieur à ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE
+    ou une latence moyenne supérieure à ADAPTIVE_CONCURRENCY_TARGET_LATENCY divisent la
+    concurrence par ADAPTIVE_CONCURRENCY_DECREASE_FACTOR. Sinon, si le downloader a été saturé
+    pendant la fenêtre (requêtes en cours, len(downloader.active), à la limite de concurrence)
+    et que le scheduler a encore des requêtes en attente, elle augmente de
+    ADAPTIVE_CONCURRENCY_INCREASE.
+    La concurrence reste comprise entre ADAPTIVE_CONCURRENCY_MIN et ADAPTIVE_CONCURRENCY_MAX
+    et part de CONCURRENT_REQUESTS.
+
+    Les réponses sont observées à la sortie du handler de téléchargement (signal
+    response_downloaded), avant les middlewares : les 429 et 5xx sont vus même s'ils
+    sont ensuite retentés par le middleware de retry.
+
+    Attributs:
+        stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        minimum (int): La concurrence minimale.
+        maximum (int): La concurrence maximale.
+        concurrency (int): La concurrence actuelle.
+        target_latency (float): La latence moyenne visée, en secondes.
+        interval (float): L'intervalle entre deux décisions, en secondes.
+        increase (int): Le pas d'augmentation.
+        decrease_factor (float): Le facteur de diminution.
+        max_error_rate (float): Le taux d'erreurs toléré sur une fenêtre.
+        throttle_codes (set): Les codes HTTP qui signalent une limitation de débit.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise l'extension à partir des paramètres du crawler.
+        engine_started(): Applique la concurrence initiale et démarre le contrôleur.
+        spider_closed(spider): Arrête le contrôleur.
+        response_downloaded(response, request, spider): Comptabilise une réponse.
+        request_reached_downloader(request, spider): Relève le nombre de requêtes en cours dans le downloader.
+        request_left_downloader(request, spider): Comptabilise une requête sortie du downloader.
+        adjust(): Prend une décision à partir de la fenêtre écoulée.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise l'extension à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            AdaptiveConcurrency: Une instance de l'extension initialisée avec les paramètres du crawler.
+        """
+        extension = cls(crawler.settings, crawler.stats)
+        extension.crawler = crawler
+        crawler.signals.connect(extension.engine_started, signal=signals.engine_started)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extension.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(extension.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(extension.request_left_downloader, signal=signals.request_left_downloader)
+        return extension
+
+    def __init__(self, settings, stats):
+        """
+        Initialise l'extension AdaptiveConcurrency avec les paramètres du crawler.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        """
+        if not settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED'):
+            raise scrapy.exceptions.NotConfigured
+        self.stats = stats
+        self.minimum = max(settings.getint('ADAPTIVE_CONCURRENCY_MIN', 1), 1)
+        self.maximum = max(settings.getint('ADAPTIVE_CONCURRENCY_MAX', 16), self.minimum)
+        self.concurrency = min(max(settings.getint('CONCURRENT_REQUESTS'), self.minimum), self.maximum)
+        self.target_latency = settings.getfloat('ADAPTIVE_CONCURRENCY_TARGET_LATENCY', 5)
+        self.interval = settings.getfloat('ADAPTIVE_CONCURRENCY_INTERVAL', 5)
+        self.increase = max(settings.getint('ADAPTIVE_CONCURRENCY_INCREASE', 1), 1)
+        self.decrease_factor = settings.getfloat('ADAPTIVE_CONCURRENCY_DECREASE_FACTOR', 0.5)
+        self.max_error_rate = settings.getfloat('ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE', 0.1)
+        self.throttle_codes = set(settings.getlist('ADAPTIVE_CONCURRENCY_THROTTLE_HTTP_CODES', [429]))
+        self.crawler = None
+        self.task = None
+        self._reset_window()
+
+    def _reset_window(self):
+        self.window_requests = 0
+        self.window_responses = 0
+        self.window_throttled = 0
+        self.window_errors = 0
+        self.window_latency = 0.0
+        self.window_peak_active = 0
+
+    def engine_started(self):
+        """
+        Applique la concurrence initiale au downloader et démarre le contrôleur.
+        """
+        self._apply()
+        self.task = task.LoopingCall(self.adjust)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        """
+        Arrête le contrôleur.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        if self.task is not None and self.task.running:
+            self.task.stop()
+
+    def response_downloaded(self, response, request, spider):
+        """
+        Comptabilise une réponse reçue du handler de téléchargement.
+        Args:
+            response (scrapy.http.Response): La réponse téléchargée.
+            request (scrapy.http.Request): La requête correspondante.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        self.window_responses += 1
+        self.window_latency += request.meta.get('download_latency', 0)
+        if response.status in self.throttle_codes:
+            self.window_throttled += 1
+            self.stats.inc_value('adaptive_concurrency/throttled_responses')
+        elif response.status >= 500:
+            self.window_errors += 1
+            self.stats.inc_value('adaptive_concurrency/error_responses')
+
+    def request_reached_downloader(self, request, spider):
+        """
+        Relève le nombre de requêtes en cours dans le downloader à l'arrivée d'une requête.
+        Args:
+            request (scrapy.http.Request): La requête arrivée dans le downloader.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        self.window_peak_active = max(self.window_peak_active, len(self.crawler.engine.downloader.active))
+
+    def request_left_downloader(self, request, spider):
+        """
+        Comptabilise une requête sortie du downloader, avec ou sans réponse.
+        Args:
+            request (scrapy.http.Request): La requête sortie du downloader.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        self.window_requests += 1
+
+    def _apply(self):
+        # La concurrence globale limite l'engine, celle des slots limite chaque domaine (ou le proxy)
+        downloader = self.crawler.engine.downloader
+        downloader.total_concurrency = self.concurrency
+        downloader.domain_concurrency = self.concurrency
+        if downloader.ip_concurrency:
+            downloader.ip_concurrency = self.concurrency
+        for slot in downloader.slots.values():
+            slot.concurrency = self.concurrency
+        self.stats.set_value('adaptive_concurrency/current', self.concurrency)
+        self.stats.max_value('adaptive_concurrency/max_reached', self.concurrency)
+        self.stats.min_value('adaptive_concurrency/min_reached', self.concurrency)
+
+    def _decision(self):
+        """
+        Choisit la nouvelle concurrence à partir de la fenêtre écoulée.
+        Returns:
+            tuple: (nouvelle concurrence, raison de la décision)
+        """
+        # Requêtes sorties sans réponse : erreurs de téléchargement (timeout, connexion refusée...)
+        download_errors = max(self.window_requests - self.window_responses, 0)
+        errors = self.window_errors + download_errors
+        if self.window_throttled:
+            reason = 'throttled'
+        elif self.window_requests and errors / self.window_requests > self.max_error_rate:
+            reason = 'errors'
+        elif self.window_responses and self.window_latency / self.window_responses > self.target_latency:
+            reason = 'latency'
+        elif self.window_peak_active >= self.concurrency and self._has_pending_requests():
+            return min(self.concurrency + self.increase, self.maximum), 'increase'
+        else:
+            # Downloader jamais saturé, ou plus rien à planifier : rien ne justifie d'augmenter
+            return self.concurrency, 'idle'
+        return max(int(self.concurrency * self.decrease_factor), self.minimum), reason
+
+    def _has_pending_requests(self):
+        slot = self.crawler.engine.slot
+        return slot is not None and slot.scheduler.has_pending_requests()
+
+    def adjust(self):
+        """
+        Met à jour la concurrence du downloader à partir de la fenêtre écoulée.
+        """
+        concurrency, reason = self._decision()
+        if self.window_responses:
+            self.stats.set_value('adaptive_concurrency/last_window_latency_ms', self.window_latency / self.window_responses * 1000)
+        self._reset_window()
+        if reason in ('increase', 'idle'):
+            if concurrency == self.concurrency:
+                return
+            self.stats.inc_value('adaptive_concurrency/increases')
+        else:
+            self.stats.inc_value('adaptive_concurrency/decreases')
+            self.stats.inc_value(f'adaptive_concurrency/decreases/{reason}')
+            if concurrency == self.concurrency:
+                return
+        logger.info(f'Concurrence {self.concurrency} -> {concurrency} ({reason})')
+        self.concurrency = concurrency
+        self._apply()
@@ -0,0 +1,151 @@
+# Extraction des champs d'une page produit de books.toscrape.com
+#
+# Les expressions XPath sont compilées une seule fois au chargement du module et le
+# tableau "Product Information" est parcouru une seule fois pour construire une
+# table en-tête -> valeur, au lieu d'une requête XPath par champ sur tout le document.
+
+import re
+
+from lxml import etree
+
+
+TITLE_XPATH = etree.XPath("//h1/text()")
+IMAGE_XPATH = etree.XPath("//img/@src")
+DESCRIPTION_XPATH = etree.XPath("//div[@id='product_description']/following-sibling::p/text()")
+PRODUCT_INFORMATION_ROWS_XPATH = etree.XPath("//table[@class='table table-striped']//tr")
+
+PRODUCT_PODS_XPATH = etree.XPath("//article[@class='product_pod']")
+POD_LINK_XPATH = etree.XPath("h3/a/@href")
+POD_TITLE_XPATH = etree.XPath("h3/a/@title")
+POD_IMAGE_XPATH = etree.XPath("div[@class='image_container']//img/@src")
+POD_PRICE_XPATH = etree.XPath(".//p[@class='price_color']/text()")
+POD_AVAILABILITY_XPATH = etree.XPath("normalize-space(.//p[contains(@class, 'availability')])")
+
+PAGER_CURRENT_XPATH = etree.XPath("normalize-space(//ul[@class='pager']/li[@class='current'])")
+PAGER_NEXT_XPATH = etree.XPath("//ul[@class='pager']/li[@class='next']/a/@href")
+PAGE_COUNTER_RE = re.compile(r'Page (\d+) of (\d+)')
+
+# En-tête du tableau "Product Information" -> champ du BookItem
+PRODUCT_INFORMATION_FIELDS = {
+    'UPC': 'UPC',
+    'Product Type': 'product_type',
+    'Price (excl. tax)': 'price',
+    'Price (incl. tax)': 'price_tax',
+    'Tax': 'tax',
+    'Availability': 'availability',
+    'Number of reviews': 'number_of_reviews',
+}
+
+# Champs du BookItem disponibles directement sur les pages de liste
+LISTING_FIELDS = ('title', 'image', 'price', 'availability')
+
+
+def _first(results):
+    """
+    Retourne le premier résultat d'une requête XPath, comme Selector.get().
+    Args:
+        results (list): Les résultats de la requête XPath.
+    Returns:
+        str: Le premier résultat, ou None si la liste est vide.
+    """
+    return str(results[0]) if results else None
+
+
+def _first_text(element):
+    """
+    Retourne le premier nœud texte enfant d'un élément, comme `element/text()` suivi de get().
+    Args:
+        element (lxml.etree._Element): L'élément à lire.
+    Returns:
+        str: Le premier nœud texte, ou None s'il n'y en a pas.
+    """
+    if element.text is not None:
+        return element.text
+    for child in element:
+        if child.tail is not None:
+            return child.tail
+    return None
+
+
+def extract_product_information(root):
+    """
+    Parcourt une seule fois le tableau "Product Information" d'une page produit.
+    Args:
+        root (lxml.etree._Element): La racine du document HTML.
+    Returns:
+        dict: Le texte de chaque ligne, indexé par l'en-tête de la ligne (première occurrence).
+    """
+    information = {}
+    for row in PRODUCT_INFORMATION_ROWS_XPATH(root):
+        cells = [cell for cell in row if cell.tag in ('th', 'td')]
+        headers = [cell for cell in cells if cell.tag == 'th']
+        values = [cell for cell in cells if cell.tag == 'td']
+        if not headers or not values:
+            continue
+        header = _first_text(headers[0])
+        if header in information:
+            continue
+        # Availability lit la dernière cellule, les autres champs le premier texte trouvé
+        if header == 'Availability':
+            information[header] = _first_text(values[-1])
+        else:
+            information[header] = next((text for text in map(_first_text, values) if text is not None), None)
+    return information
+
+
+def extract_product(root):
+    """
+    Extrait tous les champs d'un BookItem depuis une page produit.
+    Args:
+        root (lxml.etree._Element): La racine du document HTML (response.selector.root).
+    Returns:
+        dict: Les champs du BookItem, None pour les champs absents de la page.
+    """
+    information = extract_product_information(root)
+    product = {
+        'title': _first(TITLE_XPATH(root)),
+        'image': _first(IMAGE_XPATH(root)),
+        'description': _first(DESCRIPTION_XPATH(root)),
+    }
+    for header, field in PRODUCT_INFORMATION_FIELDS.items():
+        value = information.get(header)
+        product[field] = str(value) if value is not None else None
+    return product
+
+
+def extract_listing(root):
+    """
+    Extrait les livres affichés sur une page de liste (20 par page).
+    Args:
+        root (lxml.etree._Element): La racine du document HTML (response.selector.root).
+    Returns:
+        list: Pour chaque livre, un dict avec l'URL relative de sa page produit ('url')
+        et les champs LISTING_FIELDS. L'image est la vignette de la liste et la
+        disponibilité vaut 'In stock' ou 'Out of stock', sans le nombre d'exemplaires.
+    """
+    books = []
+    for pod in PRODUCT_PODS_XPATH(root):
+        books.append({
+            'url': _first(POD_LINK_XPATH(pod)),
+            'title': _first(POD_TITLE_XPATH(pod)),
+            'image': _first(POD_IMAGE_XPATH(pod)),
+            'price': _first(POD_PRICE_XPATH(pod)),
+            'availability': str(POD_AVAILABILITY_XPATH(pod)) or None,
+        })
+    return books
+
+
+def extract_pagination(root):
+    """
+    Lit le compteur "Page X of Y" et le lien "next" d'une page de liste.
+    Args:
+        root (lxml.etree._Element): La racine du document HTML (response.selector.root).
+    Returns:
+        tuple: (page courante, nombre de pages, URL relative de la page suivante),
+        ou None si la page n'a pas de pagination.
+    """
+    match = PAGE_COUNTER_RE.search(str(PAGER_CURRENT_XPATH(root)))
+    next_url = _first(PAGER_NEXT_XPATH(root))
+    if match is None or next_url is None:
+        return None
+    return int(match.group(1)), int(match.group(2)), next_url
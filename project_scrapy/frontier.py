@@ -0,0 +1,614 @@
+# Frontière partagée pour le crawl distribué : plusieurs processus (workers) se partagent
+# les requêtes à télécharger au lieu d'avoir chacun leur file en mémoire.
+#
+# Usage (un processus par worker, sur une ou plusieurs machines qui voient FRONTIER_PATH) :
+#   scrapy crawl bookspider -s SCHEDULER=project_scrapy.frontier.SharedFrontierScheduler -s FRONTIER_CRAWL=crawl-1
+#
+# Suivi des workers :
+#   python -m project_scrapy.frontier .scrapy/frontier.sqlite --crawl crawl-1
+
+import argparse
+import heapq
+import itertools
+import os
+import pickle
+import socket
+import sqlite3
+import time
+
+from scrapy.core.scheduler import BaseScheduler
+from scrapy.utils.job import job_dir
+from scrapy.utils.misc import load_object
+from scrapy.utils.project import data_path
+from scrapy.utils.request import request_from_dict
+from twisted.internet import task
+
+
+# Signal envoyé par FrontierAckMiddleware quand la réponse d'une requête de la frontière est traitée par le spider
+request_processed = object()
+
+
+class SQLiteFrontier:
+    """
+    Frontière partagée stockée dans une base SQLite (backend local, pour les tests et une seule machine).
+
+    Chaque requête est identifiée par son empreinte dans un crawl (FRONTIER_CRAWL) : une
+    requête déjà connue, quel que soit le worker qui l'a découverte, n'est pas ajoutée deux
+    fois. Les requêtes sont confiées aux workers par bail (lease) : un bail qui expire sans
+    acquittement (worker arrêté brutalement) remet la requête dans la file, au plus
+    max_attempts fois. Avec keep_done=False, les requêtes traitées sont supprimées de la
+    base, qui ne contient plus que la frontière en attente ; le dédoublonnage des requêtes
+    déjà traitées revient alors à l'appelant (CheckpointScheduler). Les transactions d'écriture sont sérialisées par SQLite (BEGIN
+    IMMEDIATE), ce qui suffit pour quelques workers sur une même machine ; SQLite n'est pas
+    fiable sur un système de fichiers réseau, un autre backend (FRONTIER_BACKEND) doit alors
+    implémenter les mêmes méthodes.
+
+    Attributs:
+        path (str): Le fichier de la base SQLite.
+        crawl (str): L'identifiant du crawl partagé par les workers.
+        max_attempts (int): Le nombre de baux accordés à une requête avant de l'abandonner.
+        keep_done (bool): Conserver les requêtes traitées (état 'done') plutôt que les supprimer.
+
+    Méthodes:
+        from_settings(cls, settings): Ouvre la frontière décrite par les paramètres.
+        push(fingerprint, priority, payload): Ajoute une requête si elle est inconnue.
+        lease(worker_id, count, lease_time): Confie des requêtes à un worker.
+        ack(fingerprint): Marque une requête comme traitée (ou la supprime).
+        release(fingerprints): Remet dans la file des requêtes confiées mais pas commencées.
+        finish(worker_id, failed): Solde les requêtes encore confiées à un worker qui s'arrête.
+        pending(worker_id): Retourne le nombre de requêtes qui restent à traiter dans le crawl.
+        heartbeat(worker_id, counters): Enregistre l'activité d'un worker.
+        workers(): Retourne l'activité de chaque worker du crawl.
+        close(): Ferme la connexion.
+    """
+
+    @classmethod
+    def from_settings(cls, settings):
+        path = settings.get('FRONTIER_PATH', 'frontier.sqlite')
+        if not os.path.isabs(path):
+            path = os.path.join(data_path('', createdir=True), path)
+        return cls(path, settings.get('FRONTIER_CRAWL', 'default'), settings.getint('FRONTIER_MAX_ATTEMPTS', 3))
+
+    def __init__(self, path, crawl='default', max_attempts=3, keep_done=True):
+        self.path = path
+        self.crawl = crawl
+        self.max_attempts = max(max_attempts, 1)
+        self.keep_done = keep_done
+        # isolation_level=None : transactions explicites (BEGIN IMMEDIATE) pour les baux
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS requests (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                crawl TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (crawl, fingerprint)
+            )
+        """)
+        self.db.execute('CREATE INDEX IF NOT EXISTS requests_queue ON requests (crawl, state, priority DESC, seq)')
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                crawl TEXT NOT NULL,
+                worker_id TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL,
+                status TEXT NOT NULL,
+                leased INTEGER NOT NULL DEFAULT 0,
+                acked INTEGER NOT NULL DEFAULT 0,
+                items INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (crawl, worker_id)
+            )
+        """)
+
+    def push(self, fingerprint, priority, payload):
+        """
+        Ajoute une requête à la file si elle n'est pas déjà connue dans ce crawl.
+        Args:
+            fingerprint (str): L'empreinte de la requête.
+            priority (int): La priorité Scrapy de la requête.
+            payload (bytes): La requête sérialisée.
+        Returns:
+            bool: True si la requête a été ajoutée, False si elle était déjà connue.
+        """
+        cursor = self.db.execute(
+            'INSERT OR IGNORE INTO requests (crawl, fingerprint, priority, payload) VALUES (?, ?, ?, ?)',
+            (self.crawl, fingerprint, priority, payload),
+        )
+        return cursor.rowcount == 1
+
+    def lease(self, worker_id, count, lease_time):
+        """
+        Confie au worker les requêtes les plus prioritaires, après avoir remis en file les baux expirés.
+        Args:
+            worker_id (str): L'identifiant du worker.
+            count (int): Le nombre maximal de requêtes à confier.
+            lease_time (float): La durée du bail, en secondes.
+        Returns:
+            tuple: (liste de (empreinte, requête sérialisée), nombre de baux expirés remis en file)
+        """
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self.db.execute(
+                "UPDATE requests SET state = 'failed', lease_owner = NULL "
+                "WHERE crawl = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (self.crawl, now, self.max_attempts),
+            )
+            expired = self.db.execute(
+                "UPDATE requests SET state = 'queued', lease_owner = NULL "
+                "WHERE crawl = ? AND state = 'leased' AND lease_expires < ?",
+                (self.crawl, now),
+            ).rowcount
+            rows = self.db.execute(
+                "SELECT seq, fingerprint, payload FROM requests WHERE crawl = ? AND state = 'queued' "
+                "ORDER BY priority DESC, seq LIMIT ?",
+                (self.crawl, count),
+            ).fetchall()
+            if rows:
+                self.db.executemany(
+                    "UPDATE requests SET state = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE seq = ?",
+                    [(worker_id, now + lease_time, seq) for seq, _, _ in rows],
+                )
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        return [(fingerprint, payload) for _, fingerprint, payload in rows], expired
+
+    def ack(self, fingerprint):
+        if not self.keep_done:
+            self.db.execute('DELETE FROM requests WHERE crawl = ? AND fingerprint = ?', (self.crawl, fingerprint))
+            return
+        self.db.execute(
+            "UPDATE requests SET state = 'done', lease_owner = NULL WHERE crawl = ? AND fingerprint = ?",
+            (self.crawl, fingerprint),
+        )
+
+    def release(self, fingerprints):
+        # Bail rendu avant le téléchargement : la tentative n'est pas comptée
+        self.db.executemany(
+            "UPDATE requests SET state = 'queued', lease_owner = NULL, attempts = attempts - 1 "
+            "WHERE crawl = ? AND fingerprint = ? AND state = 'leased'",
+            [(self.crawl, fingerprint) for fingerprint in fingerprints],
+        )
+
+    def finish(self, worker_id, failed):
+        """
+        Solde les requêtes encore confiées à un worker qui s'arrête.
+        Args:
+            worker_id (str): L'identifiant du worker.
+            failed (bool): True si le worker a terminé son travail (ces requêtes ont échoué),
+                False s'il a été interrompu (elles sont remises en file).
+        Returns:
+            int: Le nombre de requêtes soldées.
+        """
+        return self.db.execute(
+            "UPDATE requests SET state = ?, lease_owner = NULL WHERE crawl = ? AND state = 'leased' AND lease_owner = ?",
+            ('failed' if failed else 'queued', self.crawl, worker_id),
+        ).rowcount
+
+    def pending(self, worker_id):
+        """
+        Retourne le nombre de requêtes qui restent à traiter par ce worker ou par les autres.
+        Args:
+            worker_id (str): L'identifiant du worker.
+        Returns:
+            int: Les requêtes en file et celles confiées aux autres workers (qui peuvent en découvrir de nouvelles).
+        """
+        return self.db.execute(
+            "SELECT COUNT(*) FROM requests WHERE crawl = ? AND (state = 'queued' OR (state = 'leased' AND lease_owner != ?))",
+            (self.crawl, worker_id),
+        ).fetchone()[0]
+
+    def heartbeat(self, worker_id, counters, status='running'):
+        """
+        Enregistre l'activité d'un worker (compteurs cumulés depuis son démarrage).
+        Args:
+            worker_id (str): L'identifiant du worker.
+            counters (dict): Les compteurs 'leased', 'acked' et 'items'.
+            status (str): 'running' ou la raison de fermeture du worker.
+        """
+        now = time.time()
+        self.db.execute(
+            'INSERT INTO workers (crawl, worker_id, started_at, heartbeat_at, status, leased, acked, items) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (crawl, worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at, status = excluded.status, '
+            'leased = excluded.leased, acked = excluded.acked, items = excluded.items',
+            (self.crawl, worker_id, now, now, status, counters['leased'], counters['acked'], counters['items']),
+        )
+
+    def workers(self):
+        """
+        Retourne l'activité de chaque worker du crawl.
+        Returns:
+            list: Un dict par worker (worker_id, status, leased, acked, items, elapsed, items_per_s, requests_per_s).
+        """
+        rows = self.db.execute(
+            'SELECT worker_id, status, started_at, heartbeat_at, leased, acked, items FROM workers WHERE crawl = ? ORDER BY started_at',
+            (self.crawl,),
+        ).fetchall()
+        workers = []
+        for worker_id, status, started_at, heartbeat_at, leased, acked, items in rows:
+            elapsed = max(heartbeat_at - started_at, 1e-9)
+            workers.append({
+                'worker_id': worker_id,
+                'status': status,
+                'leased': leased,
+                'acked': acked,
+                'items': items,
+                'elapsed': heartbeat_at - started_at,
+                'items_per_s': items / elapsed,
+                'requests_per_s': acked / elapsed,
+            })
+        return workers
+
+    def states(self):
+        return dict(self.db.execute('SELECT state, COUNT(*) FROM requests WHERE crawl = ? GROUP BY state', (self.crawl,)).fetchall())
+
+    def close(self):
+        self.db.close()
+
+
+class SharedFrontierScheduler(BaseScheduler):
+    """
+    Scheduler Scrapy qui prend ses requêtes dans une frontière partagée entre plusieurs workers.
+
+    Les nouvelles requêtes découvertes par le spider sont envoyées à la frontière
+    (FRONTIER_BACKEND, SQLiteFrontier par défaut), qui les dédoublonne entre tous les
+    workers du crawl FRONTIER_CRAWL. Le worker en emprunte FRONTIER_LEASE_BATCH à la fois
+    (CONCURRENT_REQUESTS par défaut) pour FRONTIER_LEASE_TIME secondes et acquitte chacune
+    quand le spider a fini de traiter sa réponse (FrontierAckMiddleware), donc après l'envoi
+    des requêtes qu'elle fait découvrir : les requêtes d'un worker arrêté brutalement, même
+    entre le téléchargement et l'analyse, sont reprises par les autres à l'expiration du bail.
+
+    Les requêtes marquées dont_filter (requêtes de départ, nouvelles tentatives, rendu
+    JavaScript escaladé) et les requêtes déjà réécrites par le proxy (en-tête X-Original-URL)
+    restent dans une file locale au worker : elles dépendent de son état (sessions du proxy,
+    tentatives en attente) et poursuivent une requête déjà confiée.
+
+    Le spider ne se ferme que quand plus aucune requête n'est en file ou confiée à un autre
+    worker du crawl : ces dernières peuvent encore en faire découvrir de nouvelles, ou revenir
+    en file si leur worker s'est arrêté. Les workers écrivent dans la même base MySQL
+    (DataBasePipeline, upsert par UPC) ; pour les flux, utiliser un fichier par worker.
+    Chaque page est analysée au moins une fois, mais les items encore en mémoire d'un
+    worker arrêté brutalement (lot MySQL non écrit, tampon du fichier de flux) sont perdus.
+
+    Statistiques : frontier/enqueued, duplicates, local_enqueued, leased, acked,
+    lease_expired_requeued et released. L'activité de chaque worker (items/s,
+    requêtes/s) est enregistrée dans la frontière toutes les FRONTIER_HEARTBEAT_INTERVAL
+    secondes.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le scheduler à partir des paramètres du crawler.
+        open(spider): Ouvre la frontière et enregistre le worker.
+        close(reason): Rend les requêtes confiées non commencées et ferme la frontière.
+        enqueue_request(request): Ajoute une requête à la frontière ou à la file locale.
+        next_request(): Retourne la prochaine requête à télécharger.
+        has_pending_requests(): Indique s'il reste du travail dans le worker ou dans le crawl.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le scheduler à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            SharedFrontierScheduler: Une instance du scheduler initialisée avec les paramètres du crawler.
+        """
+        scheduler = cls(crawler.settings, crawler.stats)
+        scheduler.crawler = crawler
+        crawler.signals.connect(scheduler.ack_request, signal=request_processed)
+        return scheduler
+
+    def __init__(self, settings, stats):
+        """
+        Initialise le scheduler SharedFrontierScheduler avec les paramètres du crawler.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        """
+        self.settings = settings
+        self.stats = stats
+        self.worker_id = settings.get('FRONTIER_WORKER_ID') or f'{socket.gethostname()}-{os.getpid()}'
+        self.lease_time = settings.getfloat('FRONTIER_LEASE_TIME', 300)
+        self.lease_batch = settings.getint('FRONTIER_LEASE_BATCH') or settings.getint('CONCURRENT_REQUESTS')
+        self.poll_interval = settings.getfloat('FRONTIER_POLL_INTERVAL', 1)
+        self.heartbeat_interval = settings.getfloat('FRONTIER_HEARTBEAT_INTERVAL', 10)
+        self.crawler = None
+        self.spider = None
+        self.frontier = None
+        self.heartbeat_task = None
+        self.local_queue = []
+        self.leased = []
+        self.counters = {'leased': 0, 'acked': 0, 'items': 0}
+        self._sequence = itertools.count()
+        self._next_poll = 0.0
+        self._pending = 0
+
+    def open(self, spider):
+        self.spider = spider
+        self.frontier = self._open_frontier()
+        self.frontier.heartbeat(self.worker_id, self.counters)
+        self.heartbeat_task = task.LoopingCall(self._heartbeat)
+        self.heartbeat_task.start(self.heartbeat_interval, now=False)
+        spider.logger.info(f'Worker {self.worker_id} : frontière partagée {getattr(self.frontier, "path", "")} (crawl {self.frontier.crawl})')
+
+    def close(self, reason):
+        if self.heartbeat_task is not None and self.heartbeat_task.running:
+            self.heartbeat_task.stop()
+        if self.leased:
+            self.frontier.release([fingerprint for fingerprint, _ in self.leased])
+            self.stats.inc_value('frontier/released', len(self.leased))
+            self.leased = []
+        # Fin normale : les requêtes confiées et jamais acquittées ont échoué ; sinon, elles sont rendues
+        self.frontier.finish(self.worker_id, failed=reason == 'finished')
+        self._heartbeat(status=reason)
+        self.frontier.close()
+
+    def _open_frontier(self):
+        backend_cls = load_object(self.settings.get('FRONTIER_BACKEND', 'project_scrapy.frontier.SQLiteFrontier'))
+        return backend_cls.from_settings(self.settings)
+
+    def _heartbeat(self, status='running'):
+        self.counters['items'] = self.stats.get_value('item_scraped_count', 0)
+        self.frontier.heartbeat(self.worker_id, self.counters, status)
+
+    def _is_local(self, request):
+        return request.dont_filter or 'X-Original-URL' in request.headers
+
+    def enqueue_request(self, request):
+        """
+        Ajoute une requête à la frontière partagée, ou à la file locale du worker.
+        Args:
+            request (scrapy.http.Request): La requête à planifier.
+        Returns:
+            bool: False si la requête est un doublon déjà connu du crawl.
+        """
+        if self._is_local(request):
+            heapq.heappush(self.local_queue, (-request.priority, next(self._sequence), request))
+            self.stats.inc_value('frontier/local_enqueued')
+            return True
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        payload = pickle.dumps(request.to_dict(spider=self.spider), protocol=pickle.HIGHEST_PROTOCOL)
+        if not self.frontier.push(fingerprint, request.priority, payload):
+            self.stats.inc_value('frontier/duplicates')
+            return False
+        self.stats.inc_value('frontier/enqueued')
+        # Nouvelle requête : inutile d'attendre la fin de l'intervalle d'interrogation
+        self._next_poll = 0.0
+        return True
+
+    def next_request(self):
+        """
+        Retourne la prochaine requête : file locale d'abord, puis requêtes confiées par la frontière.
+        Returns:
+            scrapy.http.Request: La requête à télécharger, ou None s'il n'y en a pas pour l'instant.
+        """
+        if self.local_queue:
+            return heapq.heappop(self.local_queue)[2]
+        if not self.leased and time.monotonic() >= self._next_poll:
+            self._lease()
+        if not self.leased:
+            return None
+        fingerprint, payload = self.leased.pop(0)
+        request = request_from_dict(pickle.loads(payload), spider=self.spider)
+        request.meta['frontier_fingerprint'] = fingerprint
+        return request
+
+    def _lease(self):
+        leased, expired = self.frontier.lease(self.worker_id, self.lease_batch, self.lease_time)
+        if expired:
+            self.stats.inc_value('frontier/lease_expired_requeued', expired)
+        self.leased.extend(leased)
+        self.counters['leased'] += len(leased)
+        self.stats.inc_value('frontier/leased', len(leased))
+        self._pending = self.frontier.pending(self.worker_id)
+        # File vide : la frontière n'est interrogée qu'une fois par FRONTIER_POLL_INTERVAL
+        self._next_poll = time.monotonic() + (0 if leased else self.poll_interval)
+
+    def ack_request(self, fingerprint):
+        """
+        Acquitte une requête de la frontière dont la réponse est traitée par le spider.
+        Args:
+            fingerprint (str): L'empreinte de la requête dans la frontière.
+        """
+        self.frontier.ack(fingerprint)
+        self.counters['acked'] += 1
+        self.stats.inc_value('frontier/acked')
+
+    def has_pending_requests(self):
+        if self.local_queue or self.leased:
+            return True
+        if time.monotonic() >= self._next_poll:
+            self._pending = self.frontier.pending(self.worker_id)
+            self._next_poll = time.monotonic() + self.poll_interval
+        return self._pending > 0
+
+    def __len__(self):
+        return len(self.local_queue) + len(self.leased)
+
+
+class CheckpointScheduler(SharedFrontierScheduler):
+    """
+    Scheduler d'un crawl reprenable : la frontière en attente est enregistrée dans JOBDIR au fil de l'eau.
+
+    Le scheduler par défaut de Scrapy n'enregistre ses files dans JOBDIR qu'à l'arrêt propre
+    du crawl : après un arrêt brutal, le crawl repart de start_urls et repaie les requêtes du
+    proxy. Ici, chaque requête découverte est écrite dans <JOBDIR>/frontier.sqlite dès sa
+    planification et n'en est supprimée qu'une fois sa réponse traitée par le spider
+    (FrontierAckMiddleware) : au redémarrage avec le même JOBDIR, les requêtes en cours lors
+    de l'arrêt sont remises en file et le crawl reprend où il s'était arrêté.
+
+    Les requêtes déjà traitées sont écartées par le filtre de doublons DUPEFILTER_CLASS,
+    enregistré dans JOBDIR toutes les SCHEDULER_CHECKPOINT_INTERVAL secondes et à la
+    fermeture : fichier requests.seen de RFPDupeFilter (par défaut), ou BloomDupeFilter
+    pour une mémoire bornée sur les très grands crawls. Les requêtes de départ
+    (dont_filter) sont téléchargées de nouveau à chaque reprise, mais les liens qu'elles
+    contiennent sont filtrés.
+
+    Usage :
+        scrapy crawl bookspider -s JOBDIR=crawls/bookspider-1 -s SCHEDULER=project_scrapy.frontier.CheckpointScheduler
+        (ajouter -s DUPEFILTER_CLASS=project_scrapy.dupefilters.BloomDupeFilter pour le filtre de Bloom)
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le scheduler et son filtre de doublons.
+        open(spider): Ouvre la frontière de JOBDIR et remet en file les requêtes interrompues.
+        close(reason): Enregistre le filtre de doublons et ferme la frontière.
+        enqueue_request(request): Ajoute une requête à la frontière si elle n'a pas déjà été vue.
+        checkpoint(): Enregistre le filtre de doublons.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le scheduler et son filtre de doublons à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            CheckpointScheduler: Une instance du scheduler initialisée avec les paramètres du crawler.
+        """
+        scheduler = super().from_crawler(crawler)
+        scheduler.df = load_object(crawler.settings['DUPEFILTER_CLASS']).from_crawler(crawler)
+        return scheduler
+
+    def __init__(self, settings, stats):
+        """
+        Initialise le scheduler CheckpointScheduler avec les paramètres du crawler.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        Raises:
+            ValueError: Si JOBDIR n'est pas défini.
+        """
+        super().__init__(settings, stats)
+        self.jobdir = job_dir(settings)
+        if not self.jobdir:
+            raise ValueError('CheckpointScheduler nécessite JOBDIR (-s JOBDIR=crawls/bookspider-1)')
+        # Un seul processus par JOBDIR : ses baux d'une exécution à l'autre portent le même nom
+        self.worker_id = 'checkpoint'
+        self.checkpoint_interval = settings.getfloat('SCHEDULER_CHECKPOINT_INTERVAL', 30)
+        self.checkpoint_task = None
+        self.df = None
+
+    def open(self, spider):
+        super().open(spider)
+        # Requêtes en cours lors de l'arrêt précédent : la tentative reste comptée
+        interrupted = self.frontier.finish(self.worker_id, failed=False)
+        self.stats.set_value('frontier/resumed_requeued', interrupted)
+        spider.logger.info(f'Reprise depuis {self.jobdir} : {self.frontier.pending(self.worker_id)} requêtes en attente, '
+                           f'dont {interrupted} interrompues par l\'arrêt précédent')
+        self.checkpoint_task = task.LoopingCall(self.checkpoint)
+        self.checkpoint_task.start(self.checkpoint_interval, now=False)
+        return self.df.open()
+
+    def _open_frontier(self):
+        return SQLiteFrontier(
+            os.path.join(self.jobdir, 'frontier.sqlite'),
+            crawl=self.spider.name,
+            max_attempts=self.settings.getint('FRONTIER_MAX_ATTEMPTS', 3),
+            keep_done=False,
+        )
+
+    def close(self, reason):
+        if self.checkpoint_task is not None and self.checkpoint_task.running:
+            self.checkpoint_task.stop()
+        super().close(reason)
+        return self.df.close(reason)
+
+    def checkpoint(self):
+        """
+        Enregistre le filtre de doublons dans JOBDIR (la frontière l'est déjà à chaque modification).
+        """
+        if hasattr(self.df, 'checkpoint'):
+            self.df.checkpoint()
+        elif getattr(self.df, 'file', None) is not None:
+            # RFPDupeFilter : empreintes écrites dans requests.seen, mais gardées dans le tampon du fichier
+            self.df.file.flush()
+            os.fsync(self.df.file.fileno())
+
+    def enqueue_request(self, request):
+        """
+        Ajoute une requête à la frontière si le filtre de doublons ne l'a pas déjà vue.
+        Args:
+            request (scrapy.http.Request): La requête à planifier.
+        Returns:
+            bool: False si la requête a été filtrée.
+        """
+        if not self._is_local(request) and self.df.request_seen(request):
+            self.df.log(request, self.spider)
+            return False
+        return super().enqueue_request(request)
+
+
+class FrontierAckMiddleware:
+    """
+    Middleware de spider qui signale la fin du traitement des réponses des requêtes de la frontière.
+
+    Le signal request_processed est envoyé quand toute la sortie du callback a été consommée
+    (les requêtes découvertes sont alors dans la frontière) ou quand le callback échoue :
+    SharedFrontierScheduler acquitte alors la requête. Sans effet avec le scheduler par défaut.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le middleware à partir du crawler.
+        process_spider_output(response, result, spider): Transmet la sortie du callback, puis envoie le signal.
+        process_spider_output_async(response, result, spider): Variante asynchrone de process_spider_output.
+        process_spider_exception(response, exception, spider): Envoie le signal si le callback échoue.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le middleware à partir du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            FrontierAckMiddleware: Une instance du middleware.
+        """
+        return cls(crawler)
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    def _processed(self, response):
+        # Une réponse n'est acquittée qu'une fois, même si le callback échoue après avoir produit des résultats
+        fingerprint = response.meta.pop('frontier_fingerprint', None)
+        if fingerprint is not None:
+            self.crawler.signals.send_catch_log(signal=request_processed, fingerprint=fingerprint)
+
+    def process_spider_output(self, response, result, spider):
+        yield from result
+        self._processed(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for r in result:
+            yield r
+        self._processed(response)
+
+    def process_spider_exception(self, response, exception, spider):
+        self._processed(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Activité des workers d'un crawl distribué (frontière SQLite)")
+    parser.add_argument('path', help='fichier SQLite de la frontière (FRONTIER_PATH)')
+    parser.add_argument('--crawl', default='default', help='identifiant du crawl (FRONTIER_CRAWL)')
+    args = parser.parse_args()
+
+    frontier = SQLiteFrontier(args.path, args.crawl)
+    print(f'Requêtes : {frontier.states()}')
+    for worker in frontier.workers():
+        print(f"{worker['worker_id']:32} {worker['status']:10} {worker['leased']:7} confiées {worker['acked']:7} acquittées "
+              f"{worker['items']:7} items {worker['items_per_s']:8.1f} items/s {worker['requests_per_s']:8.1f} requêtes/s")
+    frontier.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+# Handlers de téléchargement du projet
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/settings.html#download-handlers
+
+import bisect
+import logging
+import time
+from collections import deque
+
+from OpenSSL import SSL
+from scrapy.core.downloader.contextfactory import ScrapyClientContextFactory
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.core.downloader.tls import ScrapyClientTLSOptions
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.misc import create_instance, load_object
+from twisted.internet import defer
+from twisted.internet.ssl import CertificateOptions
+from twisted.web.client import HTTPConnectionPool
+
+
+logger = logging.getLogger(__name__)
+
+try:
+    # pyOpenSSL n'expose pas SSL_session_reused : sans ce symbole privé, la reprise n'est pas comptée
+    from OpenSSL._util import lib as _openssl_lib
+    _ssl_session_reused = _openssl_lib.SSL_session_reused
+except (ImportError, AttributeError):
+    _ssl_session_reused = None
+
+
+def _session_reused(connection):
+    """
+    Indique si la poignée de main TLS d'une connexion a repris une session.
+    Args:
+        connection (OpenSSL.SSL.Connection): La connexion TLS.
+    Returns:
+        bool: True si la session a été reprise, None si pyOpenSSL ne permet pas de le savoir.
+    """
+    ssl_pointer = getattr(connection, '_ssl', None)
+    if _ssl_session_reused is None or ssl_pointer is None:
+        return None
+    return bool(_ssl_session_reused(ssl_pointer))
+
+
+class HedgingDownloadHandler:
+    """
+    Handler de téléchargement qui double les requêtes lentes (hedged requests).
+
+    Le téléchargement est délégué au handler HEDGING_DOWNLOAD_HANDLER (HTTP/1.1 de Scrapy
+    par défaut). Quand HEDGING_ENABLED est actif et qu'une requête GET ou HEAD n'a pas
+    répondu après le percentile HEDGING_PERCENTILE des latences récentes, une copie de la
+    requête est envoyée : la première réponse est retenue et l'autre téléchargement est
+    annulé. Le nombre de copies est limité à HEDGING_BUDGET_RATIO fois le nombre de
+    requêtes pour plafonner la dépense supplémentaire de proxy.
+
+    Le gain de latence d'une copie gagnante n'est pas observable (la requête d'origine est
+    annulée) : il est estimé par E[L - t | L > t] sur les latences récentes, t étant le
+    temps écoulé quand la copie a répondu.
+
+    Attributs:
+        handler: Le handler qui effectue réellement les téléchargements.
+        stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        enabled (bool): Indique si les requêtes lentes sont doublées.
+        percentile (float): Le percentile des latences qui déclenche la copie.
+        min_samples (int): Le nombre de latences observées avant la première copie.
+        min_delay (float): Le délai minimal avant une copie, en secondes.
+        budget_ratio (float): La part des requêtes qui peut être doublée.
+        latencies (deque): Les latences récentes, en secondes.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le handler à partir des paramètres du crawler.
+        download_request(request, spider): Télécharge la requête, en la doublant si elle tarde.
+        close(): Ferme le handler délégué.
+    """
+
+    lazy = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le handler à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            HedgingDownloadHandler: Une instance du handler initialisée avec les paramètres du crawler.
+        """
+        return cls(crawler.settings, crawler)
+
+    def __init__(self, settings, crawler):
+        """
+        Initialise le handler HedgingDownloadHandler et le handler délégué.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        """
+        handler_cls = load_object(settings.get('HEDGING_DOWNLOAD_HANDLER', 'scrapy.core.downloader.handlers.http11.HTTP11DownloadHandler'))
+        self.handler = create_instance(handler_cls, settings, crawler)
+        self.stats = crawler.stats
+        self.enabled = settings.getbool('HEDGING_ENABLED')
+        self.percentile = settings.getfloat('HEDGING_PERCENTILE', 0.95)
+        self.min_samples = settings.getint('HEDGING_MIN_SAMPLES', 50)
+        self.min_delay = settings.getfloat('HEDGING_MIN_DELAY', 0.1)
+        self.budget_ratio = settings.getfloat('HEDGING_BUDGET_RATIO', 0.05)
+        self.latencies = deque(maxlen=settings.getint('HEDGING_WINDOW', 500))
+        self.requests = 0
+        self.hedges = 0
+        self._sorted_latencies = []
+        self._threshold = None
+
+    def _record_latency(self, latency):
+        self.latencies.append(latency)
+        # Seuil recalculé toutes les 10 latences : le tri reste négligeable devant un téléchargement
+        if len(self.latencies) >= self.min_samples and (self._threshold is None or len(self.latencies) % 10 == 0):
+            self._sorted_latencies = sorted(self.latencies)
+            index = min(int(self.percentile * len(self._sorted_latencies)), len(self._sorted_latencies) - 1)
+            self._threshold = max(self._sorted_latencies[index], self.min_delay)
+            self.stats.set_value('hedging/threshold_ms', round(self._threshold * 1000, 1))
+
+    def _expected_remaining(self, elapsed):
+        """
+        Estime le temps qu'aurait encore mis une requête qui n'a pas répondu après elapsed secondes.
+        Args:
+            elapsed (float): Le temps déjà écoulé, en secondes.
+        Returns:
+            float: E[L - elapsed | L > elapsed] sur les latences récentes, 0 si aucune n'est plus longue.
+        """
+        slower = self._sorted_latencies[bisect.bisect_right(self._sorted_latencies, elapsed):]
+        if not slower:
+            return 0.0
+        return sum(slower) / len(slower) - elapsed
+
+    def _can_hedge(self, request):
+        if not self.enabled or self._threshold is None or request.meta.get('dont_hedge'):
+            return False
+        return request.method in ('GET', 'HEAD')
+
+    def download_request(self, request, spider):
+        """
+        Télécharge la requête et envoie une copie si elle n'a pas répondu à temps.
+        Args:
+            request (scrapy.http.Request): La requête à télécharger.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        Returns:
+            twisted.internet.defer.Deferred: Le Deferred de la première réponse obtenue.
+        """
+        self.requests += 1
+        start = time.monotonic()
+        if not self._can_hedge(request):
+            d = self.handler.download_request(request, spider)
+            d.addCallback(self._on_plain_response, start)
+            return d
+        return self._hedged_download(request, spider, start)
+
+    def _on_plain_response(self, response, start):
+        self._record_latency(time.monotonic() - start)
+        return response
+
+    def _hedged_download(self, request, spider, start):
+        from twisted.internet import reactor
+
+        downloads = {}
+        failures = []
+        hedged = []
+
+        def cancel(_):
+            if timer.active():
+                timer.cancel()
+            for d in list(downloads.values()):
+                d.cancel()
+
+        result = defer.Deferred(cancel)
+
+        def on_success(response, name):
+            downloads.pop(name, None)
+            if result.called:
+                return
+            elapsed = time.monotonic() - start
+            if timer.active():
+                timer.cancel()
+            losers = list(downloads.values())
+            self._record_latency(elapsed)
+            if name == 'hedge':
+                self.stats.inc_value('hedging/won')
+                saved = self._expected_remaining(elapsed)
+                self.stats.inc_value('hedging/latency_saved_ms_estimated', round(saved * 1000))
+                # La latence vue par le reste du crawl est celle de la requête d'origine
+                request.meta['download_latency'] = elapsed
+            elif hedged:
+                self.stats.inc_value('hedging/lost')
+            result.callback(response)
+            # Annulé après le callback : son échec (CancelledError) est ignoré par on_failure
+            for d in losers:
+                d.cancel()
+
+        def on_failure(failure, name):
+            downloads.pop(name, None)
+            # Téléchargement perdant annulé, ou échec après qu'une réponse a été retenue
+            if result.called:
+                return
+            failures.append(failure)
+            if downloads:
+                # L'autre téléchargement peut encore réussir
+                return
+            if timer.active():
+                timer.cancel()
+            result.errback(failures[0])
+
+        def send_hedge():
+            if result.called or not downloads:
+                return
+            if self.hedges >= self.budget_ratio * self.requests:
+                self.stats.inc_value('hedging/budget_exhausted')
+                return
+            self.hedges += 1
+            hedged.append(True)
+            self.stats.inc_value('hedging/sent')
+            hedge_request = request.copy()
+            hedge_request.meta['hedge'] = True
+            d = self.handler.download_request(hedge_request, spider)
+            downloads['hedge'] = d
+            d.addCallbacks(on_success, on_failure, callbackArgs=('hedge',), errbackArgs=('hedge',))
+
+        timer = reactor.callLater(self._threshold, send_hedge)
+        d = self.handler.download_request(request, spider)
+        downloads['primary'] = d
+        d.addCallbacks(on_success, on_failure, callbackArgs=('primary',), errbackArgs=('primary',))
+        return result
+
+    def close(self):
+        """
+        Ferme le handler délégué.
+        Returns:
+            twisted.internet.defer.Deferred: Le Deferred de fermeture du handler délégué, s'il en a un.
+        """
+        if hasattr(self.handler, 'close'):
+            return self.handler.close()
+
+
+class InstrumentedHTTPConnectionPool(HTTPConnectionPool):
+    """
+    Pool de connexions HTTP/1.1 persistantes qui compte les connexions ouvertes, réutilisées et fermées faute de place.
+    """
+
+    def __init__(self, reactor, stats, persistent=True):
+        super().__init__(reactor, persistent)
+        self.stats = stats
+
+    def _update_reuse_ratio(self):
+        opened = self.stats.get_value('connection_pool/connections_opened', 0)
+        requests = self.stats.get_value('connection_pool/requests', 0)
+        if requests:
+            self.stats.set_value('connection_pool/reuse_ratio', round(max(1 - opened / requests, 0), 4))
+
+    def getConnection(self, key, endpoint):
+        self.stats.inc_value('connection_pool/requests')
+        d = super().getConnection(key, endpoint)
+        self._update_reuse_ratio()
+        return d
+
+    def _newConnection(self, key, endpoint):
+        # Appelé aussi par Twisted pour rejouer une requête sur une connexion persistante fermée par le serveur
+        self.stats.inc_value('connection_pool/connections_opened')
+        self._update_reuse_ratio()
+        return super()._newConnection(key, endpoint)
+
+    def _putConnection(self, key, connection):
+        # Pool plein : Twisted ferme la connexion la plus ancienne (maxPersistentPerHost trop petit)
+        if len(self._connections.get(key, ())) >= self.maxPersistentPerHost:
+            self.stats.inc_value('connection_pool/connections_discarded')
+        return super()._putConnection(key, connection)
+
+
+class PooledHTTP11DownloadHandler(HTTP11DownloadHandler):
+    """
+    Handler HTTP/1.1 de Scrapy avec un pool de connexions persistantes dimensionné pour le proxy.
+
+    Avec le proxy ScrapeOps, toutes les requêtes vont au même hôte : le pool garde jusqu'à
+    DOWNLOAD_POOL_MAX_PERSISTENT connexions ouvertes vers lui (par défaut la concurrence
+    maximale du crawl, AdaptiveConcurrency compris) pendant DOWNLOAD_POOL_IDLE_TIMEOUT
+    secondes d'inactivité, pour que la poignée de main TCP/TLS ne soit payée qu'une fois
+    par connexion et non une fois par page. Avec DOWNLOAD_POOL_HTTP2, les requêtes HTTPS
+    passent par le handler HTTP/2 de Scrapy (une connexion multiplexée par hôte, paquet h2
+    requis).
+
+    Statistiques : connection_pool/requests, connections_opened, reuse_ratio et
+    connections_discarded ; les poignées de main TLS sont mesurées par TimingContextFactory.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le handler à partir des paramètres du crawler.
+        download_request(request, spider): Télécharge la requête avec une connexion du pool.
+        close(): Ferme les connexions du pool.
+    """
+
+    def __init__(self, settings, crawler=None):
+        """
+        Initialise le handler PooledHTTP11DownloadHandler et son pool de connexions.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        """
+        super().__init__(settings, crawler)
+        from twisted.internet import reactor
+
+        max_persistent = settings.getint('DOWNLOAD_POOL_MAX_PERSISTENT')
+        if max_persistent <= 0:
+            max_persistent = max(settings.getint('CONCURRENT_REQUESTS'), settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN'))
+            if settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED'):
+                max_persistent = max(max_persistent, settings.getint('ADAPTIVE_CONCURRENCY_MAX'))
+        self._pool = InstrumentedHTTPConnectionPool(reactor, crawler.stats, persistent=True)
+        self._pool.maxPersistentPerHost = max_persistent
+        self._pool.cachedConnectionTimeout = settings.getint('DOWNLOAD_POOL_IDLE_TIMEOUT', 240)
+        self._pool._factory.noisy = False
+        crawler.stats.set_value('connection_pool/max_persistent', max_persistent)
+
+        self._h2_handler = None
+        if settings.getbool('DOWNLOAD_POOL_HTTP2'):
+            try:
+                from scrapy.core.downloader.handlers.http2 import H2DownloadHandler
+            except ImportError:
+                logger.warning("DOWNLOAD_POOL_HTTP2 ignoré : le paquet h2 n'est pas installé (pip install 'Twisted[http2]')")
+            else:
+                self._h2_handler = H2DownloadHandler(settings, crawler)
+        self.stats = crawler.stats
+
+    def download_request(self, request, spider):
+        """
+        Télécharge la requête avec une connexion du pool (HTTP/2 pour HTTPS si activé).
+        Args:
+            request (scrapy.http.Request): La requête à télécharger.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        Returns:
+            twisted.internet.defer.Deferred: Le Deferred de la réponse.
+        """
+        if self._h2_handler is not None and urlparse_cached(request).scheme == 'https':
+            self.stats.inc_value('connection_pool/h2_requests')
+            return self._h2_handler.download_request(request, spider)
+        return super().download_request(request, spider)
+
+    def close(self):
+        """
+        Ferme les connexions du pool (et celles du handler HTTP/2).
+        Returns:
+            twisted.internet.defer.Deferred: Le Deferred de fermeture du pool HTTP/1.1.
+        """
+        if self._h2_handler is not None:
+            self._h2_handler.close()
+        return super().close()
+
+
+class TimingClientTLSOptions(ScrapyClientTLSOptions):
+    """
+    Options TLS client de Scrapy qui mesurent la durée des poignées de main et reprennent les sessions TLS.
+    """
+
+    def __init__(self, hostname, ctx, verbose_logging=False, factory=None):
+        super().__init__(hostname, ctx, verbose_logging=verbose_logging)
+        self.factory = factory
+        self._handshake_started = None
+        self._handshake_done = False
+
+    def clientConnectionForTLS(self, tlsProtocol):
+        connection = super().clientConnectionForTLS(tlsProtocol)
+        self.factory.resume_session(self._hostnameASCII, connection)
+        return connection
+
+    def _identityVerifyingInfoCallback(self, connection, where, ret):
+        if where & SSL.SSL_CB_HANDSHAKE_START and self._handshake_started is None:
+            self._handshake_started = time.perf_counter()
+        elif where & SSL.SSL_CB_HANDSHAKE_DONE and not self._handshake_done:
+            self._handshake_done = True
+            self.factory.record_handshake(time.perf_counter() - self._handshake_started, _session_reused(connection))
+        if self._handshake_done:
+            # En TLS 1.3, les tickets de session arrivent après la poignée de main (messages post-handshake)
+            self.factory.store_session(self._hostnameASCII, connection)
+        super()._identityVerifyingInfoCallback(connection, where, ret)
+
+
+class TimingContextFactory(ScrapyClientContextFactory):
+    """
+    Fabrique de contextes TLS (DOWNLOADER_CLIENTCONTEXTFACTORY) qui mesure les poignées de main TLS.
+
+    Avec DOWNLOAD_POOL_TLS_RESUMPTION, la session TLS de la dernière connexion vers un hôte
+    est proposée à la connexion suivante : la reprise de session évite l'échange de clés complet.
+    Une session n'est reprise que si la connexion d'origine a été fermée proprement (close_notify).
+
+    Statistiques : connection_pool/tls_handshakes, tls_sessions_resumed, tls_handshake_ms_total,
+    tls_handshake_ms_avg et tls_handshake_ms_max. tls_sessions_resumed n'est compté que si
+    pyOpenSSL donne accès à SSL_session_reused (symbole privé, absent de certaines versions).
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler, method=SSL.SSLv23_METHOD, *args, **kwargs):
+        factory = cls.from_settings(crawler.settings, method, *args, **kwargs)
+        factory.stats = crawler.stats
+        factory.resumption = crawler.settings.getbool('DOWNLOAD_POOL_TLS_RESUMPTION', True)
+        return factory
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = None
+        self.resumption = True
+        self._last_sessions = {}
+
+    def getCertificateOptions(self):
+        # Mêmes options que Scrapy, mais Twisted désactive par défaut les tickets de session
+        # (OP_NO_TICKET) : sans eux, la reprise dépend du cache de sessions du serveur
+        return CertificateOptions(
+            verify=False,
+            method=getattr(self, 'method', getattr(self, '_ssl_method', None)),
+            fixBrokenPeers=True,
+            acceptableCiphers=self.tls_ciphers,
+            enableSessionTickets=self.resumption,
+        )
+
+    def getContext(self, hostname=None, port=None):
+        ctx = super().getContext(hostname, port)
+        if self.resumption:
+            # Twisted tire un identifiant de contexte de session par contexte OpenSSL : OpenSSL
+            # refuserait la session à la connexion suivante, qui a son propre contexte
+            ctx.set_session_id(b'project_scrapy')
+        return ctx
+
+    def creatorForNetloc(self, hostname, port):
+        return TimingClientTLSOptions(hostname.decode('ascii'), self.getContext(), verbose_logging=self.tls_verbose_logging, factory=self)
+
+    def resume_session(self, hostname, connection):
+        session = self._last_sessions.get(hostname)
+        if self.resumption and session is not None:
+            connection.set_session(session)
+
+    def store_session(self, hostname, connection):
+        # Seule la session est gardée, pas la connexion (et son socket) : relue à chaque message
+        # après la poignée de main, elle contient le dernier ticket reçu
+        session = connection.get_session()
+        if self.resumption and session is not None:
+            self._last_sessions[hostname] = session
+
+    def record_handshake(self, duration, resumed):
+        if self.stats is None:
+            return
+        duration_ms = duration * 1000
+        self.stats.inc_value('connection_pool/tls_handshakes')
+        if resumed:
+            self.stats.inc_value('connection_pool/tls_sessions_resumed')
+        self.stats.inc_value('connection_pool/tls_handshake_ms_total', duration_ms)
+        self.stats.max_value('connection_pool/tls_handshake_ms_max', duration_ms)
+        self.stats.set_value(
+            'connection_pool/tls_handshake_ms_avg',
+            self.stats.get_value('connection_pool/tls_handshake_ms_total') / self.stats.get_value('connection_pool/tls_handshakes'),
+        )
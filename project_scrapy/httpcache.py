@@ -0,0 +1,234 @@
+# Cache HTTP du projet, compatible avec le proxy ScrapeOps
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#module-scrapy.downloadermiddlewares.httpcache
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pickle
+import time
+from collections import OrderedDict
+
+from scrapy.extensions.httpcache import DummyPolicy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.url import canonicalize_url
+
+from project_scrapy.middlewares import ScrapeOpsProxyMiddleware
+
+
+logger = logging.getLogger(__name__)
+
+
+def original_url(request):
+    """
+    Retourne l'URL originale de la requête, avant sa réécriture par le proxy.
+    Args:
+        request (scrapy.http.Request): La requête Scrapy actuelle.
+    Returns:
+        str: L'URL de l'en-tête X-Original-URL, ou l'URL de la requête s'il est absent.
+    """
+    header = request.headers.get('X-Original-URL')
+    if header is None:
+        return request.url
+    return header.decode('utf-8')
+
+
+class OriginalUrlCacheStorage:
+    """
+    Stockage du cache HTTP (HTTPCACHE_STORAGE) indexé sur l'URL originale des requêtes.
+
+    L'empreinte Scrapy d'une requête passée par ScrapeOpsProxyMiddleware est calculée sur
+    l'URL du proxy, qui contient la clé d'API, la session et un js_scenario tiré au hasard :
+    deux crawls identiques ne partagent jamais une entrée. La clé est ici calculée sur la
+    méthode, l'URL originale (X-Original-URL, canonisée), le corps et les drapeaux de rendu
+    (HTTPCACHE_KEY_META, sops_render_js et sops_js_scenario par défaut) : une page rendue
+    en JavaScript reste distincte de la page statique, quelle que soit la route utilisée.
+
+    Chaque réponse est un fichier <HTTPCACHE_DIR>/<spider>/<xx>/<clé>.pkl.gz (pickle
+    compressé en gzip, niveau HTTPCACHE_COMPRESSION_LEVEL). Une entrée plus vieille que
+    HTTPCACHE_EXPIRATION_SECS est supprimée à la lecture (0 = jamais). Quand le cache
+    dépasse HTTPCACHE_MAX_SIZE_MB, les entrées les moins récemment lues sont supprimées ;
+    la date de modification des fichiers sert d'ordre LRU d'une exécution à l'autre.
+
+    Statistiques : httpcache/expired, httpcache/evicted, httpcache/size_bytes et
+    httpcache/entries (hit, miss et store sont comptés par HttpCacheMiddleware).
+
+    Attributs:
+        cachedir (str): Le dossier racine du cache.
+        expiration_secs (int): La durée de vie d'une entrée, en secondes.
+        max_size (int): La taille maximale du cache d'un spider, en octets.
+        compression_level (int): Le niveau de compression gzip.
+        key_meta (list): Les clés de meta qui distinguent deux réponses d'une même URL.
+        entries (collections.OrderedDict): La taille de chaque entrée, de la moins récemment lue à la plus récente.
+        size (int): La taille totale des entrées, en octets.
+
+    Méthodes:
+        open_spider(spider): Indexe les entrées existantes du spider.
+        close_spider(spider): Journalise la taille du cache.
+        retrieve_response(spider, request): Retourne la réponse en cache, ou None.
+        store_response(spider, request, response): Enregistre la réponse dans le cache.
+        request_key(request): Calcule la clé de cache d'une requête.
+    """
+
+    def __init__(self, settings):
+        """
+        Initialise le stockage OriginalUrlCacheStorage avec les paramètres du crawler.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+        """
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'])
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.max_size = int(settings.getfloat('HTTPCACHE_MAX_SIZE_MB', 1024) * 1024 * 1024)
+        self.compression_level = settings.getint('HTTPCACHE_COMPRESSION_LEVEL', 6)
+        self.key_meta = settings.getlist('HTTPCACHE_KEY_META', ['sops_render_js', 'sops_js_scenario'])
+        self.entries = OrderedDict()
+        self.size = 0
+        self.stats = None
+        self.spider_dir = None
+
+    def open_spider(self, spider):
+        """
+        Indexe les entrées existantes du spider, de la moins récemment lue à la plus récente.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        self.stats = spider.crawler.stats
+        self.spider_dir = os.path.join(self.cachedir, spider.name)
+        os.makedirs(self.spider_dir, exist_ok=True)
+        found = []
+        for shard in os.scandir(self.spider_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.pkl.gz'):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-len('.pkl.gz')], stat.st_size))
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        self.size = sum(self.entries.values())
+        self._update_stats()
+        spider.logger.info(f'Cache HTTP : {len(self.entries)} réponses ({self.size / 1024 / 1024:.1f} Mo) dans {self.spider_dir}')
+
+    def close_spider(self, spider):
+        """
+        Journalise la taille du cache à la fermeture du spider.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        spider.logger.info(f'Cache HTTP : {len(self.entries)} réponses ({self.size / 1024 / 1024:.1f} Mo)')
+
+    def request_key(self, request):
+        """
+        Calcule la clé de cache d'une requête, indépendante de la réécriture par le proxy.
+        Args:
+            request (scrapy.http.Request): La requête Scrapy actuelle.
+        Returns:
+            str: L'empreinte SHA-1 (hexadécimale) de la méthode, de l'URL originale, du corps et des drapeaux de rendu.
+        """
+        flags = {key: ScrapeOpsProxyMiddleware._param_is_true(request, key) for key in self.key_meta}
+        fingerprint = hashlib.sha1()
+        fingerprint.update(json.dumps([request.method, canonicalize_url(original_url(request)), flags], sort_keys=True).encode('utf-8'))
+        fingerprint.update(request.body)
+        return fingerprint.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.spider_dir, key[:2], f'{key}.pkl.gz')
+
+    def retrieve_response(self, spider, request):
+        """
+        Retourne la réponse en cache pour cette requête.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+            request (scrapy.http.Request): La requête Scrapy actuelle.
+        Returns:
+            scrapy.http.Response: La réponse en cache, ou None si elle est absente ou périmée.
+        """
+        key = self.request_key(request)
+        if key not in self.entries:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.loads(gzip.decompress(f.read()))
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            spider.logger.warning(f'Entrée du cache HTTP illisible, supprimée : {path} ({e})')
+            self._remove(key)
+            return None
+        if 0 < self.expiration_secs < time.time() - entry['timestamp']:
+            self.stats.inc_value('httpcache/expired')
+            self._remove(key)
+            return None
+        # Entrée lue : elle devient la plus récente pour l'éviction LRU, y compris aux exécutions suivantes
+        self.entries.move_to_end(key)
+        os.utime(path)
+        headers = Headers(entry['headers'])
+        respcls = responsetypes.from_args(headers=headers, url=entry['url'], body=entry['body'])
+        return respcls(url=entry['url'], headers=headers, status=entry['status'], body=entry['body'])
+
+    def store_response(self, spider, request, response):
+        """
+        Enregistre la réponse dans le cache, puis évince les entrées les plus anciennes si le cache est plein.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+            request (scrapy.http.Request): La requête envoyée au serveur.
+            response (scrapy.http.Response): La réponse reçue du serveur.
+        """
+        key = self.request_key(request)
+        entry = {
+            'url': response.url,
+            'status': response.status,
+            'headers': dict(response.headers),
+            'body': response.body,
+            'timestamp': time.time(),
+        }
+        data = gzip.compress(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL), compresslevel=self.compression_level)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(f'{path}.tmp', path)
+        self.size += len(data) - self.entries.pop(key, 0)
+        self.entries[key] = len(data)
+        self._evict(keep=key)
+        self._update_stats()
+
+    def _evict(self, keep):
+        while self.size > self.max_size and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            if key == keep:
+                break
+            self._remove(key)
+            self.stats.inc_value('httpcache/evicted')
+
+    def _remove(self, key):
+        self.size -= self.entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        self._update_stats()
+
+    def _update_stats(self):
+        self.stats.set_value('httpcache/size_bytes', self.size)
+        self.stats.set_value('httpcache/entries', len(self.entries))
+
+
+class ProxyAwareCachePolicy(DummyPolicy):
+    """
+    Politique du cache HTTP (HTTPCACHE_POLICY) adaptée au proxy ScrapeOps.
+
+    Comme DummyPolicy, toute réponse en cache est servie sans revalidation (la durée de
+    vie est gérée par OriginalUrlCacheStorage) et les codes HTTPCACHE_IGNORE_HTTP_CODES
+    ne sont pas enregistrés : blocages et erreurs du proxy seraient sinon rejoués. Les
+    requêtes de préchauffage des sessions du proxy et celles marquées par
+    meta['dont_cache'] ne passent jamais par le cache.
+    """
+
+    def should_cache_request(self, request):
+        if request.meta.get('dont_cache') or request.meta.get('proxy_session_warmup'):
+            return False
+        return super().should_cache_request(request)
@@ -3,6 +3,9 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
+from dataclasses import dataclass, fields
+from typing import Optional, Union
+
 import scrapy
 
 
@@ -17,6 +20,36 @@ class BookItem(scrapy.Item):
     tax = scrapy.Field()
     availability = scrapy.Field()
     number_of_reviews = scrapy.Field()
+    image_url = scrapy.Field()
+    image_path = scrapy.Field()
+    image_hash = scrapy.Field()
+
+
+@dataclass(slots=True)
+class Book:
+    """
+    Livre scrapé, en représentation compacte (dataclass à __slots__, sans dict par instance).
+
+    Mêmes champs que BookItem. Le spider remplit les champs avec le texte des pages ;
+    ProjectScrapyPipeline convertit ensuite les prix en float et la disponibilité et le
+    nombre d'avis en int : ces champs sont donc annotés str ou nombre. Les pipelines et les
+    exports lisent les champs avec ItemAdapter.
+    image_url est l'URL absolue de la couverture ; image_path et image_hash sont renseignés
+    par CoverImagePipeline (chemin dans COVERS_STORE et empreinte SHA-256 du contenu).
+    """
+    title: Optional[str] = None
+    image: Optional[str] = None
+    description: Optional[str] = None
+    UPC: Optional[str] = None
+    product_type: Optional[str] = None
+    price: Optional[Union[str, float]] = None
+    price_tax: Optional[Union[str, float]] = None
+    tax: Optional[Union[str, float]] = None
+    availability: Optional[Union[str, int]] = None
+    number_of_reviews: Optional[Union[str, int]] = None
+    image_url: Optional[str] = None
+    image_path: Optional[str] = None
+    image_hash: Optional[str] = None
 
 
-    
\ No newline at end of file
+BOOK_FIELDS = tuple(field.name for field in fields(Book))
@@ -12,11 +12,131 @@ from random import randint
 import requests
 import scrapy
 from json import dumps
+import json
+import os
 import random
+import re
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from scrapy.downloadermiddlewares.retry import RetryMiddleware, get_retry_request
+from scrapy.http.request import NO_CALLBACK
+from scrapy.utils.project import data_path
+from scrapy.utils.response import response_status_message
+from twisted.internet import defer, task, threads
 
 import scrapy.exceptions
 
 
+class ScrapeOpsPoolCache:
+    """
+    Cache disque d'une liste (User-Agents ou en-têtes) récupérée depuis l'API ScrapeOps.
+
+    La liste est lue depuis le disque à l'initialisation, sans appel réseau, puis
+    rafraîchie en arrière-plan (thread du reactor) quand elle est plus vieille que
+    SCRAPEOPS_POOL_CACHE_TTL secondes. Si l'API est lente ou injoignable, la liste en
+    cache reste utilisée, même périmée.
+
+    Attributs:
+        path (str): Le fichier JSON du cache.
+        endpoint (str): L'URL de l'endpoint ScrapeOps.
+        payload (dict): Les paramètres envoyés à l'endpoint.
+        ttl (int): La durée de validité du cache, en secondes.
+        timeout (float): Le délai maximal d'un rafraîchissement, en secondes.
+        retry_delay (float): Le délai avant une nouvelle tentative après un échec, en secondes.
+        pool (list): La liste actuellement utilisée.
+        fetched_at (float): La date (timestamp) de la dernière récupération réussie.
+
+    Méthodes:
+        is_stale(): Indique si la liste doit être rafraîchie.
+        refresh(logger): Lance un rafraîchissement en arrière-plan.
+    """
+
+    def __init__(self, settings, name, endpoint, payload):
+        """
+        Initialise le cache et charge la liste enregistrée sur le disque.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            name (str): Le nom du fichier de cache (sans extension).
+            endpoint (str): L'URL de l'endpoint ScrapeOps.
+            payload (dict): Les paramètres envoyés à l'endpoint.
+        """
+        cache_dir = data_path(settings.get('SCRAPEOPS_POOL_CACHE_DIR', 'scrapeops'), createdir=True)
+        self.path = os.path.join(cache_dir, f'{name}.json')
+        self.endpoint = endpoint
+        self.payload = payload
+        self.ttl = settings.getint('SCRAPEOPS_POOL_CACHE_TTL', 86400)
+        self.timeout = settings.getfloat('SCRAPEOPS_POOL_REFRESH_TIMEOUT', 10)
+        self.retry_delay = settings.getfloat('SCRAPEOPS_POOL_RETRY_DELAY', 60)
+        self.pool = []
+        self.fetched_at = 0
+        self._refreshing = None
+        self._next_attempt_at = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                cached = json.load(f)
+            self.pool = cached['result']
+            self.fetched_at = cached['fetched_at']
+        except (OSError, ValueError, KeyError):
+            self.pool = []
+            self.fetched_at = 0
+
+    def _save(self):
+        with open(f'{self.path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': self.fetched_at, 'result': self.pool}, f)
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def is_stale(self):
+        """
+        Indique si la liste est absente ou plus vieille que le TTL.
+        Returns:
+            bool: True si la liste doit être rafraîchie.
+        """
+        return not self.pool or time.time() - self.fetched_at >= self.ttl
+
+    def _fetch(self):
+        # Exécuté dans un thread : requests est bloquant
+        response = requests.get(self.endpoint, params=urlencode(self.payload), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get('result', [])
+
+    def refresh(self, logger):
+        """
+        Lance un rafraîchissement de la liste en arrière-plan, sans bloquer le reactor.
+        Un seul rafraîchissement est en cours à la fois et, après un échec, aucun
+        autre n'est tenté avant retry_delay secondes.
+        Args:
+            logger (logging.Logger): Le logger du spider.
+        Returns:
+            twisted.internet.defer.Deferred: Déclenché à la fin du rafraîchissement, réussi ou non.
+        """
+        if self._refreshing is None and time.time() < self._next_attempt_at:
+            return defer.succeed(None)
+        if self._refreshing is None:
+            self._refreshing = threads.deferToThread(self._fetch)
+            self._refreshing.addCallbacks(self._on_refreshed, self._on_refresh_failed, callbackArgs=(logger,), errbackArgs=(logger,))
+        return self._refreshing
+
+    def _on_refreshed(self, pool, logger):
+        self._refreshing = None
+        if not pool:
+            self._next_attempt_at = time.time() + self.retry_delay
+            logger.warning(f'Réponse vide de {self.endpoint}, la liste en cache est conservée')
+            return
+        self.pool = pool
+        self.fetched_at = time.time()
+        self._save()
+        logger.info(f'{len(pool)} éléments récupérés depuis {self.endpoint}')
+
+    def _on_refresh_failed(self, failure, logger):
+        self._refreshing = None
+        self._next_attempt_at = time.time() + self.retry_delay
+        logger.warning(f'Rafraîchissement impossible depuis {self.endpoint} ({failure.getErrorMessage()}), la liste en cache est conservée')
+
+
 class ScrapeOpsFakeUserAgentMiddleware:
     """
     Middleware Scrapy pour utiliser des User-Agents aléatoires de ScrapeOps.
@@ -29,11 +149,12 @@ class ScrapeOpsFakeUserAgentMiddleware:
         scrapeops_endpoint (str): L'URL de l'endpoint pour récupérer les User-Agents.
         scrapeops_fake_user_agents_active (bool): Indique si le changement de User-Agent est activé.
         scrapeops_num_results (int): Le nombre de User-Agents à récupérer.
-        headers_list (list): La liste des User-Agents récupérés.
+        user_agents_cache (ScrapeOpsPoolCache): Le cache disque des User-Agents récupérés.
 
     Méthodes:
         from_crawler(cls, crawler): Initialise le middleware à partir des paramètres du crawler.
-        _get_user_agents_list(): Récupère la liste des User-Agents depuis l'API ScrapeOps.
+        spider_opened(spider): Rafraîchit la liste en arrière-plan si le cache est périmé.
+        _get_user_agents_list(spider): Récupère la liste des User-Agents depuis l'API ScrapeOps.
         _get_random_user_agent(): Sélectionne un User-Agent aléatoire de la liste récupérée.
         _scrapeops_fake_user_agents_enabled(): Vérifie si le changement de User-Agent est activé.
         process_request(request, spider): Modifie les requêtes en ajoutant un User-Agent aléatoire.
@@ -53,7 +174,9 @@ class ScrapeOpsFakeUserAgentMiddleware:
         Returns:
             ScrapeOpsFakeUserAgentMiddleware: Une instance du middleware initialisée avec les paramètres du crawler.
         """
-        return cls(crawler.settings)
+        middleware = cls(crawler.settings)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        return middleware
     
 
     def __init__(self, settings):
@@ -66,32 +189,39 @@ class ScrapeOpsFakeUserAgentMiddleware:
             scrapeops_endpoint (str): L'URL de l'endpoint pour récupérer les User-Agents.
             scrapeops_fake_user_agents_active (bool): Indique si le changement de User-Agent est activé.
             scrapeops_num_results (int): Le nombre de User-Agents à récupérer.
-            headers_list (list): La liste des User-Agents récupérés.
+            user_agents_cache (ScrapeOpsPoolCache): Le cache disque des User-Agents récupérés.
         """
         self.api_key = settings.get('SCRAPEOPS_API_KEY')
         self.scrapeops_endpoint = settings.get('SCRAPEOPS_FAKE_USER_AGENT_ENDPOINT', 'http://headers.scrapeops.io/v1/user-agents?') 
         self.scrapeops_fake_user_agents_active = settings.get('SCRAPEOPS_FAKE_USER_AGENT_ENABLED', False)
         self.scrapeops_num_results = settings.get('SCRAPEOPS_NUM_RESULTS')
-        self.headers_list = []
-        self._get_user_agents_list()
+        payload = {'api_key': self.api_key}
+        if self.scrapeops_num_results is not None:
+            payload['num_results'] = self.scrapeops_num_results
+        # Chargement instantané depuis le disque, le rafraîchissement se fait en arrière-plan
+        self.user_agents_cache = ScrapeOpsPoolCache(settings, 'user-agents', self.scrapeops_endpoint, payload)
         self._scrapeops_fake_user_agents_enabled()
 
-    def _get_user_agents_list(self):
+    def spider_opened(self, spider):
+        """
+        Rafraîchit la liste des User-Agents en arrière-plan si le cache est absent ou périmé.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        if self.user_agents_cache.is_stale():
+            self._get_user_agents_list(spider)
+
+    def _get_user_agents_list(self, spider):
         """
         Récupère la liste des User-Agents depuis l'API ScrapeOps.
-        Envoie une requête à l'API ScrapeOps pour obtenir une liste de User-Agents
-        que le middleware pourra utiliser pour chaque requête.
+        La requête est envoyée dans un thread et la liste en cache reste utilisée
+        jusqu'à la réponse.
         Args:
-            Aucun
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
         Returns:
-            None
+            twisted.internet.defer.Deferred: Déclenché à la fin du rafraîchissement.
         """
-        payload = {'api_key': self.api_key}
-        if self.scrapeops_num_results is not None:
-            payload['num_results'] = self.scrapeops_num_results
-        response = requests.get(self.scrapeops_endpoint, params=urlencode(payload))
-        json_response = response.json()
-        self.user_agents_list = json_response.get('result', [])
+        return self.user_agents_cache.refresh(spider.logger)
 
     def _get_random_user_agent(self):
         """
@@ -99,10 +229,11 @@ class ScrapeOpsFakeUserAgentMiddleware:
         Args:
             Aucun
         Returns:
-            str: Un User-Agent aléatoire.
+            str: Un User-Agent aléatoire, ou None si aucune liste n'est encore disponible.
         """
-        random_index = randint(0, len(self.user_agents_list) - 1)
-        return self.user_agents_list[random_index]
+        if not self.user_agents_cache.pool:
+            return None
+        return random.choice(self.user_agents_cache.pool)
 
     def _scrapeops_fake_user_agents_enabled(self):
         """
@@ -129,7 +260,11 @@ class ScrapeOpsFakeUserAgentMiddleware:
         Returns:
             None
         """
+        if self.user_agents_cache.is_stale():
+            self._get_user_agents_list(spider)
         random_user_agent = self._get_random_user_agent()
+        if random_user_agent is None:
+            return None
         request.headers['User-Agent'] = random_user_agent
         spider.logger.info(f'User-Agent utilisé: {random_user_agent}')
 
@@ -150,12 +285,13 @@ class ScrapeOpsFakeBrowserHeadersMiddleware:
         scrapeops_endpoint (str): L'URL de l'endpoint pour obtenir les en-têtes de navigateur.
         scrapeops_fake_headers_active (bool): Indique si le remplacement des en-têtes est activé.
         scrapeops_num_results (int): Le nombre d'en-têtes à récupérer.
-        headers_list (list): La liste des en-têtes de navigateur récupérés.
+        headers_cache (ScrapeOpsPoolCache): Le cache disque des en-têtes de navigateur récupérés.
 
     Méthodes:
         from_crawler(cls, crawler): Initialise le middleware à partir des paramètres du crawler.
         __init__(self, settings): Initialise le middleware avec les paramètres de configuration.
-        _get_headers_list(self): Récupère la liste des en-têtes de navigateur depuis l'API ScrapeOps.
+        spider_opened(self, spider): Rafraîchit la liste en arrière-plan si le cache est périmé.
+        _get_headers_list(self, spider): Récupère la liste des en-têtes de navigateur depuis l'API ScrapeOps.
         _get_random_header(self): Sélectionne un en-tête aléatoire dans la liste des en-têtes.
         _scrapeops_fake_headers_enabled(self): Vérifie si l'utilisation des en-têtes faux est activée.
         process_request(self, request, spider): Modifie les en-têtes de la requête avant de l'envoyer.
@@ -172,7 +308,9 @@ class ScrapeOpsFakeBrowserHeadersMiddleware:
         Returns:
             ScrapeOpsFakeBrowserHeadersMiddleware: Une instance du middleware initialisée avec les paramètres du crawler.
         """
-        return cls(crawler.settings)
+        middleware = cls(crawler.settings)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        return middleware
 
     def __init__(self, settings):
         """
@@ -184,32 +322,39 @@ class ScrapeOpsFakeBrowserHeadersMiddleware:
             scrapeops_endpoint (str): L'URL de l'endpoint pour obtenir les en-têtes de navigateur.
             scrapeops_fake_headers_active (bool): Indique si le remplacement des en-têtes est activé.
             scrapeops_num_results (int): Le nombre d'en-têtes à récupérer.
-            headers_list (list): La liste des en-têtes de navigateur récupérés.
+            headers_cache (ScrapeOpsPoolCache): Le cache disque des en-têtes de navigateur récupérés.
         """
         self.api_key = settings.get('SCRAPEOPS_API_KEY')
         self.scrapeops_endpoint = settings.get('SCRAPEOPS_FAKE_HEADERS_ENDPOINT', 'http://headers.scrapeops.io/v1/browser-headers?') 
         self.scrapeops_fake_headers_active = settings.get('SCRAPEOPS_FAKE_HEADERS_ENABLED', False)
         self.scrapeops_num_results = settings.get('SCRAPEOPS_NUM_RESULTS')
-        self.headers_list = []
-        self._get_headers_list()
+        payload = {'api_key': self.api_key}
+        if self.scrapeops_num_results is not None:
+            payload['num_results'] = self.scrapeops_num_results
+        # Chargement instantané depuis le disque, le rafraîchissement se fait en arrière-plan
+        self.headers_cache = ScrapeOpsPoolCache(settings, 'browser-headers', self.scrapeops_endpoint, payload)
         self._scrapeops_fake_headers_enabled()
 
-    def _get_headers_list(self):
+    def spider_opened(self, spider):
+        """
+        Rafraîchit la liste des en-têtes en arrière-plan si le cache est absent ou périmé.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        if self.headers_cache.is_stale():
+            self._get_headers_list(spider)
+
+    def _get_headers_list(self, spider):
         """
         Récupère la liste des en-têtes de navigateur depuis l'API ScrapeOps.
-        Cette méthode envoie une requête à l'API ScrapeOps pour obtenir une liste
-        d'en-têtes de navigateur à utiliser pour masquer les requêtes.
+        La requête est envoyée dans un thread et la liste en cache reste utilisée
+        jusqu'à la réponse.
         Args:
-            Aucun.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
         Returns:
-            Aucun. Met à jour l'attribut headers_list avec les en-têtes récupérés.
+            twisted.internet.defer.Deferred: Déclenché à la fin du rafraîchissement.
         """
-        payload = {'api_key': self.api_key}
-        if self.scrapeops_num_results is not None:
-            payload['num_results'] = self.scrapeops_num_results
-        response = requests.get(self.scrapeops_endpoint, params=urlencode(payload))
-        json_response = response.json()
-        self.headers_list = json_response.get('result', [])
+        return self.headers_cache.refresh(spider.logger)
 
 
     def _get_random_header(self):
@@ -220,10 +365,11 @@ class ScrapeOpsFakeBrowserHeadersMiddleware:
         Args:
             Aucun.
         Returns:
-            dict: Un dictionnaire contenant les en-têtes de navigateur sélectionnés.
+            dict: Un dictionnaire contenant les en-têtes de navigateur sélectionnés, ou None si aucune liste n'est encore disponible.
         """
-        random_index = randint(0, len(self.headers_list) - 1)
-        return self.headers_list[random_index]
+        if not self.headers_cache.pool:
+            return None
+        return random.choice(self.headers_cache.pool)
 
 
     def _scrapeops_fake_headers_enabled(self):
@@ -252,7 +398,11 @@ class ScrapeOpsFakeBrowserHeadersMiddleware:
         Returns:
             Aucun. Met à jour les en-têtes de la requête.
         """    
+        if self.headers_cache.is_stale():
+            self._get_headers_list(spider)
         random_header = self._get_random_header()
+        if random_header is None:
+            return None
         for key, val in random_header.items():
             request.headers[key] = val
         spider.logger.info(f'Random Header : {random_header}')
@@ -260,6 +410,141 @@ class ScrapeOpsFakeBrowserHeadersMiddleware:
 
 
 
+class ProxySessionPool:
+    """
+    Pool de sessions persistantes (session_number) du proxy ScrapeOps.
+
+    Chaque session correspond à une IP sortante du proxy. Les requêtes sont réparties entre
+    les sessions par le choix du meilleur de deux sessions tirées au hasard, selon un score
+    qui combine la latence moyenne (moyenne mobile exponentielle), le taux d'erreurs et le
+    nombre de requêtes en cours. Une session trop lente (latence supérieure à latency_factor
+    fois la médiane du pool) ou trop bloquée (taux d'erreurs supérieur à max_error_rate)
+    est retirée et remplacée par une nouvelle session, à préchauffer avant de recevoir du trafic.
+
+    Attributs:
+        size (int): Le nombre de sessions du pool.
+        alpha (float): Le poids d'une nouvelle mesure dans les moyennes mobiles.
+        min_requests (int): Le nombre de réponses avant qu'une session puisse être retirée.
+        max_error_rate (float): Le taux d'erreurs au-delà duquel une session est retirée.
+        latency_factor (float): Le rapport à la latence médiane au-delà duquel une session est retirée.
+        sessions (dict): Les sessions actives, par numéro de session.
+
+    Méthodes:
+        acquire(): Choisit la session d'une requête.
+        release(number): Signale la fin d'une requête.
+        record(number, latency, ok): Met à jour le score d'une session et la retire si nécessaire.
+        retire(number): Remplace une session par une nouvelle.
+        mark_warm(number): Rend une session préchauffée disponible.
+    """
+
+    def __init__(self, size, alpha=0.2, min_requests=5, max_error_rate=0.3, latency_factor=3.0):
+        """
+        Initialise le pool avec size sessions froides.
+        Args:
+            size (int): Le nombre de sessions du pool.
+            alpha (float): Le poids d'une nouvelle mesure dans les moyennes mobiles.
+            min_requests (int): Le nombre de réponses avant qu'une session puisse être retirée.
+            max_error_rate (float): Le taux d'erreurs au-delà duquel une session est retirée.
+            latency_factor (float): Le rapport à la latence médiane au-delà duquel une session est retirée.
+        """
+        self.size = size
+        self.alpha = alpha
+        self.min_requests = min_requests
+        self.max_error_rate = max_error_rate
+        self.latency_factor = latency_factor
+        self.sessions = {}
+        # Numéros tirés au hasard pour ne pas retrouver les sessions d'une exécution précédente
+        self._next_number = random.randint(1, 10 ** 6)
+        for _ in range(size):
+            self._new_session()
+
+    def _new_session(self):
+        number = self._next_number
+        self._next_number += 1
+        self.sessions[number] = {'latency': None, 'error_rate': 0.0, 'responses': 0, 'in_flight': 0, 'warm': False}
+        return number
+
+    def cold_sessions(self):
+        """
+        Retourne les sessions qui n'ont pas encore été préchauffées.
+        Returns:
+            list: Les numéros de session.
+        """
+        return [number for number, session in self.sessions.items() if not session['warm']]
+
+    def _score(self, session):
+        latency = session['latency'] or 0.0
+        return (latency + 0.001) * (1 + session['in_flight']) / max(1 - session['error_rate'], 0.05)
+
+    def acquire(self):
+        """
+        Choisit la session d'une requête (meilleure de deux sessions préchauffées tirées au hasard).
+        Returns:
+            int: Le numéro de session.
+        """
+        # Tant qu'aucune session n'est préchauffée, les sessions froides servent quand même
+        candidates = [number for number, session in self.sessions.items() if session['warm']] or list(self.sessions)
+        number = min(random.sample(candidates, min(2, len(candidates))), key=lambda number: self._score(self.sessions[number]))
+        self.sessions[number]['in_flight'] += 1
+        return number
+
+    def release(self, number):
+        """
+        Signale la fin d'une requête de la session.
+        Args:
+            number (int): Le numéro de session.
+        """
+        session = self.sessions.get(number)
+        if session is not None and session['in_flight'] > 0:
+            session['in_flight'] -= 1
+
+    def mark_warm(self, number):
+        """
+        Rend une session préchauffée disponible pour le trafic.
+        Args:
+            number (int): Le numéro de session.
+        """
+        if number in self.sessions:
+            self.sessions[number]['warm'] = True
+
+    def record(self, number, latency, ok):
+        """
+        Met à jour la latence et le taux d'erreurs d'une session, et la remplace si elle est mauvaise.
+        Args:
+            number (int): Le numéro de session.
+            latency (float): La latence de la réponse en secondes, None pour une erreur de téléchargement.
+            ok (bool): False si la réponse est un blocage ou une erreur.
+        Returns:
+            int: Le numéro de la session de remplacement (à préchauffer), ou None.
+        """
+        session = self.sessions.get(number)
+        if session is None:
+            return None
+        session['responses'] += 1
+        session['error_rate'] += self.alpha * ((0.0 if ok else 1.0) - session['error_rate'])
+        if latency is not None:
+            session['latency'] = latency if session['latency'] is None else session['latency'] + self.alpha * (latency - session['latency'])
+        if session['responses'] < self.min_requests:
+            return None
+        latencies = sorted(other['latency'] for other in self.sessions.values() if other['latency'] is not None)
+        median_latency = latencies[len(latencies) // 2] if latencies else None
+        too_slow = median_latency and session['latency'] is not None and session['latency'] > self.latency_factor * median_latency
+        if session['error_rate'] > self.max_error_rate or too_slow:
+            return self.retire(number)
+        return None
+
+    def retire(self, number):
+        """
+        Retire une session et crée sa remplaçante.
+        Args:
+            number (int): Le numéro de session.
+        Returns:
+            int: Le numéro de la session de remplacement (à préchauffer).
+        """
+        self.sessions.pop(number, None)
+        return self._new_session()
+
+
 class ScrapeOpsProxyMiddleware:
     """
     Middleware Scrapy pour utiliser le proxy ScrapeOps.
@@ -267,15 +552,39 @@ class ScrapeOpsProxyMiddleware:
     Ce middleware permet de rediriger les requêtes via le proxy ScrapeOps
     en ajoutant les en-têtes nécessaires et en gérant les URL de réponse.
 
+    Chaque requête est routée en direct ou par le proxy selon la première règle de
+    SCRAPEOPS_PROXY_ROUTES (motif d'URL -> 'direct', 'proxy' ou 'auto') qui correspond
+    à son URL, SCRAPEOPS_PROXY_DEFAULT_ROUTE sinon. Une classe d'URL 'auto' est
+    téléchargée en direct tant que sa proportion de blocages (codes
+    SCRAPEOPS_PROXY_BLOCK_HTTP_CODES ou erreurs de téléchargement) sur les dernières
+    requêtes directes reste sous SCRAPEOPS_PROXY_BLOCK_RATE ; au-delà, elle passe par
+    le proxy pendant SCRAPEOPS_PROXY_ESCALATION_TIME secondes, puis le direct est
+    retenté. Une requête directe bloquée est renvoyée par le proxy. meta['proxy_route']
+    force la route d'une requête.
+
+    Avec SCRAPEOPS_SESSION_POOL_SIZE > 0, les requêtes passant par le proxy sont réparties
+    entre plusieurs sessions persistantes (ProxySessionPool). Les sessions sont préchauffées
+    à l'ouverture du spider, et chaque session de remplacement l'est en arrière-plan, par une
+    requête vers SCRAPEOPS_SESSION_WARMUP_URL (la première URL de départ du spider par défaut).
+
     Attributs:
         scrapeops_api_key (str): La clé API pour accéder au proxy ScrapeOps.
         scrapeops_endpoint (str): L'URL de l'endpoint du proxy ScrapeOps.
         scrapeops_proxy_active (bool): Indique si le proxy ScrapeOps est activé.
+        routes (list): Les règles de routage (motif compilé, route).
+        default_route (str): La route des URL qui ne correspondent à aucune règle.
+        route_blocks (dict): Les derniers résultats (bloqué ou non) des requêtes directes, par classe d'URL.
+        escalated_until (dict): La date (time.monotonic) de fin d'escalade vers le proxy, par classe d'URL.
+        session_pool (ProxySessionPool): Le pool de sessions du proxy, None s'il est désactivé.
 
     Méthodes:
         from_crawler(cls, crawler): Initialise le middleware à partir des paramètres du crawler.
         process_request(request, spider): Modifie les requêtes avant de les envoyer au serveur.
         process_response(request, response, spider): Modifie les réponses avant de les transmettre au spider.
+        process_exception(request, exception, spider): Renvoie par le proxy les requêtes directes en erreur.
+        response_downloaded(response, request, spider): Mesure la latence et les blocages de chaque route.
+        request_left_downloader(request, spider): Libère la session d'une requête et compte ses erreurs.
+        spider_opened(spider): Préchauffe les sessions du pool.
     """
 
     @classmethod
@@ -289,14 +598,20 @@ class ScrapeOpsProxyMiddleware:
         Returns:
             ScrapeOpsProxyMiddleware: Une instance du middleware initialisée avec les paramètres du crawler.
         """
-        return cls(crawler.settings)
+        middleware = cls(crawler.settings, crawler.stats)
+        middleware.crawler = crawler
+        crawler.signals.connect(middleware.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(middleware.request_left_downloader, signal=signals.request_left_downloader)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        return middleware
 
 
-    def __init__(self, settings):
+    def __init__(self, settings, stats):
         """
         Initialise le middleware ScrapeOpsProxyMiddleware avec les paramètres du crawler.
         Args:
             settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
         Attributs:
             api_key (str): La clé API pour accéder au proxy ScrapeOps.
             scrapeops_endpoint (str): L'URL de l'endpoint du proxy ScrapeOps.
@@ -304,8 +619,31 @@ class ScrapeOpsProxyMiddleware:
         """
         self.api_key = settings.get('SCRAPEOPS_API_KEY')
         self.scrapeops_endpoint = settings.get('SCRAPEOPS_FAKE_PROXY_ENDPOINT', 'https://proxy.scrapeops.io/v1/?') 
-        self.scrapeops_proxy_active = settings.get('SCRAPEOPS_PROXY_ENABLED', False)
+        self.scrapeops_proxy_active = settings.getbool('SCRAPEOPS_PROXY_ENABLED', False)
         self.session_number = 1
+        self.stats = stats
+        self.routes = [(re.compile(pattern), route) for pattern, route in settings.getdict('SCRAPEOPS_PROXY_ROUTES').items()]
+        self.default_route = settings.get('SCRAPEOPS_PROXY_DEFAULT_ROUTE', 'proxy')
+        self.block_codes = set(settings.getlist('SCRAPEOPS_PROXY_BLOCK_HTTP_CODES', [403, 429, 503]))
+        self.block_rate = settings.getfloat('SCRAPEOPS_PROXY_BLOCK_RATE', 0.2)
+        self.block_min_samples = settings.getint('SCRAPEOPS_PROXY_BLOCK_MIN_SAMPLES', 10)
+        self.block_window = settings.getint('SCRAPEOPS_PROXY_BLOCK_WINDOW', 50)
+        self.escalation_time = settings.getfloat('SCRAPEOPS_PROXY_ESCALATION_TIME', 600)
+        self.route_blocks = {}
+        self.escalated_until = {}
+        self.crawler = None
+        self.session_pool = None
+        pool_size = settings.getint('SCRAPEOPS_SESSION_POOL_SIZE', 0)
+        if pool_size > 0:
+            self.session_pool = ProxySessionPool(
+                pool_size,
+                alpha=settings.getfloat('SCRAPEOPS_SESSION_EWMA_ALPHA', 0.2),
+                min_requests=settings.getint('SCRAPEOPS_SESSION_MIN_REQUESTS', 5),
+                max_error_rate=settings.getfloat('SCRAPEOPS_SESSION_MAX_ERROR_RATE', 0.3),
+                latency_factor=settings.getfloat('SCRAPEOPS_SESSION_LATENCY_FACTOR', 3.0),
+            )
+        self.session_warmup_url = settings.get('SCRAPEOPS_SESSION_WARMUP_URL')
+        self.max_session_warmups = settings.getint('SCRAPEOPS_SESSION_MAX_WARMUPS', 5 * max(pool_size, 1))
 
 
     # @staticmethod
@@ -392,7 +730,9 @@ class ScrapeOpsProxyMiddleware:
             payload['country'] = 'us'
         if self._param_is_true(request, 'sops_js_scenario'):
             payload['js_scenario'] = self._js_scenario()
-        if self._param_is_true(request, 'sops_session_number'):
+        if request.meta.get('proxy_session') is not None:
+            payload['session_number'] = request.meta['proxy_session']
+        elif self._param_is_true(request, 'sops_session_number'):
             payload['session_number'] = 1
         if self._param_is_true(request, 'sops_follow_redirects'):
             payload['follow_redirects'] = False
@@ -461,7 +801,9 @@ class ScrapeOpsProxyMiddleware:
         Returns:
             scrapy.http.Response: La réponse modifiée avec l'URL originale.
         """
-        original_url = request.headers.get('X-Original-URL', response.url).decode(response.headers.encoding)
+        if 'X-Original-URL' not in request.headers:
+            return response
+        original_url = request.headers.get('X-Original-URL').decode(response.headers.encoding)
         replace_response = response.replace(url=original_url)
         return replace_response
 
@@ -483,8 +825,18 @@ class ScrapeOpsProxyMiddleware:
         scrapy.Request: La nouvelle requête modifiée avec l'URL du proxy, ou None si le proxy n'est pas utilisé.
     """
     def process_request(self, request, spider):
-        if self._scrapeops_proxy_enabled is False or self.scrapeops_endpoint in request.url:
+        if not self._scrapeops_proxy_enabled():
+            return None
+        if self.scrapeops_endpoint in request.url:
+            # Nouvelle tentative (copie de la requête déjà envoyée) : sa session a été libérée
+            if request.meta.get('proxy_session_released') and 'X-Original-URL' in request.headers:
+                return self._renew_session(request, spider)
             return None
+        if self._route_request(request) == 'direct':
+            return None
+        if self.session_pool is not None and request.meta.get('proxy_session') is None:
+            request.meta['proxy_session'] = self.session_pool.acquire()
+            self.stats.inc_value('proxy_sessions/requests')
         self._add_original_url_to_request_headers(request)
         spider.logger.info(f'URL stockée dans les headers de la requête')
         proxy_url = self._get_proxy_url(request)
@@ -496,6 +848,25 @@ class ScrapeOpsProxyMiddleware:
         #     spider.logger.info(f'IP utilisée par le proxy : {proxy_ip}')
         return new_request
     
+    def _renew_session(self, request, spider):
+        """
+        Reconstruit l'URL du proxy d'une nouvelle tentative avec une nouvelle session du pool.
+        Args:
+            request (scrapy.Request): La nouvelle tentative, encore adressée au proxy.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        Returns:
+            scrapy.Request: La nouvelle tentative avec sa propre session et son URL de proxy.
+        """
+        # L'URL du proxy contient le session_number de la tentative précédente, qui a peut-être échoué à cause de son IP
+        retry_request = request.replace(url=request.headers['X-Original-URL'].decode('utf-8'))
+        retry_request.meta.pop('proxy_session_released', None)
+        retry_request.meta.pop('proxy_session_answered', None)
+        retry_request.meta['proxy_session'] = self.session_pool.acquire()
+        self.stats.inc_value('proxy_sessions/requests')
+        self.stats.inc_value('proxy_sessions/retry_renewed')
+        spider.logger.debug(f"Nouvelle tentative sur la session proxy {retry_request.meta['proxy_session']} : {retry_request.url}")
+        return retry_request.replace(url=self._get_proxy_url(retry_request))
+
     # Response serveur avant envoie au spider
     def process_response(self, request, response, spider):
         """
@@ -509,9 +880,222 @@ class ScrapeOpsProxyMiddleware:
         Returns:
             scrapy.http.Response: La réponse modifiée avec l'URL d'origine remplacée.
     """
+        if request.meta.get('proxy_session_warmup'):
+            raise scrapy.exceptions.IgnoreRequest(f"Session {request.meta['proxy_session']} préchauffée")
+        if request.meta.get('proxy_route_used') == 'direct' and response.status in self.block_codes:
+            return self._escalate_request(request, spider, response.status)
         new_response = self._replace_response_url(response, request)
         spider.logger.info(f'URL envoyée au Spider : {new_response.url}')
         return new_response
+
+    def process_exception(self, request, exception, spider):
+        """
+        Renvoie par le proxy une requête directe dont le téléchargement a échoué.
+        Args:
+            request (scrapy.Request): La requête en erreur.
+            exception (Exception): L'erreur de téléchargement.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        Returns:
+            scrapy.Request: La requête à renvoyer par le proxy, ou None pour laisser l'erreur suivre son cours.
+        """
+        if request.meta.get('proxy_route_used') != 'direct' or isinstance(exception, scrapy.exceptions.IgnoreRequest):
+            return None
+        self._record_direct_result(request.meta.get('proxy_route_class'), True, spider)
+        return self._escalate_request(request, spider, exception.__class__.__name__)
+
+    def _route_class(self, url):
+        """
+        Retourne la règle de routage qui correspond à une URL.
+        Args:
+            url (str): L'URL originale de la requête.
+        Returns:
+            tuple: (classe d'URL, route configurée) ; la classe est le motif de la règle, ou 'default'.
+        """
+        for pattern, route in self.routes:
+            if pattern.search(url):
+                return pattern.pattern, route
+        return 'default', self.default_route
+
+    def _route_request(self, request):
+        """
+        Choisit la route (direct ou proxy) d'une requête et la mémorise dans ses métadonnées.
+        Args:
+            request (scrapy.Request): La requête Scrapy actuelle.
+        Returns:
+            str: 'direct' ou 'proxy'.
+        """
+        route_class, route = self._route_class(request.url)
+        forced_route = request.meta.get('proxy_route')
+        if forced_route in ('direct', 'proxy'):
+            route = forced_route
+        elif route == 'auto':
+            escalated_until = self.escalated_until.get(route_class)
+            if escalated_until is not None and time.monotonic() < escalated_until:
+                route = 'proxy'
+            else:
+                if escalated_until is not None:
+                    # Fin de l'escalade : le direct est retenté avec une fenêtre vide
+                    del self.escalated_until[route_class]
+                    self.route_blocks.pop(route_class, None)
+                route = 'direct'
+        request.meta['proxy_route_class'] = route_class
+        request.meta['proxy_route_used'] = route
+        self.stats.inc_value(f'proxy_routing/decisions/{route}')
+        return route
+
+    def _record_direct_result(self, route_class, blocked, spider):
+        """
+        Enregistre le résultat d'une requête directe et escalade sa classe d'URL si elle est trop bloquée.
+        Args:
+            route_class (str): La classe d'URL de la requête.
+            blocked (bool): Indique si la requête a été bloquée.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        """
+        if route_class is None:
+            return
+        results = self.route_blocks.setdefault(route_class, deque(maxlen=self.block_window))
+        results.append(blocked)
+        if blocked:
+            self.stats.inc_value('proxy_routing/direct_blocked')
+        if route_class in self.escalated_until or len(results) < self.block_min_samples:
+            return
+        block_rate = sum(results) / len(results)
+        if block_rate > self.block_rate:
+            self.escalated_until[route_class] = time.monotonic() + self.escalation_time
+            self.stats.inc_value('proxy_routing/escalations')
+            spider.logger.warning(f'Routage : {block_rate:.0%} de blocages en direct pour {route_class}, passage par le proxy pendant {self.escalation_time:.0f} s')
+
+    def _escalate_request(self, request, spider, reason):
+        """
+        Construit la copie d'une requête directe bloquée, à renvoyer par le proxy.
+        Args:
+            request (scrapy.Request): La requête directe bloquée.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+            reason: Le code HTTP ou le nom de l'erreur.
+        Returns:
+            scrapy.Request: La copie routée par le proxy.
+        """
+        self.stats.inc_value('proxy_routing/rerouted_to_proxy')
+        spider.logger.debug(f'Requête directe bloquée ({reason}), renvoyée par le proxy : {request.url}')
+        new_request = request.replace(dont_filter=True)
+        new_request.meta['proxy_route'] = 'proxy'
+        return new_request
+
+    def response_downloaded(self, response, request, spider):
+        """
+        Mesure la latence de chaque route et les blocages des requêtes directes.
+        Appelé à la sortie du handler de téléchargement, avant les middlewares : les réponses
+        retentées par le middleware de retry sont aussi comptées.
+        Args:
+            response (scrapy.http.Response): La réponse téléchargée.
+            request (scrapy.Request): La requête correspondante.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        """
+        route = request.meta.get('proxy_route_used')
+        if route is None:
+            return
+        latency_ms = request.meta.get('download_latency', 0) * 1000
+        self.stats.inc_value(f'proxy_routing/responses/{route}')
+        self.stats.inc_value(f'proxy_routing/latency_ms_total/{route}', latency_ms)
+        self.stats.max_value(f'proxy_routing/latency_ms_max/{route}', latency_ms)
+        self.stats.set_value(
+            f'proxy_routing/latency_ms_avg/{route}',
+            self.stats.get_value(f'proxy_routing/latency_ms_total/{route}') / self.stats.get_value(f'proxy_routing/responses/{route}'),
+        )
+        if route == 'direct':
+            self._record_direct_result(request.meta.get('proxy_route_class'), response.status in self.block_codes, spider)
+        session = request.meta.get('proxy_session')
+        if self.session_pool is not None and session is not None:
+            request.meta['proxy_session_answered'] = True
+            ok = response.status not in self.block_codes and response.status < 500
+            if request.meta.get('proxy_session_warmup'):
+                self._warmed_up(session, ok, spider)
+            else:
+                self._record_session(session, request.meta.get('download_latency'), ok, spider)
+
+    def _warmed_up(self, session, ok, spider):
+        """
+        Rend une session disponible après son préchauffage, ou la remplace s'il a échoué.
+        Args:
+            session (int): Le numéro de session.
+            ok (bool): Indique si la requête de préchauffage a réussi.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        """
+        if ok:
+            self.session_pool.mark_warm(session)
+            return
+        self.stats.inc_value('proxy_sessions/warmup_failed')
+        # Proxy injoignable : les préchauffages sont plafonnés et les sessions froides servent quand même
+        if self.stats.get_value('proxy_sessions/warmups', 0) >= self.max_session_warmups:
+            return
+        replacement = self.session_pool.retire(session)
+        self.stats.inc_value('proxy_sessions/retired')
+        spider.logger.info(f'Préchauffage de la session proxy {session} échoué, remplacée par {replacement}')
+        self._warm_up(replacement, spider)
+
+    def _record_session(self, session, latency, ok, spider):
+        """
+        Met à jour le score d'une session et préchauffe sa remplaçante si elle est retirée.
+        Args:
+            session (int): Le numéro de session.
+            latency (float): La latence de la réponse en secondes, None pour une erreur de téléchargement.
+            ok (bool): False si la réponse est un blocage ou une erreur.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        """
+        replacement = self.session_pool.record(session, latency, ok)
+        if replacement is None:
+            return
+        self.stats.inc_value('proxy_sessions/retired')
+        spider.logger.info(f'Session proxy {session} retirée, remplacée par {replacement}')
+        self._warm_up(replacement, spider)
+
+    def _warm_up(self, session, spider):
+        """
+        Envoie une requête de préchauffage pour une session, hors de la file des pages à crawler.
+        Args:
+            session (int): Le numéro de session.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        """
+        url = self.session_warmup_url or spider.start_urls[0]
+        request = scrapy.Request(
+            url,
+            dont_filter=True,
+            priority=100,
+            meta={'proxy_session': session, 'proxy_session_warmup': True, 'proxy_route': 'proxy', 'dont_retry': True},
+        )
+        self.stats.inc_value('proxy_sessions/warmups')
+        self.crawler.engine.crawl(request)
+
+    def spider_opened(self, spider):
+        """
+        Préchauffe toutes les sessions du pool.
+        Args:
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        """
+        if self.session_pool is None or not self._scrapeops_proxy_enabled():
+            return
+        for session in self.session_pool.cold_sessions():
+            self._warm_up(session, spider)
+
+    def request_left_downloader(self, request, spider):
+        """
+        Libère la session d'une requête et compte une erreur si elle est sortie sans réponse.
+        Args:
+            request (scrapy.Request): La requête sortie du downloader.
+            spider (scrapy.Spider): L'instance du spider qui effectue la requête.
+        """
+        session = request.meta.get('proxy_session')
+        # Les copies (nouvelles tentatives) héritent des métadonnées : la session n'est libérée qu'une fois
+        if self.session_pool is None or session is None or request.meta.get('proxy_session_released'):
+            return
+        request.meta['proxy_session_released'] = True
+        self.session_pool.release(session)
+        if request.meta.get('proxy_session_answered'):
+            return
+        if request.meta.get('proxy_session_warmup'):
+            self._warmed_up(session, False, spider)
+        else:
+            self._record_session(session, None, False, spider)
     
 
 
@@ -525,4 +1109,399 @@ class ScrapeOpsProxyMiddleware:
     #     else:
     #         spider.logger.error(f'Exception non gérée : {exception}')
 
-    
\ No newline at end of file
+    
+
+class ConditionalRequestMiddleware:
+    """
+    Middleware Scrapy pour les recrawls incrémentaux par requêtes HTTP conditionnelles.
+
+    Les validateurs ETag et Last-Modified de chaque page sont conservés dans un fichier
+    local entre deux exécutions. Au crawl suivant, ils sont renvoyés dans les en-têtes
+    If-None-Match / If-Modified-Since et une réponse 304 abandonne la requête : la page
+    n'est ni parsée ni envoyée dans les pipelines.
+
+    Les validateurs sont indexés sur l'URL originale (en-tête X-Original-URL posé par
+    ScrapeOpsProxyMiddleware) et non sur l'URL du proxy, qui change d'une exécution à
+    l'autre. Seules les requêtes marquées par meta['incremental'] sont concernées.
+
+    Le middleware passe avant ScrapeOpsProxyMiddleware : le proxy ne transmet les en-têtes
+    de la requête au site qu'avec keep_headers, et meta['sops_keep_headers'] est donc activé
+    pour chaque requête conditionnelle avant la réécriture de son URL.
+
+    Attributs:
+        store_dir (str): Le dossier où sont enregistrés les validateurs.
+        validators (dict): Les validateurs connus, par URL originale.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le middleware à partir des paramètres du crawler.
+        spider_opened(spider): Charge les validateurs de l'exécution précédente.
+        spider_closed(spider): Enregistre les validateurs sur le disque.
+        process_request(request, spider): Ajoute les en-têtes conditionnels à la requête.
+        process_response(request, response, spider): Abandonne les pages non modifiées et mémorise les validateurs.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le middleware à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            ConditionalRequestMiddleware: Une instance du middleware initialisée avec les paramètres du crawler.
+        """
+        middleware = cls(crawler.settings, crawler.stats)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def __init__(self, settings, stats):
+        """
+        Initialise le middleware ConditionalRequestMiddleware avec les paramètres du crawler.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+            stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        """
+        if not settings.getbool('INCREMENTAL_ENABLED'):
+            raise scrapy.exceptions.NotConfigured
+        self.store_dir = data_path(settings.get('INCREMENTAL_DIR', 'incremental'), createdir=True)
+        self.stats = stats
+        self.validators = {}
+
+    def _store_path(self, spider):
+        return os.path.join(self.store_dir, f'{spider.name}.json')
+
+    def spider_opened(self, spider):
+        """
+        Charge les validateurs enregistrés lors de l'exécution précédente.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        try:
+            with open(self._store_path(spider), encoding='utf-8') as f:
+                self.validators = json.load(f)
+        except FileNotFoundError:
+            self.validators = {}
+        spider.logger.info(f'{len(self.validators)} validateurs HTTP chargés pour le crawl incrémental')
+
+    def spider_closed(self, spider):
+        """
+        Enregistre les validateurs sur le disque (écriture atomique).
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        path = self._store_path(spider)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.validators, f)
+        os.replace(f'{path}.tmp', path)
+
+    @staticmethod
+    def _original_url(request):
+        """
+        Retourne l'URL originale de la requête, avant sa réécriture par le proxy.
+        Args:
+            request (scrapy.http.Request): La requête Scrapy actuelle.
+        Returns:
+            str: L'URL originale.
+        """
+        original_url = request.headers.get('X-Original-URL')
+        if original_url is None:
+            return request.url
+        return original_url.decode('utf-8')
+
+    def process_request(self, request, spider):
+        """
+        Ajoute les en-têtes If-None-Match / If-Modified-Since connus pour cette URL.
+        Args:
+            request (scrapy.http.Request): La requête Scrapy actuelle.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        Returns:
+            None
+        """
+        # Requête déjà réécrite par le proxy (ou nouvelle tentative) : en-têtes déjà posés
+        if not request.meta.get('incremental') or 'X-Original-URL' in request.headers:
+            return None
+        validators = self.validators.get(self._original_url(request))
+        if not validators:
+            return None
+        if validators.get('etag'):
+            request.headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            request.headers['If-Modified-Since'] = validators['last_modified']
+        # Sans keep_headers, le proxy ScrapeOps remplace les en-têtes : le site ne verrait pas les validateurs
+        request.meta['sops_keep_headers'] = True
+        self.stats.inc_value('incremental/conditional_requests')
+        return None
+
+    def process_response(self, request, response, spider):
+        """
+        Abandonne les pages non modifiées (304) et mémorise les validateurs des autres.
+        Args:
+            request (scrapy.http.Request): La requête envoyée au serveur.
+            response (scrapy.http.Response): La réponse reçue du serveur.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        Returns:
+            scrapy.http.Response: La réponse inchangée.
+        Raises:
+            scrapy.exceptions.IgnoreRequest: Si la page n'a pas été modifiée.
+        """
+        if not request.meta.get('incremental'):
+            return response
+        original_url = self._original_url(request)
+        if response.status == 304:
+            self.stats.inc_value('incremental/not_modified')
+            raise scrapy.exceptions.IgnoreRequest(f'Page non modifiée : {original_url}')
+        if response.status == 200:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self.validators[original_url] = {
+                    'etag': etag.decode('latin-1') if etag else None,
+                    'last_modified': last_modified.decode('latin-1') if last_modified else None,
+                }
+                self.stats.inc_value('incremental/validators_stored')
+        return response
+
+
+
+class RetryDelayed(scrapy.exceptions.IgnoreRequest):
+    """
+    Requête abandonnée par BackoffRetryMiddleware parce que sa nouvelle tentative est différée.
+
+    Sous-classe d'IgnoreRequest : l'errback de la requête d'origine est appelé alors qu'une
+    nouvelle tentative est en attente. Un errback qui ne doit réagir qu'aux abandons définitifs
+    ignore cette exception (failure.check(RetryDelayed)).
+    """
+
+
+
+class BackoffRetryMiddleware(RetryMiddleware):
+    """
+    Middleware Scrapy de nouvelles tentatives avec attente exponentielle, aléas et budget global.
+
+    Comme le RetryMiddleware de Scrapy, il retente les réponses dont le code est dans
+    RETRY_HTTP_CODES et les erreurs de RETRY_EXCEPTIONS, mais la nouvelle tentative
+    n'est pas envoyée tout de suite : elle attend un délai tiré au hasard entre 0 et
+    min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (tentative - 1)) secondes (full
+    jitter), au moins l'en-tête Retry-After s'il est présent. Pendant l'attente, la
+    requête d'origine est abandonnée (RetryDelayed, sous-classe d'IgnoreRequest, qui
+    déclenche son errback) : elle n'occupe ni le reactor ni un emplacement de concurrence,
+    et la nouvelle tentative est remise à l'engine par reactor.callLater. Le spider n'est pas fermé tant que des tentatives sont en attente.
+    Seules les requêtes passées par le scheduler (marquées par meta['retry_scheduled'] au
+    signal request_scheduled) sont ainsi remises à l'engine : celles de engine.download()
+    (couvertures de CoverImagePipeline, robots.txt...), dont l'appelant attend la réponse,
+    attendent sur place (deferLater) et la nouvelle tentative est renvoyée par process_response.
+
+    RETRY_POLICIES remplace, pour un code HTTP ou pour les erreurs de téléchargement
+    (clé 'exception'), le nombre de tentatives ('times') et les délais ('base', 'max').
+    Le nombre total de nouvelles tentatives est limité à RETRY_BUDGET_RATIO fois le
+    nombre de requêtes envoyées (au moins RETRY_BUDGET_MIN) pour éviter les tempêtes
+    de tentatives quand le proxy est dégradé.
+
+    Attributs:
+        backoff_base (float): Le délai de base, en secondes.
+        backoff_max (float): Le délai maximal, en secondes.
+        budget_ratio (float): La part des requêtes envoyées qui peut être retentée.
+        budget_min (int): Le nombre de tentatives toujours autorisées.
+        policies (dict): Les politiques par code HTTP ou pour 'exception'.
+        delayed_calls (set): Les tentatives en attente (IDelayedCall).
+        delayed_downloads (set): Les tentatives des requêtes de engine.download() en attente (Deferred).
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le middleware à partir des paramètres du crawler.
+        request_scheduled(request, spider): Marque une requête passée par le scheduler.
+        process_response(request, response, spider): Retente les réponses en erreur.
+        spider_idle(spider): Garde le spider ouvert tant que des tentatives sont en attente.
+        spider_closed(spider): Annule les tentatives en attente.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le middleware à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            BackoffRetryMiddleware: Une instance du middleware initialisée avec les paramètres du crawler.
+        """
+        middleware = cls(crawler.settings)
+        middleware.crawler = crawler
+        middleware.stats = crawler.stats
+        crawler.signals.connect(middleware.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(middleware.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def __init__(self, settings):
+        """
+        Initialise le middleware BackoffRetryMiddleware avec les paramètres du crawler.
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+        """
+        super().__init__(settings)
+        self.backoff_base = settings.getfloat('RETRY_BACKOFF_BASE', 1)
+        self.backoff_max = settings.getfloat('RETRY_BACKOFF_MAX', 60)
+        self.budget_ratio = settings.getfloat('RETRY_BUDGET_RATIO', 0.1)
+        self.budget_min = settings.getint('RETRY_BUDGET_MIN', 10)
+        # Les clés peuvent venir de JSON (-s RETRY_POLICIES='{"429": {...}}') : codes convertis en int
+        self.policies = {
+            int(key) if str(key).isdigit() else key: policy
+            for key, policy in settings.getdict('RETRY_POLICIES').items()
+        }
+        self.retry_http_codes |= {key for key in self.policies if isinstance(key, int)}
+        self.delayed_calls = set()
+        self.delayed_downloads = set()
+
+    def request_scheduled(self, request, spider):
+        """
+        Marque une requête passée par le scheduler : sa nouvelle tentative pourra lui être remise.
+        Args:
+            request (scrapy.http.Request): La requête planifiée.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        # Dans meta pour survivre aux files sur disque (JOBDIR) et à la frontière partagée
+        if request.callback is not NO_CALLBACK:
+            request.meta['retry_scheduled'] = True
+
+    def _budget_available(self):
+        """
+        Indique si le budget global de nouvelles tentatives n'est pas épuisé.
+        Returns:
+            bool: True si une nouvelle tentative est encore autorisée.
+        """
+        requests_sent = self.stats.get_value('downloader/request_count', 0)
+        retries = self.stats.get_value('retry/count', 0)
+        return retries < max(self.budget_min, self.budget_ratio * requests_sent)
+
+    @staticmethod
+    def _retry_after(response):
+        """
+        Lit l'en-tête Retry-After (secondes ou date HTTP) d'une réponse.
+        Args:
+            response (scrapy.http.Response): La réponse reçue du serveur.
+        Returns:
+            float: Le délai demandé en secondes, ou None si l'en-tête est absent ou invalide.
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        value = value.decode('latin-1').strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff_delay(self, retry_times, policy, retry_after=None):
+        """
+        Tire le délai d'attente d'une nouvelle tentative (exponentiel avec full jitter).
+        Args:
+            retry_times (int): Le numéro de la tentative (1 pour la première).
+            policy (dict): La politique du code HTTP ou de l'erreur.
+            retry_after (float): Le délai demandé par le serveur, en secondes.
+        Returns:
+            float: Le délai en secondes.
+        """
+        base = policy.get('base', self.backoff_base)
+        maximum = policy.get('max', self.backoff_max)
+        delay = random.uniform(0, min(maximum, base * 2 ** (retry_times - 1)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, maximum))
+        return delay
+
+    def process_response(self, request, response, spider):
+        """
+        Retente les réponses dont le code est dans RETRY_HTTP_CODES ou RETRY_POLICIES.
+        Args:
+            request (scrapy.http.Request): La requête envoyée au serveur.
+            response (scrapy.http.Response): La réponse reçue du serveur.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        Returns:
+            scrapy.http.Response | scrapy.http.Request | twisted.internet.defer.Deferred: La réponse,
+            la nouvelle tentative immédiate, ou un Deferred qui la renvoie après le délai (engine.download()).
+        Raises:
+            RetryDelayed: Si la nouvelle tentative est différée.
+        """
+        if request.meta.get('dont_retry', False) or response.status not in self.retry_http_codes:
+            return response
+        reason = response_status_message(response.status)
+        return self._retry(request, reason, spider, response.status, self._retry_after(response)) or response
+
+    def _retry(self, request, reason, spider, status=None, retry_after=None):
+        """
+        Construit la nouvelle tentative et la diffère si nécessaire.
+        Args:
+            request (scrapy.http.Request): La requête en échec.
+            reason (str | Exception): La raison de l'échec.
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+            status (int): Le code HTTP de la réponse, None pour une erreur de téléchargement.
+            retry_after (float): Le délai demandé par le serveur, en secondes.
+        Returns:
+            scrapy.http.Request | twisted.internet.defer.Deferred: La nouvelle tentative immédiate (ou différée
+            par un Deferred pour une requête de engine.download()), ou None si elle n'est pas autorisée.
+        Raises:
+            RetryDelayed: Si la nouvelle tentative est différée.
+        """
+        policy = self.policies.get('exception' if status is None else status, {})
+        max_retry_times = request.meta.get('max_retry_times', policy.get('times', self.max_retry_times))
+        if request.meta.get('retry_times', 0) < max_retry_times and not self._budget_available():
+            self.stats.inc_value('retry/budget_exhausted')
+            spider.logger.debug(f'Budget de nouvelles tentatives épuisé, abandon de {request}')
+            return None
+        new_request = get_retry_request(
+            request,
+            reason=reason,
+            spider=spider,
+            max_retry_times=max_retry_times,
+            priority_adjust=request.meta.get('priority_adjust', self.priority_adjust),
+        )
+        if new_request is None:
+            return None
+        delay = self._backoff_delay(new_request.meta['retry_times'], policy, retry_after)
+        if delay <= 0:
+            return new_request
+        from twisted.internet import reactor
+        self.stats.inc_value('retry/delayed')
+        self.stats.inc_value('retry/delay_ms_total', int(delay * 1000))
+        self.stats.max_value('retry/delay_ms_max', int(delay * 1000))
+        if not request.meta.get('retry_scheduled') or request.callback is NO_CALLBACK:
+            # Requête de engine.download() : l'appelant attend sa réponse, la tentative ne peut pas passer par le scheduler
+            d = task.deferLater(reactor, delay, lambda: new_request)
+            self.delayed_downloads.add(d)
+            d.addBoth(self._forget_download, d)
+            return d
+        call = reactor.callLater(delay, self._schedule, new_request)
+        self.delayed_calls.add(call)
+        raise RetryDelayed(f'Nouvelle tentative dans {delay:.1f} s : {reason}')
+
+    def _forget_download(self, result, d):
+        self.delayed_downloads.discard(d)
+        return result
+
+    def _schedule(self, request):
+        self.delayed_calls = {call for call in self.delayed_calls if call.active()}
+        self.crawler.engine.crawl(request)
+
+    def spider_idle(self, spider):
+        """
+        Garde le spider ouvert tant que des tentatives sont en attente.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        Raises:
+            scrapy.exceptions.DontCloseSpider: Si des tentatives sont en attente.
+        """
+        if any(call.active() for call in self.delayed_calls):
+            raise scrapy.exceptions.DontCloseSpider
+
+    def spider_closed(self, spider):
+        """
+        Annule les tentatives en attente.
+        Args:
+            spider (scrapy.Spider): Le spider Scrapy en cours d'exécution.
+        """
+        for call in self.delayed_calls:
+            if call.active():
+                call.cancel()
+        self.delayed_calls.clear()
+        for d in list(self.delayed_downloads):
+            d.cancel()
@@ -0,0 +1,211 @@
+# Extraction des pages produit dans un pool de processus
+#
+# Le reactor ne fait que copier le corps de la réponse dans un segment de mémoire
+# partagée ; l'analyse lxml et l'extraction des champs tournent dans les processus
+# du pool, sur les autres cœurs.
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
+from multiprocessing.shared_memory import SharedMemory
+
+from scrapy.http import HtmlResponse
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import defer, reactor
+
+from project_scrapy.extractors import extract_product
+
+
+# Segments de mémoire partagée déjà ouverts par le processus du pool, par nom
+_attached = {}
+
+
+def pool_context():
+    """
+    Retourne le contexte multiprocessing des pools de processus du projet (forkserver, à défaut spawn).
+    Returns:
+        multiprocessing.context.BaseContext: Le contexte à passer en mp_context à ProcessPoolExecutor.
+    """
+    # fork copierait le processus du crawl avec les threads du reactor (résolution DNS, adbapi) :
+    # un verrou tenu par l'un d'eux au moment du fork resterait pris dans le processus du pool
+    # Avec forkserver et spawn, le module principal est réimporté : un script qui lance le crawl
+    # (CrawlerProcess) doit le faire sous if __name__ == '__main__' (scrapy crawl le fait déjà)
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _attach(name):
+    """
+    Ouvre un segment de mémoire partagée du pool sans en prendre la charge.
+    Args:
+        name (str): Le nom du segment.
+    Returns:
+        multiprocessing.shared_memory.SharedMemory: Le segment ouvert.
+    """
+    # Le segment appartient au processus du crawl, qui le libère (ParsePool.close). Avec
+    # forkserver comme avec spawn, le processus du pool utilise le resource_tracker du crawl
+    # (descripteur transmis au démarrage) : avant Python 3.13 (sans track=False), l'ouverture
+    # enregistre une seconde fois le même nom, sans effet. Le segment ne doit en revanche pas
+    # être désenregistré ici, ce qui retirerait l'enregistrement du crawl
+    try:
+        return SharedMemory(name, track=False)
+    except TypeError:
+        return SharedMemory(name)
+
+
+def _close_attached():
+    for segment in _attached.values():
+        segment.close()
+    _attached.clear()
+
+
+def extract_product_from_bytes(body, encoding, url):
+    """
+    Extrait les champs d'une page produit (exécuté dans un processus du pool de ParsePool).
+    Args:
+        body (bytes): Le corps de la réponse.
+        encoding (str): L'encodage de la réponse (response.encoding).
+        url (str): L'URL de la réponse.
+    Returns:
+        dict: Les champs du BookItem, comme extract_product.
+    """
+    # Même décodage et même arbre lxml que response.selector dans le processus du crawl
+    response = HtmlResponse(url, body=body, encoding=encoding)
+    return extract_product(response.selector.root)
+
+
+def extract_product_from_slot(name, length, encoding, url):
+    """
+    Extrait les champs d'une page produit dont le corps a été copié dans un segment de mémoire partagée.
+    Args:
+        name (str): Le nom du segment de mémoire partagée.
+        length (int): La taille du corps, en octets.
+        encoding (str): L'encodage de la réponse.
+        url (str): L'URL de la réponse.
+    Returns:
+        dict: Les champs du BookItem, comme extract_product.
+    """
+    segment = _attached.get(name)
+    if segment is None:
+        if not _attached:
+            # Segments fermés à la sortie du processus du pool
+            util.Finalize(None, _close_attached, exitpriority=10)
+        segment = _attached[name] = _attach(name)
+    # lxml n'analyse que des bytes : une seule copie, le segment est rendu dès le retour
+    return extract_product_from_bytes(bytes(segment.buf[:length]), encoding, url)
+
+
+class ParsePool:
+    """
+    Pool de processus qui extrait les champs des pages produit hors du reactor (PARSE_POOL_*).
+
+    Le corps de chaque réponse est copié une fois dans l'un des segments de mémoire partagée
+    du pool (PARSE_POOL_SLOT_SIZE octets chacun) : seuls le nom du segment, la taille, l'encodage
+    et l'URL passent par le pipe du pool, et seul le dict des champs revient. Un corps plus
+    grand qu'un segment est envoyé tel quel (copié par pickle).
+
+    Le nombre de pages en cours d'extraction est borné par le nombre de segments
+    (PARSE_POOL_MAX_PENDING, 0 = deux par processus) : au-delà, les callbacks attendent qu'un
+    segment se libère, ce qui ralentit le reactor au lieu de remplir la file du pool.
+
+    Statistiques : parse_pool/tasks, parse_pool/slot_waits et parse_pool/oversize_bodies.
+
+    Attributs:
+        workers (int): Le nombre de processus du pool.
+        slot_size (int): La taille d'un segment de mémoire partagée, en octets.
+        slots (list): Les segments de mémoire partagée.
+        free_slots (twisted.internet.defer.DeferredQueue): Les indices des segments libres.
+        executor (concurrent.futures.ProcessPoolExecutor): Le pool de processus.
+
+    Méthodes:
+        from_crawler(cls, crawler): Initialise le pool à partir des paramètres du crawler.
+        extract_product(response): Extrait les champs d'une page produit dans le pool (coroutine).
+        close(): Arrête le pool et libère la mémoire partagée.
+    """
+
+    def __init__(self, workers=0, slot_size=2 * 1024 * 1024, max_pending=0, stats=None):
+        """
+        Initialise le pool ParsePool et alloue ses segments de mémoire partagée.
+        Args:
+            workers (int): Le nombre de processus du pool (0 = nombre de CPU).
+            slot_size (int): La taille d'un segment de mémoire partagée, en octets.
+            max_pending (int): Le nombre maximal de pages en cours d'extraction (0 = deux par processus).
+            stats (scrapy.statscollectors.StatsCollector): Le collecteur de statistiques du crawler.
+        """
+        self.workers = workers or os.cpu_count()
+        self.slot_size = max(int(slot_size), 1)
+        self.stats = stats
+        self.slots = [SharedMemory(create=True, size=self.slot_size) for _ in range(max_pending or 2 * self.workers)]
+        self.free_slots = defer.DeferredQueue()
+        for index in range(len(self.slots)):
+            self.free_slots.put(index)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context())
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Initialise le pool à partir des paramètres du crawler.
+        Args:
+            crawler (scrapy.crawler.Crawler): Le crawler Scrapy en cours d'exécution.
+        Returns:
+            ParsePool: Une instance du pool initialisée avec les paramètres du crawler.
+        """
+        settings = crawler.settings
+        return cls(
+            workers=settings.getint('PARSE_POOL_WORKERS'),
+            slot_size=settings.getint('PARSE_POOL_SLOT_SIZE', 2 * 1024 * 1024),
+            max_pending=settings.getint('PARSE_POOL_MAX_PENDING'),
+            stats=crawler.stats,
+        )
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            self.stats.inc_value(f'parse_pool/{key}')
+
+    async def extract_product(self, response):
+        """
+        Extrait les champs d'une page produit dans un processus du pool.
+        Args:
+            response (scrapy.http.TextResponse): La réponse de la page produit.
+        Returns:
+            dict: Les champs du BookItem, comme extract_product(response.selector.root).
+        """
+        if not self.free_slots.pending:
+            self._inc_stat('slot_waits')
+        index = await maybe_deferred_to_future(self.free_slots.get())
+        try:
+            body = response.body
+            if len(body) <= self.slot_size:
+                segment = self.slots[index]
+                segment.buf[:len(body)] = body
+                future = self.executor.submit(extract_product_from_slot, segment.name, len(body), response.encoding, response.url)
+            else:
+                self._inc_stat('oversize_bodies')
+                future = self.executor.submit(extract_product_from_bytes, body, response.encoding, response.url)
+            self._inc_stat('tasks')
+            d = defer.Deferred()
+            # Le callback du future s'exécute dans un thread du pool : retour au reactor avant de toucher au Deferred
+            future.add_done_callback(lambda f: reactor.callFromThread(self._task_done, f, d))
+            return await maybe_deferred_to_future(d)
+        finally:
+            self.free_slots.put(index)
+
+    @staticmethod
+    def _task_done(future, d):
+        try:
+            result = future.result()
+        except Exception as e:
+            d.errback(e)
+        else:
+            d.callback(result)
+
+    def close(self):
+        """
+        Arrête le pool (après les extractions en cours) et libère la mémoire partagée.
+        """
+        self.executor.shutdown()
+        for segment in self.slots:
+            segment.close()
+            segment.unlink()
+        self.slots = []
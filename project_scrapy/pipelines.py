@@ -6,63 +6,202 @@
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+import hashlib
+import json
+import mimetypes
 import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from operator import attrgetter
+from urllib.parse import urlsplit
 import pymysql
 import os
+import time
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+from scrapy.http.request import NO_CALLBACK
+from scrapy.pipelines.files import FileException, FilesPipeline
+from scrapy.settings import Settings
+from scrapy.utils.project import data_path
+from twisted.enterprise import adbapi
+from twisted.internet import defer, reactor, task
+from twisted.python.failure import Failure
 from dotenv import load_dotenv
 
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from project_scrapy.items import Book
+from project_scrapy.parsepool import pool_context
+
 load_dotenv()
 PASSWORD = os.getenv('PASSWORD')
 
+# Nettoyage des champs textuels : motif compilé une seule fois au chargement du module
+AVAILABILITY_RE = re.compile(r'(\d+)')
+
+
+def clean_currency(value):
+    if not isinstance(value, str):
+        return value
+    return float(value.replace('£', ''))
+
+
+def clean_availability(value):
+    if not isinstance(value, str):
+        return value
+    match = AVAILABILITY_RE.search(value)
+    if match:
+        return int(match.group(0))
+    # Pages de liste : seul 'In stock' / 'Out of stock' est affiché, sans le nombre d'exemplaires
+    if 'out of stock' in value.lower():
+        return 0
+    return None
+
+
+def clean_number_of_reviews(value):
+    if not isinstance(value, str):
+        return value
+    return int(value)
+
+
+FIELD_CLEANERS = (
+    ('price', clean_currency),
+    ('price_tax', clean_currency),
+    ('tax', clean_currency),
+    ('availability', clean_availability),
+    ('number_of_reviews', clean_number_of_reviews),
+)
+
+
 class ProjectScrapyPipeline:
+    """
+    Convertit les prix en float, la disponibilité et le nombre d'avis en int, en une seule passe par item.
 
-    def clean_currency(self,item,currency_col):
-        adapter = ItemAdapter(item)
-        currency_str = adapter.get(currency_col)
-        adapter[currency_col] = float(currency_str.replace('£',''))
-        return item
-    
-    def clean_price(self,item):
-        return self.clean_currency(item,"price")
-    
-    def clean_price_tax(self,item):
-        return self.clean_currency(item,"price_tax")
-    
-    def clean_tax(self,item):
-        return self.clean_currency(item,"tax")
-
-
-    def clean_availability(self,item):
-        adapter = ItemAdapter(item)
-        availability = adapter.get('availability')
-        adapter['availability'] = int(re.search(r'(\d+)',availability).group(0))
-        return item
-    
-    def clean_number_of_reviews(self,item):
+    Les items Book sont nettoyés par accès direct aux attributs ; les autres types d'items
+    (BookItem, dict) passent par un seul ItemAdapter. Les valeurs déjà converties sont
+    laissées telles quelles : nettoyer deux fois un item ne change rien.
+    """
+
+    def clean_item(self, item):
+        if isinstance(item, Book):
+            item.price = clean_currency(item.price)
+            item.price_tax = clean_currency(item.price_tax)
+            item.tax = clean_currency(item.tax)
+            item.availability = clean_availability(item.availability)
+            item.number_of_reviews = clean_number_of_reviews(item.number_of_reviews)
+            return item
         adapter = ItemAdapter(item)
-        adapter["number_of_reviews"] = int(adapter.get("number_of_reviews"))
+        for field, clean in FIELD_CLEANERS:
+            value = adapter.get(field)
+            if value is not None:
+                adapter[field] = clean(value)
         return item
 
+    def clean_batch(self, items):
+        """
+        Nettoie une liste d'items en un seul appel.
+        Args:
+            items (list): Les items à nettoyer (Book, BookItem ou dict).
+        Returns:
+            list: Les mêmes items, nettoyés sur place.
+        """
+        clean_item = self.clean_item
+        return [clean_item(item) for item in items]
 
     def process_item(self, item, spider):
-        item = self.clean_price(item)
-        item = self.clean_price_tax(item)
-        item = self.clean_tax(item)
-        item = self.clean_availability(item)
-        item = self.clean_number_of_reviews(item)
-        return item
-    
+        return self.clean_item(item)
+
+
+BOOK_COLUMNS = ('title', 'image', 'description', 'UPC', 'product_type', 'price', 'price_tax', 'tax', 'availability', 'number_of_reviews')
+UPC_INDEX = BOOK_COLUMNS.index('UPC')
+BOOK_VALUES = attrgetter(*BOOK_COLUMNS)
+
+UPSERT_QUERY = """
+    INSERT INTO books (title, image, description, UPC, product_type, price, price_tax, tax, availability, number_of_reviews, content_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        title = VALUES(title),
+        image = VALUES(image),
+        description = VALUES(description),
+        product_type = VALUES(product_type),
+        price = VALUES(price),
+        price_tax = VALUES(price_tax),
+        tax = VALUES(tax),
+        availability = VALUES(availability),
+        number_of_reviews = VALUES(number_of_reviews),
+        content_hash = VALUES(content_hash);
+"""
+
+# Migration d'une table 'books' créée par une version précédente (UPC en TEXT, sans clé
+# unique ni empreinte) : seule la ligne la plus récente (id le plus grand) de chaque UPC
+# est gardée, et l'empreinte vide force la réécriture des livres au crawl suivant.
+# Exécutée seulement avec DATABASE_MIGRATE = True (la suppression des doublons est définitive)
+MIGRATION_QUERIES = (
+    "DELETE older FROM books AS older JOIN books AS newer ON older.UPC = newer.UPC AND older.id < newer.id;",
+    "ALTER TABLE books MODIFY UPC VARCHAR(64), ADD COLUMN content_hash CHAR(40) NOT NULL DEFAULT '', ADD UNIQUE KEY books_upc (UPC);",
+)
+
+
+DATABASE = {
+    'host': "localhost",
+    'user': "root",
+    'password': PASSWORD,
+    'database': "BooksScrapy",
+}
+
 
 class DataBasePipeline:
-    
+    """
+    Enregistre les livres dans MySQL par lots, sans bloquer le reactor Twisted.
+
+    Chaque livre est identifié par son UPC (clé unique) et les écritures sont des
+    upserts. Une empreinte du contenu est stockée avec chaque ligne : un livre
+    dont l'empreinte n'a pas changé depuis le dernier crawl n'est pas réécrit.
+    Les items sans UPC (items partiels des pages de liste) ne sont pas enregistrés.
+    Un UPC présent plusieurs fois dans un même lot n'est écrit qu'une fois, avec sa
+    dernière occurrence (database/rows_duplicate_in_batch compte les autres). Une table
+    créée par une version précédente, sans clé UPC, n'est migrée à l'ouverture
+    (MIGRATION_QUERIES) qu'avec DATABASE_MIGRATE = True ; sinon, le crawl s'arrête
+    avec les requêtes à exécuter.
+
+    Les items sont accumulés en mémoire puis écrits avec un seul `executemany`
+    et un seul commit dès que DATABASE_BATCH_SIZE lignes sont en attente ou que
+    le lot le plus ancien dépasse DATABASE_BATCH_MAX_AGE secondes. Les écritures
+    passent par un pool adbapi de DATABASE_POOL_SIZE connexions (threads) et au
+    plus DATABASE_MAX_PENDING_WRITES lots sont en cours à la fois : au-delà,
+    process_item renvoie un Deferred qui ralentit le flux d'items jusqu'à ce
+    qu'un lot se termine. close_spider écrit le reste du tampon et attend la fin
+    de toutes les écritures avant de fermer le pool. Un lot dont l'écriture échoue sur
+    une erreur de connexion (OperationalError, InterfaceError) est réécrit jusqu'à
+    DATABASE_WRITE_RETRIES fois ; un lot abandonné est journalisé avec ses UPC.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings, crawler.stats)
+
+    def __init__(self, settings, stats):
+        self.batch_size = max(settings.getint('DATABASE_BATCH_SIZE', 100), 1)
+        self.batch_max_age = settings.getfloat('DATABASE_BATCH_MAX_AGE', 5)
+        self.pool_size = max(settings.getint('DATABASE_POOL_SIZE', 3), 1)
+        self.max_pending_writes = max(settings.getint('DATABASE_MAX_PENDING_WRITES', 4), 1)
+        self.migrate = settings.getbool('DATABASE_MIGRATE')
+        self.write_retries = max(settings.getint('DATABASE_WRITE_RETRIES', 3), 0)
+        self.write_retry_delay = settings.getfloat('DATABASE_WRITE_RETRY_DELAY', 1)
+        self.stats = stats
+        self.buffer = []
+        self.buffer_started_at = None
+        self.flush_task = None
+        self.pending_writes = set()
+        self.write_slots = defer.DeferredSemaphore(self.max_pending_writes)
+
     def open_spider(self, spider):
+        # Connexion synchrone, une seule fois au démarrage, pour remonter clairement les erreurs de configuration
         try:
-            self.connection = pymysql.connect(
-                host="localhost",
-                user="root",
-                password=PASSWORD,
-                database="BooksScrapy" 
-            )
+            connection = pymysql.connect(**DATABASE)
         except pymysql.err.OperationalError as e:
             if e.args[0] == 1049:
                 raise Exception("Erreur : La base de données 'BooksScrapy' n'existe pas.")
@@ -72,48 +211,483 @@ class DataBasePipeline:
                 raise Exception(f"Erreur de connexion : {e}")
 
         try:
-            self.cursor = self.connection.cursor()
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS books (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT,
-                    image TEXT,
-                    description TEXT,
-                    UPC TEXT,
-                    product_type TEXT,
-                    price FLOAT,
-                    price_tax FLOAT,
-                    tax FLOAT,
-                    availability INTEGER,
-                    number_of_reviews INTEGER
-                );
-            """)
-            self.connection.commit()
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS books (
+                        id SERIAL PRIMARY KEY,
+                        title TEXT,
+                        image TEXT,
+                        description TEXT,
+                        UPC VARCHAR(64) NOT NULL,
+                        product_type TEXT,
+                        price FLOAT,
+                        price_tax FLOAT,
+                        tax FLOAT,
+                        availability INTEGER,
+                        number_of_reviews INTEGER,
+                        content_hash CHAR(40) NOT NULL,
+                        UNIQUE KEY books_upc (UPC)
+                    );
+                """)
+                cursor.execute("SHOW COLUMNS FROM books LIKE 'content_hash';")
+                needs_migration = cursor.fetchone() is None
+            connection.commit()
         except Exception as e:
-            self.connection.close()
+            connection.close()
             raise Exception(f"Erreur lors de la création de la table : {e}")
 
+        try:
+            if needs_migration:
+                self._migrate(connection, spider)
+        finally:
+            connection.close()
+
+        self.dbpool = adbapi.ConnectionPool(
+            'pymysql',
+            cp_min=1,
+            cp_max=self.pool_size,
+            cp_reconnect=True,
+            cp_noisy=False,
+            **DATABASE
+        )
+
+        # Vide le tampon même quand le flux d'items s'arrête (fin de catégorie, ralentissement...)
+        if self.batch_max_age > 0:
+            self.flush_task = task.LoopingCall(self._flush_if_expired, spider)
+            self.flush_task.start(self.batch_max_age, now=False)
+
+    def _migrate(self, connection, spider):
+        queries = '\n'.join(MIGRATION_QUERIES)
+        if not self.migrate:
+            raise Exception(f"Erreur : la table 'books' n'a pas de clé UPC ni de colonne content_hash. Sauvegardez-la, puis "
+                            f"relancez avec -s DATABASE_MIGRATE=True ou exécutez (les doublons d'UPC sont supprimés) :\n{queries}")
+        spider.logger.warning("Table 'books' sans clé UPC ni colonne content_hash : migration (doublons d'UPC supprimés)")
+        try:
+            with connection.cursor() as cursor:
+                deleted = cursor.execute(MIGRATION_QUERIES[0])
+                cursor.execute(MIGRATION_QUERIES[1])
+            connection.commit()
+        except pymysql.err.MySQLError as e:
+            # Le DDL MySQL n'est pas transactionnel : la table peut être à moitié migrée
+            raise Exception(f"Erreur : migration de la table 'books' impossible ({e}), à terminer à la main :\n{queries}") from e
+        self.stats.set_value('database/migrated_duplicates_deleted', deleted)
+        spider.logger.warning(f"Table 'books' migrée : {deleted} doublons d'UPC supprimés")
+
+    @staticmethod
+    def _values(item):
+        # Book : lecture directe des attributs ; autres items : un seul ItemAdapter
+        if isinstance(item, Book):
+            return BOOK_VALUES(item)
+        adapter = ItemAdapter(item)
+        return tuple(adapter.get(column) for column in BOOK_COLUMNS)
+
+    def _row(self, values):
+        content_hash = hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+        return values + (content_hash,)
+
+    def _buffer_is_expired(self):
+        if self.buffer_started_at is None or self.batch_max_age <= 0:
+            return False
+        return time.monotonic() - self.buffer_started_at >= self.batch_max_age
+
+    def _flush_if_expired(self, spider):
+        if self._buffer_is_expired():
+            return self.flush(spider)
+
+    def _record_flush(self, rows, latency_ms):
+        self.stats.inc_value('database/flush_count')
+        self.stats.inc_value('database/rows_flushed', rows)
+        self.stats.max_value('database/rows_per_flush_max', rows)
+        self.stats.inc_value('database/flush_latency_ms_total', latency_ms)
+        self.stats.max_value('database/flush_latency_ms_max', latency_ms)
+        flush_count = self.stats.get_value('database/flush_count')
+        self.stats.set_value('database/rows_per_flush_avg', self.stats.get_value('database/rows_flushed') / flush_count)
+        self.stats.set_value('database/flush_latency_ms_avg', self.stats.get_value('database/flush_latency_ms_total') / flush_count)
+
+    @staticmethod
+    def _upsert_rows(cursor, rows):
+        # Exécuté dans un thread du pool : runInteraction gère commit et rollback
+        # Un UPC présent plusieurs fois dans le lot : seule sa dernière occurrence est écrite
+        rows_by_upc = {row[UPC_INDEX]: row for row in rows}
+        placeholders = ', '.join(['%s'] * len(rows_by_upc))
+        cursor.execute(f"SELECT UPC, content_hash FROM books WHERE UPC IN ({placeholders});", list(rows_by_upc))
+        known_hashes = dict(cursor.fetchall())
+        inserted = [row for upc, row in rows_by_upc.items() if upc not in known_hashes]
+        updated = [row for upc, row in rows_by_upc.items() if upc in known_hashes and known_hashes[upc] != row[-1]]
+        if inserted or updated:
+            cursor.executemany(UPSERT_QUERY, inserted + updated)
+        duplicates = len(rows) - len(rows_by_upc)
+        return len(inserted), len(updated), len(rows_by_upc) - len(inserted) - len(updated), duplicates
+
+    def _write_batch(self, rows, spider, attempt=0):
+        start = time.perf_counter()
+
+        def on_success(counts):
+            latency_ms = (time.perf_counter() - start) * 1000
+            inserted, updated, unchanged, duplicates = counts
+            self.stats.inc_value('database/rows_inserted', inserted)
+            self.stats.inc_value('database/rows_updated', updated)
+            self.stats.inc_value('database/rows_unchanged', unchanged)
+            if duplicates:
+                self.stats.inc_value('database/rows_duplicate_in_batch', duplicates)
+            self._record_flush(len(rows), latency_ms)
+            spider.logger.debug(f'{len(rows)} livres écrits en {latency_ms:.1f} ms')
+
+        def on_error(failure):
+            # Erreur de connexion (MySQL redémarré, timeout) : le même lot est réécrit, le slot d'écriture reste pris
+            if attempt < self.write_retries and failure.check(pymysql.err.OperationalError, pymysql.err.InterfaceError):
+                delay = self.write_retry_delay * 2 ** attempt
+                self.stats.inc_value('database/flush_retries')
+                spider.logger.warning(f"Erreur lors de l'écriture de {len(rows)} livres ({failure.getErrorMessage()}), "
+                                      f"nouvelle tentative dans {delay:g} s")
+                return task.deferLater(reactor, delay, self._write_batch, rows, spider, attempt + 1)
+            self.stats.inc_value('database/flush_errors')
+            self.stats.inc_value('database/rows_failed', len(rows))
+            upcs = ', '.join(str(row[UPC_INDEX]) for row in rows)
+            spider.logger.error(f"Erreur lors de l'écriture de {len(rows)} livres : {failure.getErrorMessage()} (UPC : {upcs})")
 
+        d = self.dbpool.runInteraction(self._upsert_rows, rows)
+        d.addCallbacks(on_success, on_error)
+        return d
+
+    def flush(self, spider):
+        if not self.buffer:
+            return defer.succeed(None)
+        rows, self.buffer = self.buffer, []
+        self.buffer_started_at = None
+        d = self.write_slots.run(self._write_batch, rows, spider)
+        self.pending_writes.add(d)
+        d.addBoth(self._forget_write, d)
+        return d
+
+    def _forget_write(self, result, d):
+        self.pending_writes.discard(d)
+        return result
 
     def process_item(self, item, spider):
-        self.cursor.execute("""
-            INSERT INTO books (title, image, description, UPC, product_type, price, price_tax, tax, availability, number_of_reviews)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-        """, (
-            item['title'],
-            item['image'],
-            item['description'],
-            item['UPC'],
-            item['product_type'],
-            item['price'],
-            item['price_tax'],
-            item['tax'],
-            item['availability'],
-            item['number_of_reviews']
-        ))
-        self.connection.commit()
+        # Items partiels du mode 'listing' sans UPC : pas de clé pour l'upsert
+        values = self._values(item)
+        if not values[UPC_INDEX]:
+            self.stats.inc_value('database/rows_skipped_without_upc')
+            return item
+        if not self.buffer:
+            self.buffer_started_at = time.monotonic()
+        self.buffer.append(self._row(values))
+        if len(self.buffer) >= self.batch_size or self._buffer_is_expired():
+            d = self.flush(spider)
+            # File d'écriture pleine : l'item attend que son lot soit écrit
+            if self.write_slots.waiting:
+                return d.addCallback(lambda _: item)
         return item
 
     def close_spider(self, spider):
-        self.cursor.close()
-        self.connection.close()
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        self.flush(spider)
+        d = defer.DeferredList(list(self.pending_writes))
+        d.addBoth(lambda _: self.dbpool.close())
+        return d
+
+
+def make_thumbnails(body, sizes):
+    """
+    Construit les vignettes JPEG d'une image (exécuté dans un processus du pool de CoverImagePipeline).
+    Args:
+        body (bytes): Le contenu de l'image.
+        sizes (dict): La taille maximale (largeur, hauteur) de chaque vignette, par nom.
+    Returns:
+        dict: Le contenu JPEG de chaque vignette, par nom.
+    """
+    image = Image.open(BytesIO(body)).convert('RGB')
+    thumbnails = {}
+    for name, size in sizes.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail(tuple(size))
+        buf = BytesIO()
+        thumbnail.save(buf, 'JPEG', quality=85)
+        thumbnails[name] = buf.getvalue()
+    return thumbnails
+
+
+class CoverImagePipeline(FilesPipeline):
+    """
+    Télécharge les couvertures des livres (champ image_url) et les stocke une seule fois, sous leur empreinte.
+
+    Chaque couverture est enregistrée dans COVERS_STORE sous full/<xx>/<sha256>.<ext> :
+    deux URL qui servent la même image (couverture partagée, image déplacée) ne donnent
+    qu'un fichier, dont elles partagent le chemin. Une copie téléchargée pendant l'écriture
+    du fichier attend la fin de celle-ci (et écrit le fichier elle-même si elle échoue).
+    L'empreinte et le chemin sont renseignés dans image_hash et image_path.
+
+    L'index COVERS_INDEX associe chaque URL à l'empreinte de son contenu, d'une exécution à
+    l'autre : une couverture connue n'est pas retéléchargée pendant COVERS_EXPIRES jours, puis
+    elle est redemandée avec If-None-Match / If-Modified-Since ; une réponse 304 ou un contenu
+    d'empreinte inchangée n'est pas réécrit.
+
+    Les vignettes COVERS_THUMBS (thumbs/<nom>/<xx>/<sha256>.jpg) sont construites par un pool
+    de COVERS_THUMB_WORKERS processus, sans bloquer le reactor : l'item attend ses vignettes
+    avant de passer au pipeline suivant. Nécessite Pillow (pip install pillow) ; sans Pillow,
+    les couvertures sont stockées sans vignettes.
+
+    Statistiques : file_status_count/<statut> (downloaded, uptodate, not_modified),
+    covers/stored, covers/deduplicated, covers/store_errors, covers/thumbnails et
+    covers/thumbnail_errors. Une couverture qui n'a pas pu être stockée est retirée de
+    l'index et l'item n'a ni image_path ni image_hash.
+
+    Attributs:
+        index_path (str): Le fichier de l'index URL -> empreinte.
+        index (dict): Par URL : sha256, path, etag, last_modified et checked_at.
+        paths (dict): Le chemin du fichier de chaque empreinte stockée (ou en cours d'écriture).
+        persisting (dict): Par empreinte en cours d'écriture, les Deferred des copies qui attendent le fichier.
+        thumb_sizes (dict): La taille maximale de chaque vignette, par nom.
+        thumb_workers (int): Le nombre de processus du pool de vignettes (0 = nombre de CPU).
+        thumb_pool (concurrent.futures.ProcessPoolExecutor): Le pool de vignettes.
+
+    Méthodes:
+        from_settings(cls, settings): Initialise le pipeline à partir des paramètres COVERS_*.
+        open_spider(spider): Charge l'index et démarre le pool de vignettes.
+        close_spider(spider): Enregistre l'index et arrête le pool.
+        get_media_requests(item, info): Retourne la requête de la couverture de l'item.
+        media_to_download(request, info, item): Évite le téléchargement d'une couverture connue et récente.
+        media_downloaded(response, request, info, item): Stocke une couverture téléchargée si son contenu est nouveau.
+        item_completed(results, item, info): Renseigne image_path et image_hash.
+    """
+
+    MEDIA_NAME = 'cover'
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Initialise le pipeline à partir des paramètres COVERS_* (COVERS_STORE remplace FILES_STORE).
+        Args:
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+        Returns:
+            CoverImagePipeline: Une instance du pipeline.
+        Raises:
+            scrapy.exceptions.NotConfigured: Si COVERS_STORE n'est pas défini.
+        """
+        # FilesPipeline convertit None en chaîne 'None' : le pipeline écrirait dans ./None
+        if not settings.get('COVERS_STORE'):
+            raise NotConfigured
+        # Copie modifiable (les paramètres du crawler sont figés)
+        settings = Settings(settings.copy_to_dict())
+        settings.set('FILES_STORE', settings.get('COVERS_STORE'))
+        return super().from_settings(settings)
+
+    def __init__(self, store_uri, download_func=None, settings=None):
+        """
+        Initialise le pipeline CoverImagePipeline.
+        Args:
+            store_uri (str): Le stockage des couvertures (dossier local, s3://, gs:// ou ftp://).
+            download_func: Fonction de téléchargement de remplacement (tests de Scrapy).
+            settings (scrapy.settings.Settings): Les paramètres de configuration de Scrapy.
+        """
+        if isinstance(settings, dict) or settings is None:
+            settings = Settings(settings)
+        super().__init__(store_uri, download_func=download_func, settings=settings)
+        self.expires = settings.getint('COVERS_EXPIRES', 90)
+        self.index_path = settings.get('COVERS_INDEX', 'covers_index.json')
+        if not os.path.isabs(self.index_path):
+            self.index_path = os.path.join(data_path('', createdir=True), self.index_path)
+        self.index = {}
+        self.paths = {}
+        self.persisting = {}
+        self.thumb_sizes = settings.getdict('COVERS_THUMBS')
+        self.thumb_workers = settings.getint('COVERS_THUMB_WORKERS') or os.cpu_count()
+        self.thumb_pool = None
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+        self.paths = {entry['sha256']: entry['path'] for entry in self.index.values()}
+        if self.thumb_sizes and Image is None:
+            spider.logger.warning('Pillow non installé (pip install pillow) : couvertures stockées sans vignettes')
+            self.thumb_sizes = {}
+        if self.thumb_sizes:
+            self.thumb_pool = ProcessPoolExecutor(max_workers=self.thumb_workers, mp_context=pool_context())
+        spider.logger.info(f'Couvertures : {len(self.index)} URL connues, {len(self.paths)} images stockées')
+
+    def close_spider(self, spider):
+        if self.thumb_pool is not None:
+            self.thumb_pool.shutdown()
+        with open(f'{self.index_path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(f'{self.index_path}.tmp', self.index_path)
+
+    def get_media_requests(self, item, info):
+        url = ItemAdapter(item).get('image_url')
+        if not url:
+            return []
+        return [Request(url, callback=NO_CALLBACK)]
+
+    def _result(self, request, entry, status):
+        return {'url': request.url, 'path': entry['path'], 'checksum': entry['sha256'], 'status': status}
+
+    def media_to_download(self, request, info, *, item=None):
+        entry = self.index.get(request.url)
+        if entry is None:
+            return None
+        if (time.time() - entry['checked_at']) / 86400 > self.expires:
+            # Couverture connue mais ancienne : le serveur indique si elle a changé
+            if entry.get('etag'):
+                request.headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request.headers['If-Modified-Since'] = entry['last_modified']
+            # Couverture routée par le proxy : en-têtes transmis au site seulement avec keep_headers
+            request.meta['sops_keep_headers'] = True
+            return None
+
+        def on_stat(stat):
+            # Fichier supprimé du stockage : téléchargement
+            if not stat:
+                return None
+            self.inc_stats(info.spider, 'uptodate')
+            return self._result(request, entry, 'uptodate')
+
+        dfd = defer.maybeDeferred(self.store.stat_file, entry['path'], info)
+        dfd.addErrback(lambda _: None)
+        return dfd.addCallback(on_stat)
+
+    def file_path(self, request, response=None, info=None, *, item=None):
+        # Sans réponse, le chemin n'est connu que par l'index
+        if response is None:
+            entry = self.index.get(request.url)
+            return entry['path'] if entry else None
+        digest = hashlib.sha256(response.body).hexdigest()
+        return self.paths.get(digest) or self._content_path(digest, request, response)
+
+    def _content_path(self, digest, request, response):
+        return f'full/{digest[:2]}/{digest}{self._extension(request, response)}'
+
+    @staticmethod
+    def _extension(request, response):
+        content_type = response.headers.get('Content-Type', b'').decode('latin-1').split(';')[0].strip()
+        extension = mimetypes.guess_extension(content_type) if content_type else None
+        return extension or os.path.splitext(urlsplit(request.url).path)[1]
+
+    def media_downloaded(self, response, request, info, *, item=None):
+        stats = info.spider.crawler.stats
+        entry = self.index.get(request.url)
+        if response.status == 304 and entry is not None:
+            entry['checked_at'] = time.time()
+            self.inc_stats(info.spider, 'not_modified')
+            return self._result(request, entry, 'uptodate')
+        if response.status != 200:
+            info.spider.logger.warning(f'Couverture {request.url} : code HTTP {response.status}')
+            raise FileException('download-error')
+        if not response.body:
+            raise FileException('empty-content')
+        self.inc_stats(info.spider, 'downloaded')
+
+        digest = hashlib.sha256(response.body).hexdigest()
+        entry = {
+            'sha256': digest,
+            'path': None,
+            'etag': response.headers.get('ETag', b'').decode('latin-1') or None,
+            'last_modified': response.headers.get('Last-Modified', b'').decode('latin-1') or None,
+            'checked_at': time.time(),
+        }
+        self.index[request.url] = entry
+        return self._store_cover(response, request, info, entry)
+
+    def _store_cover(self, response, request, info, entry):
+        """
+        Stocke une couverture téléchargée, ou reprend le fichier d'un contenu identique.
+        Args:
+            response (scrapy.http.Response): La réponse de la couverture.
+            request (scrapy.http.Request): La requête de la couverture.
+            info: L'état du pipeline pour le spider.
+            entry (dict): L'entrée de l'index de la couverture.
+        Returns:
+            dict | twisted.internet.defer.Deferred: Le résultat de la couverture, ou un Deferred qui le renvoie une fois le fichier écrit.
+        """
+        stats = info.spider.crawler.stats
+        digest = entry['sha256']
+        stored_path = self.paths.get(digest)
+        if stored_path is not None:
+            # Même contenu qu'une couverture déjà stockée (autre URL, ou URL inchangée) : rien à écrire,
+            # le chemin est celui du fichier existant (l'extension de cette réponse peut différer)
+            entry['path'] = stored_path
+            waiters = self.persisting.get(digest)
+            if waiters is None:
+                stats.inc_value('covers/deduplicated')
+                return self._result(request, entry, 'downloaded')
+            # Fichier encore en cours d'écriture : la couverture n'est disponible qu'une fois écrit
+            waiter = defer.Deferred()
+            waiters.append(waiter)
+            waiter.addCallback(lambda _: stats.inc_value('covers/deduplicated'))
+            # Écriture échouée (empreinte oubliée par _store_failed) : cette copie écrit le fichier à son tour
+            return waiter.addCallbacks(lambda _: self._result(request, entry, 'downloaded'),
+                                       lambda _: self._store_cover(response, request, info, entry))
+        entry['path'] = self.paths[digest] = self._content_path(digest, request, response)
+        self.persisting[digest] = []
+        # persist_file est synchrone pour un dossier local, renvoie un Deferred pour S3, GCS et FTP
+        d = defer.maybeDeferred(self.store.persist_file, entry['path'], BytesIO(response.body), info,
+                                headers={'Content-Type': response.headers.get('Content-Type', b'').decode('latin-1')})
+        d.addCallbacks(lambda _: stats.inc_value('covers/stored'), self._store_failed, errbackArgs=(request, digest, info))
+        if self.thumb_pool is not None:
+            d.addCallback(lambda _: self._make_thumbnails(response.body, digest, info))
+        d.addBoth(self._persist_done, digest)
+        return d.addCallback(lambda _: self._result(request, entry, 'downloaded'))
+
+    def _persist_done(self, result, digest):
+        # Réveille les copies qui attendaient le fichier, avec le même succès ou le même échec
+        for waiter in self.persisting.pop(digest, []):
+            if isinstance(result, Failure):
+                waiter.errback(result)
+            else:
+                waiter.callback(None)
+        return result
+
+    def _store_failed(self, failure, request, digest, info):
+        # Couverture non stockée : ni l'index ni les empreintes ne doivent la considérer comme connue
+        self.paths.pop(digest, None)
+        self.index.pop(request.url, None)
+        info.spider.crawler.stats.inc_value('covers/store_errors')
+        info.spider.logger.warning(f'Couverture {request.url} non stockée : {failure.getErrorMessage()}')
+        raise FileException('store-error')
+
+    def _make_thumbnails(self, body, digest, info):
+        stats = info.spider.crawler.stats
+        d = defer.Deferred()
+        future = self.thumb_pool.submit(make_thumbnails, body, self.thumb_sizes)
+        # Le callback du future s'exécute dans un thread du pool : retour au reactor avant de toucher au Deferred
+        future.add_done_callback(lambda f: reactor.callFromThread(self._thumbnails_done, f, d))
+
+        def on_error(failure):
+            stats.inc_value('covers/thumbnail_errors')
+            info.spider.logger.warning(f'Vignettes de la couverture {digest} : {failure.getErrorMessage()}')
+
+        def store(thumbnails):
+            writes = [
+                defer.maybeDeferred(self.store.persist_file, f'thumbs/{name}/{digest[:2]}/{digest}.jpg', BytesIO(data), info, headers={'Content-Type': 'image/jpeg'})
+                for name, data in thumbnails.items()
+            ]
+            return defer.DeferredList(writes, consumeErrors=True).addCallback(stored)
+
+        def stored(results):
+            stats.inc_value('covers/thumbnails', sum(1 for ok, _ in results if ok))
+            for ok, failure in results:
+                if not ok:
+                    on_error(failure)
+
+        return d.addCallbacks(store, on_error)
+
+    @staticmethod
+    def _thumbnails_done(future, d):
+        try:
+            d.callback(future.result())
+        except Exception:
+            d.errback()
+
+    def item_completed(self, results, item, info):
+        adapter = ItemAdapter(item)
+        for ok, result in results:
+            if ok:
+                adapter['image_path'] = result['path']
+                adapter['image_hash'] = result['checksum']
+        return item
@@ -28,6 +28,8 @@ USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Ge
 ROBOTSTXT_OBEY = False
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
+# point de départ de AdaptiveConcurrency quand ADAPTIVE_CONCURRENCY_ENABLED est actif
+# (ex : -s ADAPTIVE_CONCURRENCY_ENABLED=True -s CONCURRENT_REQUESTS=4)
 CONCURRENT_REQUESTS = 1
 
 # Configure a delay for requests for the same website (default: 0)
@@ -54,9 +56,10 @@ DEFAULT_REQUEST_HEADERS = {
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    'project_scrapy.middlewares.ProjectScrapySpiderMiddleware': 543,
-#}
+SPIDER_MIDDLEWARES = {
+    # acquitte les requêtes de la frontière partagée une fois leur réponse traitée (crawl distribué)
+    'project_scrapy.frontier.FrontierAckMiddleware': 10,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
@@ -71,9 +74,14 @@ DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
     'project_scrapy.middlewares.ScrapeOpsFakeBrowserHeadersMiddleware': 400,
     # 'project_scrapy.middlewares.ScrapeOpsFakeUserAgentMiddleware': 500,
+    # cache HTTP avant la réécriture par le proxy : une réponse en cache ne consomme ni requête ni session du proxy
+    'scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware': 550,
+    # requêtes conditionnelles (ETag / Last-Modified) pour le crawl incrémental, avant la réécriture
+    # par le proxy pour que celui-ci transmette les en-têtes au site (keep_headers)
+    'project_scrapy.middlewares.ConditionalRequestMiddleware': 590,
     'project_scrapy.middlewares.ScrapeOpsProxyMiddleware': 600,
-    # gère les tentatives de nouvelles requêtes en cas d'échec
-    'scrapeops_scrapy.middleware.retry.RetryMiddleware': 800,
+    # gère les tentatives de nouvelles requêtes en cas d'échec, avec attente exponentielle et budget global
+    'project_scrapy.middlewares.BackoffRetryMiddleware': 800,
     # empêche le crawler de suivre des liens vers des domaines qui ne sont pas listés dans allowed_domains du spider.
     'scrapy.downloadermiddlewares.offsite.OffsiteMiddleware': None, 
 }
@@ -82,6 +90,8 @@ DOWNLOADER_MIDDLEWARES = {
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 EXTENSIONS = {
    'scrapy.extensions.telnet.TelnetConsole': None,
+   # ajuste CONCURRENT_REQUESTS pendant le crawl selon la latence, les erreurs et les 429
+   'project_scrapy.extensions.AdaptiveConcurrency': 500,
    'scrapeops_scrapy.extension.ScrapeOpsMonitor': 700, 
 }
 
@@ -89,6 +99,8 @@ EXTENSIONS = {
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
     'project_scrapy.pipelines.ProjectScrapyPipeline': 200,
+    # couvertures des livres, désactivé tant que COVERS_STORE n'est pas défini
+    'project_scrapy.pipelines.CoverImagePipeline': 250,
     'project_scrapy.pipelines.DataBasePipeline': 300,
 }
 
@@ -107,11 +119,14 @@ ITEM_PIPELINES = {
 
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = 'httpcache'
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+# Rejouer un crawl sans dépense de proxy : scrapy crawl bookspider -s HTTPCACHE_ENABLED=True
+HTTPCACHE_ENABLED = False
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = 'httpcache'
+# Blocages et erreurs du proxy ou du site : jamais mis en cache
+HTTPCACHE_IGNORE_HTTP_CODES = [403, 429, 500, 502, 503, 504]
+HTTPCACHE_STORAGE = 'project_scrapy.httpcache.OriginalUrlCacheStorage'
+HTTPCACHE_POLICY = 'project_scrapy.httpcache.ProxyAwareCachePolicy'
 
 
 
@@ -129,3 +144,183 @@ SCRAPEOPS_FAKE_USER_AGENT_ENDPOINT = 'http://headers.scrapeops.io/v1/user-agents
 SCRAPEOPS_FAKE_HEADERS_ENDPOINT = 'http://headers.scrapeops.io/v1/browser-headers?'
 SCRAPEOPS_FAKE_PROXY_ENDPOINT = 'https://proxy.scrapeops.io/v1/?'
 SCRAPEOPS_FAKE_PROXY_ENDPOINT = 'https://proxy.scrapeops.io/v1/?'
+
+# Listes de User-Agents / en-têtes mises en cache dans .scrapy/<SCRAPEOPS_POOL_CACHE_DIR>/
+SCRAPEOPS_POOL_CACHE_DIR = 'scrapeops'
+# Durée de validité du cache avant rafraîchissement en arrière-plan (secondes)
+SCRAPEOPS_POOL_CACHE_TTL = 86400
+SCRAPEOPS_POOL_REFRESH_TIMEOUT = 10
+# Délai avant une nouvelle tentative quand l'API ScrapeOps est injoignable (secondes)
+SCRAPEOPS_POOL_RETRY_DELAY = 60
+
+# Écriture des livres en base par lots : un seul executemany/commit par lot
+DATABASE_BATCH_SIZE = 100
+# Âge maximal (secondes) d'un lot en attente avant écriture forcée
+DATABASE_BATCH_MAX_AGE = 5
+# Nombre de connexions MySQL (threads) utilisées pour écrire hors du reactor
+DATABASE_POOL_SIZE = 3
+# Nombre maximal de lots en cours d'écriture avant de ralentir le flux d'items
+DATABASE_MAX_PENDING_WRITES = 4
+# Nouvelles tentatives d'un lot après une erreur de connexion MySQL, et délai de la première (secondes, doublé ensuite)
+DATABASE_WRITE_RETRIES = 3
+DATABASE_WRITE_RETRY_DELAY = 1
+# Migration d'une table 'books' sans clé UPC (version précédente) : supprime définitivement les
+# doublons d'UPC, à n'activer qu'après une sauvegarde (ex : -s DATABASE_MIGRATE=True)
+DATABASE_MIGRATE = False
+
+# Crawl incrémental : les pages produit non modifiées (304) ne sont ni parsées ni enregistrées
+INCREMENTAL_ENABLED = False
+# Dossier (dans .scrapy/) où sont conservés les validateurs ETag / Last-Modified
+INCREMENTAL_DIR = 'incremental'
+
+# Concurrence adaptative (AIMD) : +ADAPTIVE_CONCURRENCY_INCREASE quand tout va bien,
+# x ADAPTIVE_CONCURRENCY_DECREASE_FACTOR sur 429, erreurs ou latence trop élevée.
+# Désactivée par défaut : la concurrence reste CONCURRENT_REQUESTS
+ADAPTIVE_CONCURRENCY_ENABLED = False
+ADAPTIVE_CONCURRENCY_MIN = 1
+# Plafond à adapter aux requêtes simultanées autorisées par le forfait ScrapeOps
+ADAPTIVE_CONCURRENCY_MAX = 16
+# Latence moyenne visée par téléchargement (secondes, proxy compris)
+ADAPTIVE_CONCURRENCY_TARGET_LATENCY = 5
+# Intervalle entre deux décisions (secondes)
+ADAPTIVE_CONCURRENCY_INTERVAL = 5
+ADAPTIVE_CONCURRENCY_INCREASE = 1
+ADAPTIVE_CONCURRENCY_DECREASE_FACTOR = 0.5
+# Taux d'erreurs (5xx, erreurs de téléchargement) toléré sur un intervalle
+ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE = 0.1
+ADAPTIVE_CONCURRENCY_THROTTLE_HTTP_CODES = [429]
+
+# Nouvelles tentatives (BackoffRetryMiddleware) : attente aléatoire entre 0 et
+# min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (tentative - 1)) secondes, au moins Retry-After
+# La requête en attente est abandonnée avec RetryDelayed (sous-classe d'IgnoreRequest) : son errback est
+# appelé alors que la nouvelle tentative est prévue, failure.check(RetryDelayed) permet de l'ignorer
+RETRY_TIMES = 3
+RETRY_BACKOFF_BASE = 1
+RETRY_BACKOFF_MAX = 60
+# Nouvelles tentatives autorisées sur tout le crawl : RETRY_BUDGET_RATIO x requêtes envoyées (au moins RETRY_BUDGET_MIN)
+RETRY_BUDGET_RATIO = 0.1
+RETRY_BUDGET_MIN = 10
+# Politiques par code HTTP ('exception' pour les erreurs de téléchargement) : times, base, max
+RETRY_POLICIES = {
+    429: {'times': 5, 'base': 5, 'max': 120},
+    'exception': {'times': 3, 'base': 2},
+}
+
+# Requêtes doublées (HedgingDownloadHandler) : une copie est envoyée quand une requête
+# n'a pas répondu après le percentile HEDGING_PERCENTILE des latences récentes
+DOWNLOAD_HANDLERS = {
+    'http': 'project_scrapy.handlers.HedgingDownloadHandler',
+    'https': 'project_scrapy.handlers.HedgingDownloadHandler',
+}
+HEDGING_ENABLED = False
+HEDGING_DOWNLOAD_HANDLER = 'project_scrapy.handlers.PooledHTTP11DownloadHandler'
+HEDGING_PERCENTILE = 0.95
+# Latences observées avant la première copie, et taille de la fenêtre de latences récentes
+HEDGING_MIN_SAMPLES = 50
+HEDGING_WINDOW = 500
+# Délai minimal avant une copie (secondes)
+HEDGING_MIN_DELAY = 0.1
+# Part maximale des requêtes qui peut être doublée (dépense de proxy supplémentaire)
+HEDGING_BUDGET_RATIO = 0.05
+
+# Routage direct / proxy par classe d'URL (première règle qui correspond) : 'direct', 'proxy' ou 'auto'
+# 'auto' : direct tant que le site ne bloque pas, proxy sinon
+SCRAPEOPS_PROXY_ROUTES = {
+    # pages de liste statiques (accueil et pagination)
+    r'://[^/]+/(index\.html|catalogue/page-\d+\.html)?$': 'auto',
+    # couvertures (fichiers statiques)
+    r'/media/cache/': 'auto',
+}
+SCRAPEOPS_PROXY_DEFAULT_ROUTE = 'proxy'
+# Réponses directes considérées comme un blocage
+SCRAPEOPS_PROXY_BLOCK_HTTP_CODES = [403, 429, 503]
+# Proportion de blocages (sur les SCRAPEOPS_PROXY_BLOCK_WINDOW dernières requêtes directes) qui déclenche l'escalade
+SCRAPEOPS_PROXY_BLOCK_RATE = 0.2
+SCRAPEOPS_PROXY_BLOCK_MIN_SAMPLES = 10
+SCRAPEOPS_PROXY_BLOCK_WINDOW = 50
+# Durée de l'escalade vers le proxy avant de retenter le direct (secondes)
+SCRAPEOPS_PROXY_ESCALATION_TIME = 600
+
+# Pool de sessions persistantes du proxy (0 : pas de session, sauf meta sops_session_number)
+SCRAPEOPS_SESSION_POOL_SIZE = 8
+# Page demandée pour préchauffer une session (première URL de départ du spider par défaut)
+SCRAPEOPS_SESSION_WARMUP_URL = None
+# Poids d'une nouvelle mesure dans les moyennes mobiles de latence et d'erreurs
+SCRAPEOPS_SESSION_EWMA_ALPHA = 0.2
+# Réponses observées avant qu'une session puisse être retirée
+SCRAPEOPS_SESSION_MIN_REQUESTS = 5
+# Une session est retirée au-delà de ce taux d'erreurs / blocages...
+SCRAPEOPS_SESSION_MAX_ERROR_RATE = 0.3
+# ... ou quand sa latence dépasse ce multiple de la latence médiane du pool
+SCRAPEOPS_SESSION_LATENCY_FACTOR = 3
+# Nombre maximal de préchauffages sur un crawl (proxy injoignable : pas de remplacements sans fin)
+SCRAPEOPS_SESSION_MAX_WARMUPS = 40
+
+# Connexions persistantes vers le proxy (PooledHTTP11DownloadHandler) : 0 = concurrence maximale du crawl
+DOWNLOAD_POOL_MAX_PERSISTENT = 0
+# Durée (secondes) pendant laquelle une connexion inactive reste ouverte
+DOWNLOAD_POOL_IDLE_TIMEOUT = 240
+# HTTP/2 multiplexé pour les requêtes HTTPS (nécessite le paquet h2)
+DOWNLOAD_POOL_HTTP2 = False
+# Mesure des poignées de main TLS et reprise de session TLS entre connexions (optionnel) :
+# -s DOWNLOADER_CLIENTCONTEXTFACTORY=project_scrapy.handlers.TimingContextFactory
+DOWNLOAD_POOL_TLS_RESUMPTION = True
+
+# Cache HTTP (OriginalUrlCacheStorage) : taille maximale avant éviction LRU, compression gzip
+# et drapeaux de meta qui distinguent deux réponses d'une même URL
+HTTPCACHE_MAX_SIZE_MB = 1024
+HTTPCACHE_COMPRESSION_LEVEL = 6
+HTTPCACHE_KEY_META = ['sops_render_js', 'sops_js_scenario']
+
+# Export Parquet (colonnes typées, groupes de lignes écrits pendant le crawl, nécessite pyarrow) :
+# scrapy crawl bookspider -O books.parquet
+FEED_EXPORTERS = {
+    'parquet': 'project_scrapy.exporters.ParquetItemExporter',
+}
+
+# Crawl distribué (SharedFrontierScheduler) : un processus par worker avec
+# -s SCHEDULER=project_scrapy.frontier.SharedFrontierScheduler ; les workers d'un même
+# FRONTIER_CRAWL se partagent la frontière FRONTIER_PATH (relatif au dossier .scrapy)
+FRONTIER_BACKEND = 'project_scrapy.frontier.SQLiteFrontier'
+FRONTIER_PATH = 'frontier.sqlite'
+FRONTIER_CRAWL = 'default'
+# Identifiant du worker (par défaut <machine>-<pid>)
+FRONTIER_WORKER_ID = None
+# Durée (secondes) d'un bail, requêtes empruntées à la fois (0 = CONCURRENT_REQUESTS) et nombre de baux par requête
+FRONTIER_LEASE_TIME = 300
+FRONTIER_LEASE_BATCH = 0
+FRONTIER_MAX_ATTEMPTS = 3
+# Intervalle (secondes) d'interrogation de la frontière quand elle est vide et d'enregistrement de l'activité du worker
+FRONTIER_POLL_INTERVAL = 1
+FRONTIER_HEARTBEAT_INTERVAL = 10
+
+# Crawl reprenable après un arrêt brutal (CheckpointScheduler) :
+# -s JOBDIR=crawls/bookspider-1 -s SCHEDULER=project_scrapy.frontier.CheckpointScheduler
+# Intervalle (secondes) d'enregistrement du filtre de doublons dans JOBDIR
+SCHEDULER_CHECKPOINT_INTERVAL = 30
+# Pour les très grands crawls reprenables, filtre de doublons à mémoire bornée (filtre de Bloom)
+# à la place de RFPDupeFilter ; un faux positif écarte une requête jamais vue, sans erreur :
+# -s DUPEFILTER_CLASS=project_scrapy.dupefilters.BloomDupeFilter
+# Nombre de requêtes prévu et taux de faux positifs à pleine capacité
+DUPEFILTER_BLOOM_CAPACITY = 1000000
+DUPEFILTER_BLOOM_ERROR_RATE = 0.001
+
+# Couvertures des livres (CoverImagePipeline) : stockage (dossier local, s3://, gs://...), désactivé si vide
+# ex : scrapy crawl bookspider -s COVERS_STORE=covers
+COVERS_STORE = None
+# Index URL -> empreinte des couvertures (relatif au dossier .scrapy) et nombre de jours avant de revérifier une couverture
+COVERS_INDEX = 'covers_index.json'
+COVERS_EXPIRES = 90
+# Vignettes (largeur, hauteur maximales) construites par un pool de processus (0 = nombre de CPU), nécessite Pillow
+COVERS_THUMBS = {'small': (60, 90)}
+COVERS_THUMB_WORKERS = 0
+# Les pools de processus (vignettes, ParsePool) démarrent en forkserver (spawn à défaut) : un script
+# qui lance le crawl avec CrawlerProcess doit le faire sous if __name__ == '__main__'
+
+# Analyse des pages produit dans un pool de processus (ParsePool), pour les crawls à forte
+# concurrence sur une machine multicœur : nombre de processus (0 = analyse dans le reactor)
+PARSE_POOL_WORKERS = 0
+# Taille (octets) d'un segment de mémoire partagée et nombre maximal de pages en cours
+# d'extraction, un segment chacune (0 = deux par processus)
+PARSE_POOL_SLOT_SIZE = 2 * 1024 * 1024
+PARSE_POOL_MAX_PENDING = 0
@@ -1,11 +1,17 @@
 from typing import Iterable
 from scrapy.http import Request
+from scrapy.link import Link
 from scrapy.linkextractors import LinkExtractor
 from scrapy.spiders import CrawlSpider, Rule
-from ..items import BookItem
+from ..extractors import LISTING_FIELDS, extract_listing, extract_pagination, extract_product
+from ..items import BOOK_FIELDS, Book
+from ..parsepool import ParsePool
 from scrapy.exceptions import CloseSpider
+from scrapy import signals
 import scrapy
-import uuid
+import re
+from dataclasses import replace
+from urllib.parse import urlsplit
 
 
 
@@ -16,19 +22,97 @@ class BookSpider(CrawlSpider):
     # user_agent = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
     limit = 2
     lang = 'en'
-    session_id = str(uuid.uuid4())
     sops_job_name = "JobTest"
     rules = [
-        Rule(LinkExtractor(restrict_xpaths="//article/h3/a"), callback='parse', follow=False),
+        Rule(LinkExtractor(restrict_xpaths="//article/h3/a"), callback='parse', follow=False, process_request='prepare_product_request'),
         Rule(LinkExtractor(restrict_xpaths="//li[@class='next']/a"), follow=True)
     ]
 
+    # mode='full' : une requête par page produit (par défaut)
+    # mode='listing' : items partiels construits depuis les pages de liste, les pages produit
+    # ne sont visitées que si un champ de required_fields n'est pas affiché dans la liste
+    # ex : scrapy crawl bookspider -a mode=listing -a required_fields=UPC,description
+    listing_rules = [
+        Rule(LinkExtractor(restrict_xpaths="//li[@class='next']/a"), callback='parse_listing', follow=True)
+    ]
+
     custom_settings = {
-    'FEED_EXPORT_FIELDS': ["title",'image','description','UPC','product_type','price','price_tax','tax','availability','number_of_reviews'],
+    'FEED_EXPORT_FIELDS': ["title",'image','description','UPC','product_type','price','price_tax','tax','availability','number_of_reviews','image_url','image_path','image_hash'],
     }
 
 # scrapysplash
 
+    # fanout=True : toutes les pages de liste sont planifiées dès la première réponse
+    # (compteur "Page 1 of N") au lieu d'être découvertes une à une par le lien "next"
+
+    # start_url : autre site à crawler avec le même balisage (ex : benchmarks/standin_server.py)
+
+    # render_mode='static' : drapeaux sops_render_js / sops_js_scenario fixes (par défaut)
+    # render_mode='lazy' : les pages produit sont d'abord téléchargées sans rendu JavaScript ;
+    # si un champ de required_fields (title, UPC, price par défaut) manque, la page est
+    # redemandée avec render_js, puis avec le scénario JS. Quand au moins la moitié des pages
+    # d'un motif d'URL (sur 10 pages au moins) ont dû être escaladées, le niveau qui a
+    # fonctionné est retenu et les pages suivantes du même motif partent de ce niveau.
+    # ex : scrapy crawl bookspider -a render_mode=lazy
+    render_levels = (
+        {'sops_render_js': False, 'sops_js_scenario': False},
+        {'sops_render_js': True, 'sops_js_scenario': False},
+        {'sops_render_js': True, 'sops_js_scenario': True},
+    )
+    lazy_render_default_fields = ('title', 'UPC', 'price')
+    lazy_render_remember_ratio = 0.5
+    lazy_render_min_pages = 10
+
+    # PARSE_POOL_WORKERS > 0 : les pages produit sont analysées dans un pool de processus (ParsePool)
+    # ex : scrapy crawl bookspider -s PARSE_POOL_WORKERS=4 -s CONCURRENT_REQUESTS=64
+    parse_pool = None
+
+    def __init__(self, *args, mode='full', required_fields=(), fanout=True, start_url=None, render_mode='static', **kwargs):
+        if mode not in ('full', 'listing'):
+            raise ValueError(f"Mode inconnu : {mode} (attendu : 'full' ou 'listing')")
+        if render_mode not in ('static', 'lazy'):
+            raise ValueError(f"Mode de rendu inconnu : {render_mode} (attendu : 'static' ou 'lazy')")
+        if isinstance(required_fields, str):
+            required_fields = [field.strip() for field in required_fields.split(',') if field.strip()]
+        unknown_fields = set(required_fields) - set(BOOK_FIELDS)
+        if unknown_fields:
+            raise ValueError(f"Champs inconnus dans required_fields : {', '.join(sorted(unknown_fields))}")
+        self.mode = mode
+        self.required_fields = list(required_fields)
+        self.render_mode = render_mode
+        self.render_required_fields = self.required_fields or list(self.lazy_render_default_fields)
+        # Niveau de rendu retenu par motif d'URL (index dans render_levels)
+        self.url_pattern_levels = {}
+        # Pages vérifiées à leur niveau de départ et pages escaladées, par motif d'URL
+        self.url_pattern_counts = {}
+        if isinstance(fanout, str):
+            fanout = fanout.lower() not in ('false', '0', 'no')
+        self.fanout = fanout
+        if start_url:
+            self.start_urls = [start_url]
+            self.allowed_domains = [urlsplit(start_url).hostname]
+        if mode == 'listing':
+            self.rules = self.listing_rules
+        super().__init__(*args, **kwargs)
+        # Règle de pagination (la seule qui suit les liens), réutilisée pour les pages planifiées d'avance
+        self.pagination_rule_index = next(index for index, rule in enumerate(self._rules) if rule.follow)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if crawler.settings.getint('PARSE_POOL_WORKERS'):
+            # crawler.stats n'existe qu'à l'ouverture du spider
+            crawler.signals.connect(spider.open_parse_pool, signal=signals.spider_opened)
+            crawler.signals.connect(spider.close_parse_pool, signal=signals.spider_closed)
+        return spider
+
+    def open_parse_pool(self, spider):
+        self.parse_pool = ParsePool.from_crawler(self.crawler)
+
+    def close_parse_pool(self, spider):
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+
     def start_requests(self) -> Iterable[Request]:
         for url in self.start_urls:
             yield scrapy.Request(url, 
@@ -36,6 +120,7 @@ class BookSpider(CrawlSpider):
                                      'sops_render_js': 'False',
                                      'sops_residential' : False,
                                      'sops_keep_headers': 'False',
+                                     # sessions persistantes du proxy : voir SCRAPEOPS_SESSION_POOL_SIZE
                                      'sops_session_number' : False,
                                      'sops_js_scenario' : 'False',
                                      'sops_country': False,
@@ -45,10 +130,132 @@ class BookSpider(CrawlSpider):
                                      'sops_premium' : False,
                                      'sops_optimize_request' : False,
                                      'sops_max_request_cost' : False,
-                                     'sops_max_request_cost' : False,
-                                     'sops_session_number': self.session_id,
                                      } )
 
+    def mark_incremental(self, request, response):
+        # Seules les pages produit sont conditionnelles : une page de liste non modifiée
+        # couperait la pagination et les livres qui suivent ne seraient plus visités
+        request.meta['incremental'] = True
+        return request
+
+    def prepare_product_request(self, request, response):
+        request = self.mark_incremental(request, response)
+        if self.render_mode == 'lazy':
+            self._apply_render_level(request, self.url_pattern_levels.get(self.url_pattern(request.url), 0))
+        return request
+
+    @staticmethod
+    def url_pattern(url):
+        # /catalogue/a-light-in-the-attic_1000/index.html -> books.toscrape.com/catalogue/*/index.html
+        parts = urlsplit(url)
+        segments = parts.path.split('/')
+        # Segments intermédiaires (slug du livre, catégorie) remplacés par '*', nombres par '#'
+        if len(segments) > 3:
+            segments = segments[:2] + ['*'] * (len(segments) - 3) + segments[-1:]
+        return parts.netloc + re.sub(r'\d+', '#', '/'.join(segments))
+
+    def _apply_render_level(self, request, level):
+        request.meta.update(self.render_levels[level])
+        request.meta['render_level'] = level
+        if level > 0:
+            # Le rendu JavaScript n'existe que par le proxy
+            request.meta['proxy_route'] = 'proxy'
+        self.crawler.stats.inc_value(f'bookspider/render/requests_level_{level}')
+
+    def escalate_render(self, response, product):
+        """
+        Vérifie les champs obligatoires d'une page produit en mode de rendu 'lazy'.
+        Args:
+            response (scrapy.http.Response): La réponse de la page produit.
+            product (dict): Les champs extraits de la page.
+        Returns:
+            scrapy.Request: La même page au niveau de rendu suivant s'il manque un champ, None sinon.
+        """
+        if self.render_mode != 'lazy':
+            return None
+        level = response.meta.get('render_level', 0)
+        missing_fields = [field for field in self.render_required_fields if not product.get(field)]
+        pattern = self.url_pattern(response.url)
+        stats = self.crawler.stats
+        counts = self.url_pattern_counts.setdefault(pattern, {'pages': 0, 'escalated': 0})
+        if not response.meta.get('render_escalated'):
+            counts['pages'] += 1
+            counts['escalated'] += bool(missing_fields)
+        if not missing_fields:
+            # Un niveau atteint par escalade est retenu pour tout le motif d'URL quand l'escalade est la règle
+            frequent = counts['pages'] >= self.lazy_render_min_pages and counts['escalated'] >= self.lazy_render_remember_ratio * counts['pages']
+            if response.meta.get('render_escalated') and frequent and level > self.url_pattern_levels.get(pattern, 0):
+                self.url_pattern_levels[pattern] = level
+                stats.set_value('bookspider/render/remembered_patterns', len(self.url_pattern_levels))
+                self.logger.info(f'Rendu de niveau {level} retenu pour {pattern}')
+            return None
+        if level + 1 >= len(self.render_levels):
+            stats.inc_value('bookspider/render/gave_up')
+            self.logger.warning(f"Champs {', '.join(missing_fields)} absents de {response.url} même avec le scénario JS")
+            return None
+        stats.inc_value(f'bookspider/render/escalations_to_level_{level + 1}')
+        meta = {key: value for key, value in response.meta.items() if key not in ('retry_times', 'download_latency', 'proxy_route_used')}
+        # Pas de requête conditionnelle : la version statique a déjà enregistré les validateurs (304 assuré)
+        meta['incremental'] = False
+        meta['render_escalated'] = True
+        request = response.request.replace(url=response.url, meta=meta, dont_filter=True)
+        self._apply_render_level(request, level + 1)
+        return request
+
+    @staticmethod
+    def image_url(response, book):
+        # //img/@src est relatif à la page : URL absolue pour CoverImagePipeline
+        return response.urljoin(book['image']) if book.get('image') else None
+
+    def parse_start_url(self, response):
+        if self.fanout:
+            yield from self.schedule_all_pages(response)
+        if self.mode == 'listing':
+            yield from self.parse_listing(response)
+
+    def schedule_all_pages(self, response):
+        # Les pages N+1... découvertes ensuite par la règle "next" ont la même URL :
+        # elles sont écartées par le dupefilter du scheduler
+        pagination = extract_pagination(response.selector.root)
+        if pagination is None:
+            return
+        current_page, page_count, next_url = pagination
+        next_url = response.urljoin(next_url)
+        if not re.search(r'page-\d+\.html$', next_url):
+            return
+        for page in range(current_page + 1, page_count + 1):
+            page_url = re.sub(r'page-\d+\.html$', f'page-{page}.html', next_url)
+            yield self._build_request(self.pagination_rule_index, Link(page_url, text='next'))
+        self.crawler.stats.inc_value('bookspider/pages_fanned_out', page_count - current_page)
+
+    def parse_listing(self, response):
+        missing_fields = [field for field in self.required_fields if field not in LISTING_FIELDS]
+        for book in extract_listing(response.selector.root):
+            book_url = response.urljoin(book.pop('url'))
+            book_item = Book(**book, image_url=self.image_url(response, book))
+            if missing_fields:
+                request = scrapy.Request(book_url, callback=self.parse_details, cb_kwargs={'book_item': book_item})
+                yield self.prepare_product_request(request, response)
+            else:
+                yield book_item
+
+    def parse_details(self, response, book_item):
+        if self.parse_pool is not None:
+            return self.parse_details_in_pool(response, book_item)
+        return self.build_details(response, book_item, extract_product(response.selector.root))
+
+    async def parse_details_in_pool(self, response, book_item):
+        product = await self.parse_pool.extract_product(response)
+        return list(self.build_details(response, book_item, product))
+
+    def build_details(self, response, book_item, product):
+        render_request = self.escalate_render(response, product)
+        if render_request is not None:
+            yield render_request
+            return
+        # Les valeurs de la page produit (disponibilité exacte, image en grand) remplacent celles de la liste
+        yield replace(book_item, **product, image_url=self.image_url(response, product))
+
     def parse(self, response):
 
         # # A décommenter pour limiter le nombre de liens scrappés au nombre défini par l'attribut limit
@@ -56,15 +263,20 @@ class BookSpider(CrawlSpider):
         # if scrape_count >= self.limit:
         #     raise CloseSpider("Limit Reached")
 
-        book_item = BookItem()
-        book_item['title'] =  response.xpath("//h1/text()").get()
-        book_item['image'] = response.xpath("//img/@src").get()
-        book_item['description'] = response.xpath("//div[@id='product_description']/following-sibling::p/text()").get()
-        book_item['availability'] = response.xpath("//table[@class='table table-striped']//tr[th[text()='Availability']]/td[last()]/text()").get()
-        generate_xpath = lambda variable: f"//table[@class='table table-striped']//tr[th[text()='{variable}']]/td/text()"
-        items = [('UPC','UPC'),('product_type','Product Type'),('price','Price (excl. tax)'),('price_tax','Price (incl. tax)'),('tax','Tax'),('number_of_reviews','Number of reviews')]
-        for item in items:
-            book_item[item[0]] = response.xpath(generate_xpath(item[1])).get()
+        if self.parse_pool is not None:
+            return self.parse_in_pool(response)
+        return self.build_book(response, extract_product(response.selector.root))
+
+    async def parse_in_pool(self, response):
+        product = await self.parse_pool.extract_product(response)
+        return list(self.build_book(response, product))
+
+    def build_book(self, response, product):
+        render_request = self.escalate_render(response, product)
+        if render_request is not None:
+            yield render_request
+            return
+        book_item = Book(**product, image_url=self.image_url(response, product))
         yield book_item
         # yield scrapy.Request(url=get_scrapeops_url('https://books.toscrape.com/'), callback=self.parse)
 
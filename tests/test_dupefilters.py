@@ -0,0 +1,75 @@
+import os
+
+import pytest
+from scrapy import Request
+from scrapy.utils.request import RequestFingerprinter
+from scrapy.utils.test import get_crawler
+
+from project_scrapy.dupefilters import BloomDupeFilter, exact_set_bytes
+
+
+@pytest.fixture(scope='module')
+def fingerprinter():
+    return RequestFingerprinter(get_crawler(settings_dict={'REQUEST_FINGERPRINTER_IMPLEMENTATION': '2.7'}))
+
+
+def requests(count, start=0):
+    return [Request(f'https://books.toscrape.com/catalogue/book_{i}/index.html') for i in range(start, start + count)]
+
+
+def test_request_seen_after_first_visit(fingerprinter):
+    dupefilter = BloomDupeFilter(fingerprinter=fingerprinter, capacity=1000)
+    request = Request('https://books.toscrape.com/')
+    assert not dupefilter.request_seen(request)
+    assert dupefilter.request_seen(request)
+    assert dupefilter.request_seen(request.replace())
+    assert dupefilter.count == 1
+
+
+def test_false_positive_rate_within_target(fingerprinter):
+    dupefilter = BloomDupeFilter(fingerprinter=fingerprinter, capacity=2000, error_rate=0.01)
+    for request in requests(2000):
+        dupefilter.request_seen(request)
+    assert dupefilter.false_positive_rate() == pytest.approx(0.01, rel=0.1)
+    bits = bytes(dupefilter.bits)
+    false_positives = 0
+    for request in requests(2000, start=10000):
+        false_positives += dupefilter.request_seen(request)
+        # Filtre remis à l'état plein : chaque requête est testée au taux de faux positifs visé
+        dupefilter.bits[:] = bits
+    assert false_positives / 2000 < 0.02
+
+
+def test_save_and_reload(tmp_path, fingerprinter):
+    dupefilter = BloomDupeFilter(str(tmp_path), fingerprinter=fingerprinter, capacity=1000)
+    for request in requests(100):
+        dupefilter.request_seen(request)
+    dupefilter.close('shutdown')
+    assert os.path.exists(tmp_path / 'requests.bloom')
+    assert not os.path.exists(tmp_path / 'requests.bloom.tmp')
+
+    reloaded = BloomDupeFilter(str(tmp_path), fingerprinter=fingerprinter, capacity=1000)
+    assert reloaded.count == 100
+    assert reloaded.bits == dupefilter.bits
+    assert all(reloaded.request_seen(request) for request in requests(100))
+    assert not reloaded.request_seen(requests(1, start=500)[0])
+    assert reloaded.count == 101
+
+
+def test_reload_keeps_saved_parameters(tmp_path, fingerprinter):
+    dupefilter = BloomDupeFilter(str(tmp_path), fingerprinter=fingerprinter, capacity=1000, error_rate=0.001)
+    for request in requests(10):
+        dupefilter.request_seen(request)
+    dupefilter.checkpoint()
+
+    # Les bits ne peuvent pas être redimensionnés : la taille du premier crawl est conservée
+    reloaded = BloomDupeFilter(str(tmp_path), fingerprinter=fingerprinter, capacity=50000, error_rate=0.01)
+    assert (reloaded.size, reloaded.hashes, reloaded.capacity) == (dupefilter.size, dupefilter.hashes, 1000)
+    assert all(reloaded.request_seen(request) for request in requests(10))
+
+
+def test_memory_report_against_exact_set(fingerprinter):
+    dupefilter = BloomDupeFilter(fingerprinter=fingerprinter, capacity=1000000, error_rate=0.001)
+    report = dupefilter.memory_report()
+    assert report['bloom_bytes'] < 2 * 1024 * 1024
+    assert exact_set_bytes(1000000) > 50 * report['bloom_bytes']
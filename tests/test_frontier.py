@@ -0,0 +1,164 @@
+import pytest
+
+from project_scrapy import frontier as frontier_module
+from project_scrapy.frontier import SQLiteFrontier
+
+
+class Clock:
+    """
+    Horloge manuelle qui remplace time.time dans project_scrapy.frontier.
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(frontier_module.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def make_frontier(tmp_path):
+    frontiers = []
+
+    def make(**kwargs):
+        frontier = SQLiteFrontier(str(tmp_path / 'frontier.sqlite'), crawl='test', **kwargs)
+        frontiers.append(frontier)
+        return frontier
+
+    yield make
+    for frontier in frontiers:
+        frontier.close()
+
+
+def attempts(frontier, fingerprint):
+    return frontier.db.execute('SELECT attempts FROM requests WHERE crawl = ? AND fingerprint = ?', (frontier.crawl, fingerprint)).fetchone()[0]
+
+
+def test_push_ignores_known_fingerprints(make_frontier):
+    frontier = make_frontier()
+    assert frontier.push('a', 0, b'request-a')
+    assert not frontier.push('a', 10, b'request-a')
+    assert frontier.states() == {'queued': 1}
+
+
+def test_lease_returns_highest_priority_first(make_frontier, clock):
+    frontier = make_frontier()
+    frontier.push('low', 0, b'low')
+    frontier.push('high', 5, b'high')
+    frontier.push('low-2', 0, b'low-2')
+    leased, expired = frontier.lease('w1', 2, lease_time=30)
+    assert leased == [('high', b'high'), ('low', b'low')]
+    assert expired == 0
+    assert frontier.states() == {'leased': 2, 'queued': 1}
+
+
+def test_expired_lease_is_requeued(make_frontier, clock):
+    frontier = make_frontier()
+    frontier.push('a', 0, b'request-a')
+    assert frontier.lease('w1', 10, lease_time=30) == ([('a', b'request-a')], 0)
+
+    # Bail encore valide : la requête n'est confiée à personne d'autre
+    clock.now += 29
+    assert frontier.lease('w2', 10, lease_time=30) == ([], 0)
+
+    # Worker w1 arrêté sans acquittement : le bail expire et la requête passe à w2
+    clock.now += 2
+    assert frontier.lease('w2', 10, lease_time=30) == ([('a', b'request-a')], 1)
+    assert attempts(frontier, 'a') == 2
+    owner = frontier.db.execute("SELECT lease_owner FROM requests WHERE fingerprint = 'a'").fetchone()[0]
+    assert owner == 'w2'
+
+
+def test_request_fails_after_max_attempts(make_frontier, clock):
+    frontier = make_frontier(max_attempts=2)
+    frontier.push('a', 0, b'request-a')
+    for _ in range(2):
+        leased, _ = frontier.lease('w1', 10, lease_time=30)
+        assert leased == [('a', b'request-a')]
+        clock.now += 31
+    # Deux baux expirés : la requête est abandonnée au lieu d'être confiée une troisième fois
+    assert frontier.lease('w1', 10, lease_time=30) == ([], 0)
+    assert frontier.states() == {'failed': 1}
+    assert frontier.pending('w1') == 0
+
+
+def test_ack_marks_done_or_deletes(make_frontier, clock):
+    frontier = make_frontier()
+    frontier.push('a', 0, b'request-a')
+    frontier.lease('w1', 10, lease_time=30)
+    frontier.ack('a')
+    assert frontier.states() == {'done': 1}
+    # Une requête traitée reste connue : elle n'est pas ajoutée de nouveau
+    assert not frontier.push('a', 0, b'request-a')
+
+    frontier.keep_done = False
+    frontier.push('b', 0, b'request-b')
+    frontier.lease('w1', 10, lease_time=30)
+    frontier.ack('b')
+    assert frontier.states() == {'done': 1}
+
+
+def test_release_does_not_count_an_attempt(make_frontier, clock):
+    frontier = make_frontier(max_attempts=1)
+    frontier.push('a', 0, b'request-a')
+    frontier.push('b', 0, b'request-b')
+    frontier.lease('w1', 10, lease_time=30)
+    frontier.release(['a'])
+    assert attempts(frontier, 'a') == 0
+    assert attempts(frontier, 'b') == 1
+    assert frontier.states() == {'leased': 1, 'queued': 1}
+    # Une requête déjà traitée n'est pas remise en file
+    frontier.ack('b')
+    frontier.release(['b'])
+    assert frontier.states() == {'done': 1, 'queued': 1}
+    # Le bail rendu ne compte pas parmi les max_attempts
+    assert frontier.lease('w2', 10, lease_time=30) == ([('a', b'request-a')], 0)
+
+
+def test_finish_settles_only_the_worker_leases(make_frontier, clock):
+    frontier = make_frontier()
+    for fingerprint in 'abcd':
+        frontier.push(fingerprint, 0, fingerprint.encode())
+    frontier.lease('w1', 2, lease_time=30)
+    frontier.lease('w2', 2, lease_time=30)
+    # Les requêtes confiées aux autres workers restent à traiter
+    assert frontier.pending('w1') == 2
+    assert frontier.pending('w2') == 2
+
+    # Worker interrompu : ses requêtes reviennent dans la file
+    assert frontier.finish('w1', failed=False) == 2
+    assert frontier.states() == {'leased': 2, 'queued': 2}
+    assert frontier.pending('w2') == 2
+
+    # Worker qui a fini son travail : ses requêtes restantes ont échoué
+    assert frontier.finish('w2', failed=True) == 2
+    assert frontier.states() == {'failed': 2, 'queued': 2}
+    assert frontier.finish('w2', failed=True) == 0
+
+
+def test_frontier_is_shared_between_connections(make_frontier, clock):
+    first = make_frontier()
+    second = make_frontier()
+    first.push('a', 0, b'request-a')
+    assert not second.push('a', 0, b'request-a')
+    assert second.lease('w2', 10, lease_time=30) == ([('a', b'request-a')], 0)
+    assert first.lease('w1', 10, lease_time=30) == ([], 0)
+
+
+def test_heartbeat_reports_worker_throughput(make_frontier, clock):
+    frontier = make_frontier()
+    frontier.heartbeat('w1', {'leased': 0, 'acked': 0, 'items': 0})
+    clock.now += 10
+    frontier.heartbeat('w1', {'leased': 25, 'acked': 20, 'items': 10}, status='finished')
+    (worker,) = frontier.workers()
+    assert worker['status'] == 'finished'
+    assert worker['elapsed'] == 10
+    assert worker['items_per_s'] == pytest.approx(1.0)
+    assert worker['requests_per_s'] == pytest.approx(2.0)
@@ -0,0 +1,67 @@
+from urllib.parse import urlencode
+
+import pytest
+from scrapy import Request
+from scrapy.settings import Settings
+
+from project_scrapy.httpcache import OriginalUrlCacheStorage
+
+
+URL = 'https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html'
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return OriginalUrlCacheStorage(Settings({'HTTPCACHE_DIR': str(tmp_path)}))
+
+
+def proxied(request, api_key='key', session=1, **payload):
+    """
+    Copie de la requête réécrite comme par ScrapeOpsProxyMiddleware.
+    """
+    proxy_url = 'https://proxy.scrapeops.io/v1/?' + urlencode({'api_key': api_key, 'url': request.url, 'session_number': session, **payload})
+    new_request = request.replace(url=proxy_url)
+    new_request.headers['X-Original-URL'] = request.url
+    return new_request
+
+
+def test_key_ignores_proxy_rewrite(storage):
+    request = Request(URL)
+    key = storage.request_key(request)
+    assert storage.request_key(proxied(request)) == key
+    # Clé d'API, session et scénario JavaScript changent d'une exécution à l'autre
+    assert storage.request_key(proxied(request, api_key='other', session=42, js_scenario='{"wait": 10}')) == key
+
+
+def test_key_uses_canonical_url(storage):
+    assert storage.request_key(Request(f'{URL}?b=2&a=1')) == storage.request_key(Request(f'{URL}?a=1&b=2'))
+    assert storage.request_key(Request(f'{URL}#reviews')) == storage.request_key(Request(URL))
+    assert storage.request_key(Request(f'{URL}?a=1')) != storage.request_key(Request(URL))
+
+
+def test_key_distinguishes_render_flags(storage):
+    static = Request(URL, meta={'sops_render_js': 'False'})
+    rendered = Request(URL, meta={'sops_render_js': True})
+    assert storage.request_key(static) == storage.request_key(Request(URL))
+    assert storage.request_key(rendered) != storage.request_key(static)
+    # Même drapeau en booléen ou en texte (meta des start_requests du spider)
+    assert storage.request_key(rendered) == storage.request_key(Request(URL, meta={'sops_render_js': 'true'}))
+    assert storage.request_key(proxied(rendered, render_js='true')) == storage.request_key(rendered)
+
+
+def test_key_ignores_unlisted_meta(storage):
+    assert storage.request_key(Request(URL, meta={'sops_residential': True, 'incremental': True})) == storage.request_key(Request(URL))
+
+
+def test_key_follows_httpcache_key_meta(tmp_path):
+    storage = OriginalUrlCacheStorage(Settings({'HTTPCACHE_DIR': str(tmp_path), 'HTTPCACHE_KEY_META': ['sops_residential']}))
+    assert storage.request_key(Request(URL, meta={'sops_residential': True})) != storage.request_key(Request(URL))
+    assert storage.request_key(Request(URL, meta={'sops_render_js': True})) == storage.request_key(Request(URL))
+
+
+def test_key_distinguishes_method_and_body(storage):
+    get = Request(URL)
+    post = Request(URL, method='POST', body=b'page=1')
+    assert storage.request_key(post) != storage.request_key(get)
+    assert storage.request_key(post) != storage.request_key(post.replace(body=b'page=2'))
+    assert storage.request_key(proxied(post)) == storage.request_key(post)
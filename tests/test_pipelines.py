@@ -0,0 +1,101 @@
+import hashlib
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import Response
+from scrapy.pipelines.files import FileException
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+
+from project_scrapy.pipelines import CoverImagePipeline
+
+
+BODY = b'cover image bytes'
+DIGEST = hashlib.sha256(BODY).hexdigest()
+
+
+class DeferredStore:
+    """
+    Stockage dont chaque écriture reste en cours jusqu'à ce que le test la termine.
+    """
+
+    def __init__(self):
+        self.writes = []
+
+    def persist_file(self, path, buf, info, meta=None, headers=None):
+        d = defer.Deferred()
+        self.writes.append((path, d))
+        return d
+
+    def stat_file(self, path, info):
+        return {}
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    crawler = get_crawler(Spider, settings_dict={
+        'COVERS_STORE': str(tmp_path / 'covers'),
+        'COVERS_INDEX': str(tmp_path / 'covers_index.json'),
+        'COVERS_THUMBS': {},
+    })
+    spider = Spider.from_crawler(crawler, name='covers')
+    pipeline = CoverImagePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    pipeline.store = DeferredStore()
+    return pipeline
+
+
+def download(pipeline, url, content_type):
+    request = Request(url)
+    response = Response(url, body=BODY, headers={'Content-Type': content_type}, request=request)
+    results = []
+    d = defer.maybeDeferred(pipeline.media_downloaded, response, request, pipeline.spiderinfo)
+    d.addBoth(results.append)
+    return results
+
+
+def test_duplicate_reuses_stored_path(pipeline):
+    jpeg = download(pipeline, 'https://books.toscrape.com/media/a.jpg', 'image/jpeg')
+    (path, write), = pipeline.store.writes
+    write.callback(None)
+    assert jpeg[0]['path'] == path == f'full/{DIGEST[:2]}/{DIGEST}.jpg'
+
+    # Même contenu servi en PNG : pas de deuxième fichier, le chemin reste celui du fichier stocké
+    png = download(pipeline, 'https://books.toscrape.com/media/b.png', 'image/png')
+    assert len(pipeline.store.writes) == 1
+    assert png[0]['path'] == path
+    assert pipeline.index['https://books.toscrape.com/media/b.png']['path'] == path
+
+
+def test_duplicate_waits_for_the_write_in_progress(pipeline):
+    first = download(pipeline, 'https://books.toscrape.com/media/a.jpg', 'image/jpeg')
+    second = download(pipeline, 'https://books.toscrape.com/media/b.jpg', 'image/jpeg')
+    assert len(pipeline.store.writes) == 1
+    # Le fichier n'est pas encore écrit : aucune des deux couvertures n'est disponible
+    assert first == second == []
+
+    pipeline.store.writes[0][1].callback(None)
+    assert first[0]['path'] == second[0]['path'] == pipeline.store.writes[0][0]
+    assert DIGEST not in pipeline.persisting
+    stats = pipeline.crawler.stats
+    assert stats.get_value('covers/stored') == 1
+    assert stats.get_value('covers/deduplicated') == 1
+
+
+def test_duplicate_writes_the_file_when_the_first_write_fails(pipeline):
+    first = download(pipeline, 'https://books.toscrape.com/media/a.jpg', 'image/jpeg')
+    second = download(pipeline, 'https://books.toscrape.com/media/b.png', 'image/png')
+
+    pipeline.store.writes[0][1].errback(OSError('disk full'))
+    assert first[0].check(FileException)
+    assert 'https://books.toscrape.com/media/a.jpg' not in pipeline.index
+    # La copie en attente écrit le fichier à son tour, sous son propre chemin
+    assert len(pipeline.store.writes) == 2
+    path, write = pipeline.store.writes[1]
+    assert path == f'full/{DIGEST[:2]}/{DIGEST}.png'
+    assert second == []
+
+    write.callback(None)
+    assert second[0]['path'] == path
+    assert pipeline.paths[DIGEST] == path
+    assert pipeline.crawler.stats.get_value('covers/store_errors') == 1